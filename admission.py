@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Admission Control for Food Detection App
+Bounded priority queue in front of the model with fast rejection and degrade signalling
+"""
+
+import heapq
+import itertools
+import math
+import threading
+import time
+
+# Lower rank is served first
+PRIORITIES = {'interactive': 0, 'batch': 1}
+
+
+class Overloaded(Exception):
+    """
+    Request rejected by admission control
+
+    Attributes:
+        status: HTTP status to answer with (429 for batch over its share, 503 when full)
+        retry_after: Suggested Retry-After in seconds
+    """
+
+    def __init__(self, message: str, status: int, retry_after: int):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class _Slot:
+    """
+    A granted inference slot; release it by leaving the with-block
+    """
+
+    def __init__(self, controller, degraded: bool):
+        self._controller = controller
+        self.degraded = degraded
+        self._start = time.monotonic()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._controller._release(time.monotonic() - self._start)
+        return False
+
+
+class AdmissionController:
+    """
+    Lets at most max_concurrent requests run inference; others wait in a bounded
+    priority queue (interactive before batch, FIFO within a class)
+
+    Args:
+        max_concurrent: Requests allowed to run inference at once
+        max_queue: Waiting requests beyond which everything is rejected (503)
+        batch_queue: Waiting requests beyond which batch requests are rejected (429)
+        degrade_depth: Queue depth at which granted requests should use the cheap profile
+        max_wait: Longest time a request may wait for a slot before 503
+    """
+
+    def __init__(self, max_concurrent: int = 1, max_queue: int = 16, batch_queue: int = 4,
+                 degrade_depth: int = 4, max_wait: float = 10.0):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.batch_queue = batch_queue
+        self.degrade_depth = degrade_depth
+        self.max_wait = max_wait
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._running = 0
+        self._seq = itertools.count()
+        # Moving average of slot hold time, for Retry-After estimates
+        self._service_time = 0.5
+
+    @property
+    def depth(self) -> int:
+        return len(self._waiting)
+
+    @property
+    def running(self) -> int:
+        return self._running
+
+    def retry_after(self) -> int:
+        return max(1, math.ceil((len(self._waiting) + 1) * self._service_time / self.max_concurrent))
+
+    def _check_capacity(self, rank: int):
+        depth = len(self._waiting)
+        if depth >= self.max_queue:
+            raise Overloaded('Server is overloaded, try again later', 503, self.retry_after())
+        if rank > 0 and depth >= self.batch_queue:
+            raise Overloaded('Batch capacity exhausted, slow down', 429, self.retry_after())
+
+    def check(self, priority: str = 'interactive'):
+        """
+        Reject early, before the caller spends time on a request the queue has no room for
+
+        acquire() checks again; this only saves work, it reserves nothing.
+
+        Raises:
+            Overloaded: If the queue is full for this priority
+        """
+        with self._cond:
+            self._check_capacity(PRIORITIES.get(priority, 0))
+
+    def acquire(self, priority: str = 'interactive') -> _Slot:
+        """
+        Wait for an inference slot
+
+        Raises:
+            Overloaded: If the queue is full or the wait exceeds max_wait
+        """
+        rank = PRIORITIES.get(priority, 0)
+        with self._cond:
+            self._check_capacity(rank)
+
+            entry = (rank, next(self._seq))
+            heapq.heappush(self._waiting, entry)
+            deadline = time.monotonic() + self.max_wait
+            try:
+                while self._running >= self.max_concurrent or self._waiting[0] != entry:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise Overloaded('Timed out waiting for the model', 503, self.retry_after())
+                    self._cond.wait(remaining)
+            except BaseException:
+                self._waiting.remove(entry)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+                raise
+            heapq.heappop(self._waiting)
+            self._running += 1
+            # The next waiter is now at the head; wake it in case another slot is free
+            self._cond.notify_all()
+            # Requests still queued behind this one decide whether it must be cheap
+            return _Slot(self, degraded=len(self._waiting) >= self.degrade_depth)
+
+    def _release(self, elapsed: float):
+        with self._cond:
+            self._running -= 1
+            self._service_time = 0.8 * self._service_time + 0.2 * elapsed
+            self._cond.notify_all()
@@ -4,124 +4,615 @@ Food Detection Web App
 A simple Flask web application for food detection using your trained YOLOv8 model
 """
 
-from flask import Flask, render_template, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, send_from_directory, Response, g
 from ultralytics import YOLO
 import cv2
 import numpy as np
 import os
-import base64
+import logging
+import time
+import uuid
+import re
+import json
+import hashlib
 from io import BytesIO
 from PIL import Image
 from ingredients_manager import IngredientsManager
+from recipe_manager import RecipeManager
+from http_utils import compress_response
+from assets import AssetBundle, REVALIDATE
+from serializers import FastJSONProvider, negotiate, detection_body
+from catalog_watcher import CatalogWatcher
+from metrics import registry as metrics, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from profiler import ProfilingControl
+from tiled_inference import sliced_predict, parse_tiling_options
+from inference_options import default_options, parse_inference_options, parse_original_size
+from admission import AdmissionController, Overloaded, PRIORITIES
+from cascade import CascadeDetector
+from portion_estimator import estimate_portions, scale_ingredients
+from nutrition import nutrition_for, meal_totals
+from history_store import HistoryStore, parse_time
+
+# Leveled logging; set LOG_LEVEL=WARNING in production to silence per-request logs
+logging.basicConfig(
+    level=os.environ.get('LOG_LEVEL', 'INFO').upper(),
+    format='%(asctime)s %(levelname)s %(name)s: %(message)s'
+)
+logger = logging.getLogger('nutrispike')
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
+
+def _resolve_model():
+    """
+    Pick the serving model: MODEL_PATH, else a variant promoted by
+    model_compression.py (serving_model.json), else best.pt
+    """
+    if os.environ.get('MODEL_PATH'):
+        return {'path': os.environ['MODEL_PATH'], 'variant': 'custom', 'imgsz': 640}
+    if os.path.exists('serving_model.json'):
+        with open('serving_model.json', 'r') as f:
+            manifest = json.load(f)
+        if os.path.exists(manifest.get('path', '')):
+            return {'path': manifest['path'], 'variant': manifest.get('variant', 'promoted'),
+                    'imgsz': manifest.get('imgsz', 640)}
+        logger.warning("Promoted model %s is missing, falling back to best.pt", manifest.get('path'))
+    return {'path': 'best.pt', 'variant': 'fp32', 'imgsz': 640}
+
+def _model_version(path):
+    """Short content hash of the weights, so stored results name the exact model"""
+    if not os.path.isfile(path):
+        return None
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
 
 # Load the trained model
-model = YOLO("best.pt")
+MODEL_INFO = _resolve_model()
+MODEL_INFO['version'] = _model_version(MODEL_INFO['path'])
+model = YOLO(MODEL_INFO['path'], task='detect')
+logger.info("Serving model %s (%s)", MODEL_INFO['path'], MODEL_INFO['variant'])
+
+# Server-wide conf/iou/max_det/classes defaults (DETECT_* env), overridable per request
+INFERENCE_DEFAULTS = default_options(model.names)
+
+# Admission control: bounded priority queue in front of the model (X-Priority: interactive|batch)
+admission = AdmissionController(
+    max_concurrent=int(os.environ.get('MAX_CONCURRENT_INFERENCE', 1)),
+    max_queue=int(os.environ.get('MAX_QUEUE', 16)),
+    batch_queue=int(os.environ.get('BATCH_QUEUE', 4)),
+    degrade_depth=int(os.environ.get('DEGRADE_QUEUE_DEPTH', 4)),
+    max_wait=float(os.environ.get('MAX_QUEUE_WAIT', 10))
+)
+# Cheaper profile used while the queue is deep: no annotated image, lower imgsz, optionally a smaller model
+DEGRADED_IMGSZ = int(os.environ.get('DEGRADED_IMGSZ', 416))
+degraded_model = YOLO(os.environ['DEGRADED_MODEL_PATH'], task='detect') if os.environ.get('DEGRADED_MODEL_PATH') else None
+
+# Optional cascade: a nano model answers confident images, the rest escalate to the full model
+cascade = None
+if os.environ.get('CASCADE_MODEL_PATH'):
+    cascade = CascadeDetector(
+        YOLO(os.environ['CASCADE_MODEL_PATH'], task='detect'), model,
+        accept_conf=float(os.environ.get('CASCADE_ACCEPT_CONF', 0.6)),
+        min_conf=float(os.environ.get('CASCADE_MIN_CONF', 0.15)),
+        ambiguous_iou=float(os.environ.get('CASCADE_AMBIGUOUS_IOU', 0.5)),
+        escalate_empty=os.environ.get('CASCADE_ESCALATE_EMPTY') == '1',
+        small_imgsz=MODEL_INFO['imgsz']
+    )
+    logger.info("Cascade enabled with %s", os.environ['CASCADE_MODEL_PATH'])
+
+# Load ingredients manager; per-session quantity edits expire after SESSION_TTL seconds idle
+SESSION_TTL = float(os.environ.get('SESSION_TTL', 3600))
+SESSION_COOKIE = 'nutrispike_session'
+# History owner cookie; long-lived, so history outlives the edit session's idle timeout
+OWNER_COOKIE = 'nutrispike_owner'
+OWNER_TTL = int(os.environ.get('OWNER_TTL', 365 * 86400))
+# Behind router.py uploads may land on any node: point every node at one EDITS_DB file to share the edits
+EDITS_DB = os.environ.get('EDITS_DB') or None
+ingredients_manager = IngredientsManager(session_ttl=SESSION_TTL, edits_db=EDITS_DB)
+recipe_manager = RecipeManager()
+# Catalog files, hot-reloaded when they change (RECIPES_FILE may be .json or .xlsx)
+INGREDIENTS_FILE = os.environ.get('INGREDIENTS_FILE', 'ingredients.json')
+RECIPES_FILE = os.environ.get('RECIPES_FILE', 'recipes.json')
+MAX_BULK_FOODS = 200
+
+# Append-only meal history; HISTORY_DB= (empty) disables it
+HISTORY_DB = os.environ.get('HISTORY_DB', 'history.sqlite3')
+history = HistoryStore(HISTORY_DB) if HISTORY_DB else None
+# Any client can send X-User-Id; only honour it behind a proxy that sets it after authenticating
+TRUSTED_USER_HEADER = os.environ.get('TRUSTED_USER_HEADER') == '1'
+
+# Hot-path instrumentation
+REQUEST_SECONDS = metrics.histogram(
+    'nutrispike_request_duration_seconds', 'End-to-end request latency', ['route'])
+STAGE_SECONDS = metrics.histogram(
+    'nutrispike_detect_stage_duration_seconds', 'Time spent in each /detect stage', ['stage'])
+REQUESTS_TOTAL = metrics.counter(
+    'nutrispike_requests_total', 'Requests handled', ['route', 'status'])
+QUEUE_DEPTH = metrics.gauge(
+    'nutrispike_detect_queue_depth', '/detect requests currently waiting on or running inference')
+QUEUE_DEPTH.set_function(lambda: admission.depth + admission.running)
+SHED_TOTAL = metrics.counter(
+    'nutrispike_detect_shed_total', '/detect requests rejected by admission control', ['priority', 'status'])
+CASCADE_TOTAL = metrics.counter(
+    'nutrispike_cascade_total', 'Cascade outcomes (accepted by the small model or escalated, with reason)',
+    ['outcome', 'reason'])
+DEGRADED_TOTAL = metrics.counter(
+    'nutrispike_detect_degraded_total', '/detect requests served with the degraded profile')
+DETECTIONS_TOTAL = metrics.counter(
+    'nutrispike_detections_total', 'Boxes returned by /detect', ['class'])
+CACHE_LOOKUPS = metrics.counter(
+    'nutrispike_cache_lookups_total', 'Cache lookups by cache and result', ['cache', 'result'])
+CACHE_LOOKUPS.set_function(lambda: ingredients_manager.cache_hits, cache='ingredients', result='hit')
+CACHE_LOOKUPS.set_function(lambda: ingredients_manager.cache_misses, cache='ingredients', result='miss')
+EDIT_SESSIONS = metrics.gauge(
+    'nutrispike_ingredient_sessions', 'Sessions holding ingredient quantity edits')
+EDIT_SESSIONS.set_function(lambda: len(ingredients_manager.overlays))
+
+CATALOG_RELOADS = metrics.counter(
+    'nutrispike_catalog_reloads_total', 'Catalog file reloads by catalog and result', ['catalog', 'result'])
+
+def _parse_recipes(path):
+    if path.lower().endswith(('.xls', '.xlsx')):
+        return RecipeManager.parse_excel(path)
+    return RecipeManager.parse_json(path)
+
+# Parse changed catalogs off the request path and publish them with a snapshot swap
+catalog_watcher = CatalogWatcher(
+    interval=float(os.environ.get('CATALOG_RELOAD_INTERVAL', 2)),
+    on_reload=lambda name, diff, error: CATALOG_RELOADS.inc(catalog=name, result='error' if error else 'ok')
+)
+catalog_watcher.watch('ingredients', INGREDIENTS_FILE, IngredientsManager.parse_json, ingredients_manager.reload)
+catalog_watcher.watch('recipes', RECIPES_FILE, _parse_recipes, recipe_manager.reload)
+catalog_watcher.start()
+
+# Opt-in sampling profiler; per-request flag only honoured when PROFILING_REQUEST_FLAG=1
+profiling = ProfilingControl(
+    output_dir=os.environ.get('PROFILE_DIR', 'profiles'),
+    allow_request_flag=os.environ.get('PROFILING_REQUEST_FLAG') == '1'
+)
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+# Server-wide defaults for optional sliced inference (?tiled=1)
+TILE_SIZE = int(os.environ.get('TILE_SIZE', 640))
+TILE_OVERLAP = float(os.environ.get('TILE_OVERLAP', 0.2))
+
+# Longest side worth uploading or decoding; the model letterboxes to imgsz anyway
+MAX_INPUT_DIM = int(os.environ.get('MAX_INPUT_DIM', MODEL_INFO['imgsz']))
+UPLOAD_JPEG_QUALITY = float(os.environ.get('UPLOAD_JPEG_QUALITY', 0.9))
+
+# Fingerprinted, precompressed CSS/JS; the page shell is rendered once here, not per request
+assets = AssetBundle(app.static_folder, os.path.join(app.static_folder, 'dist'))
+index_page = assets.render_page(app.jinja_env, 'index.html')
+
+
+def _is_admin_request():
+    """Admin endpoints need X-Admin-Token when ADMIN_TOKEN is set, else a local client that was not proxied"""
+    if ADMIN_TOKEN:
+        return request.headers.get('X-Admin-Token') == ADMIN_TOKEN
+    # router.py (or any proxy) on this host connects from 127.0.0.1 on behalf of remote clients
+    if 'X-Forwarded-For' in request.headers:
+        return False
+    return request.remote_addr in ('127.0.0.1', '::1')
+
+
+def _session_id(create=False):
+    """Session for ingredient edits: X-Session-Id header, else cookie; optionally start a new one"""
+    session_id = request.headers.get('X-Session-Id') or request.cookies.get(SESSION_COOKIE)
+    if session_id and re.fullmatch(r'[A-Za-z0-9_-]{8,64}', session_id):
+        if session_id == request.cookies.get(SESSION_COOKIE):
+            # Sliding expiry, like the edits: the cookie lives SESSION_TTL past the last use
+            g.session_cookie = session_id
+        return session_id
+    if create:
+        g.session_cookie = uuid.uuid4().hex
+        return g.session_cookie
+    return None
+
+
+def _user_id(create=False):
+    """History owner: X-User-Id when TRUSTED_USER_HEADER=1 (an authenticating proxy sets it), else X-Session-Id, else the owner cookie"""
+    user_id = request.headers.get('X-User-Id') if TRUSTED_USER_HEADER else None
+    if user_id and re.fullmatch(r'[A-Za-z0-9_.@-]{1,128}', user_id):
+        return user_id
+    user_id = request.headers.get('X-Session-Id') or request.cookies.get(OWNER_COOKIE)
+    if user_id and re.fullmatch(r'[A-Za-z0-9_-]{8,64}', user_id):
+        if user_id == request.cookies.get(OWNER_COOKIE):
+            g.owner_cookie = user_id
+        return user_id
+    if create:
+        # Adopt a live session cookie, so history recorded under it before stays reachable
+        g.owner_cookie = _session_id() or uuid.uuid4().hex
+        return g.owner_cookie
+    return None
+
+
+def _not_modified(etag):
+    """304 response when a GET's If-None-Match already has this version, else None"""
+    if request.method in ('GET', 'HEAD') and request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.set_etag(etag, weak=True)
+        response.vary.update(('X-Session-Id', 'Cookie'))
+        return response
+    return None
+
+
+def _catalog_response(payload, etag):
+    """JSON catalog response clients and proxies can revalidate cheaply with If-None-Match"""
+    response = jsonify(payload)
+    response.set_etag(etag, weak=True)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.update(('X-Session-Id', 'Cookie'))
+    return response
+
+
+@app.before_request
+def _start_timer():
+    request.environ['nutrispike.start'] = time.perf_counter()
+    request_id = request.headers.get('X-Request-Id', '')
+    g.request_id = request_id if re.fullmatch(r'[A-Za-z0-9_-]{1,64}', request_id) else uuid.uuid4().hex[:16]
+    flagged = request.headers.get('X-Profile') == '1' or request.args.get('profile') == '1'
+    g.profiler = profiling.start() if profiling.should_profile(flagged) else None
+
+
+@app.after_request
+def _record_request(response):
+    start = request.environ.get('nutrispike.start')
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    if start is not None:
+        REQUEST_SECONDS.observe(time.perf_counter() - start, route=route)
+    REQUESTS_TOTAL.inc(route=route, status=response.status_code)
+    response.headers['X-Request-Id'] = g.request_id
+    if g.get('session_cookie'):
+        response.set_cookie(SESSION_COOKIE, g.session_cookie, max_age=int(SESSION_TTL),
+                            httponly=True, samesite='Lax')
+    if g.get('owner_cookie'):
+        response.set_cookie(OWNER_COOKIE, g.owner_cookie, max_age=OWNER_TTL, httponly=True, samesite='Lax')
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        response.headers['X-Profile-Id'] = profiling.save(profiler, route, g.request_id)
+    return compress_response(response, request.headers.get('Accept-Encoding', ''))
+
+
+@app.teardown_request
+def _stop_profiler(exc):
+    # after_request is skipped on unhandled errors; never leave a sampler running
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiling.save(profiler, request.url_rule.rule if request.url_rule else 'unmatched', g.request_id)
 
-# Load ingredients manager
-ingredients_manager = IngredientsManager()
 
 @app.route('/')
 def index():
-    return render_template('index.html')
+    return index_page.response(request.headers.get('Accept-Encoding', ''), request.if_none_match, REVALIDATE)
+
+@app.route('/assets/<name>')
+def frontend_asset(name):
+    asset = assets.get(name)
+    if asset is None:
+        return jsonify({'error': 'Asset not found'}), 404
+    return asset.response(request.headers.get('Accept-Encoding', ''), request.if_none_match)
 
 @app.route('/detect', methods=['POST'])
 def detect_food():
     try:
-        print("Received request for food detection")
-        print("Files in request:", list(request.files.keys()))
+        logger.debug("Received request for food detection, files: %s", list(request.files.keys()))
         
         # Get the uploaded image
         if 'image' not in request.files:
-            print("No 'image' key in request.files")
+            logger.debug("No 'image' key in request.files")
             return jsonify({'error': 'No image provided'}), 400
         
         file = request.files['image']
-        print(f"File received: {file.filename}")
+        logger.debug("File received: %s", file.filename)
         
         if file.filename == '':
-            print("Empty filename")
+            logger.debug("Empty filename")
             return jsonify({'error': 'No image selected'}), 400
         
+        try:
+            tiling = parse_tiling_options(request.values, TILE_SIZE, TILE_OVERLAP)
+            options = parse_inference_options(request.values, model.names, INFERENCE_DEFAULTS)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        # Shed load before paying for hashing and decoding the upload
+        # Only the web UI asks for interactive; scripts and API clients that don't say queue as batch
+        priority = request.headers.get('X-Priority', 'batch').lower()
+        if priority not in PRIORITIES:
+            priority = 'batch'
+        try:
+            admission.check(priority)
+        except Overloaded as e:
+            SHED_TOTAL.inc(priority=priority, status=e.status)
+            return jsonify({'error': str(e)}), e.status, {'Retry-After': str(e.retry_after)}
+        
         # Read and process the image
-        image = Image.open(file.stream)
-        image_cv = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+        with STAGE_SECONDS.time(stage='decode'):
+            image_bytes = file.read()
+            image_hash = hashlib.sha1(image_bytes).hexdigest()
+            image = Image.open(BytesIO(image_bytes))
+            try:
+                original_size = parse_original_size(request.values, image.size)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            if not tiling:
+                # Large JPEGs decode straight at 1/2, 1/4 or 1/8 scale, never below MAX_INPUT_DIM
+                image.draft(image.mode, (MAX_INPUT_DIM, MAX_INPUT_DIM))
+            # Boxes are reported in the original photo's pixels
+            scale = np.array([original_size[0] / image.size[0], original_size[1] / image.size[1]] * 2)
+            image_cv = cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+        
+        # Wait for the model; reject fast instead of queueing without bound
+        try:
+            slot = admission.acquire(priority)
+        except Overloaded as e:
+            SHED_TOTAL.inc(priority=priority, status=e.status)
+            return jsonify({'error': str(e)}), e.status, {'Retry-After': str(e.retry_after)}
+        degraded = slot.degraded
+        if degraded:
+            DEGRADED_TOTAL.inc()
         
-        # Run inference
-        results = model(image_cv)
+        # Run inference; thresholds and class filter apply inside NMS, so later stages see fewer boxes
+        escalation = None
+        with slot, STAGE_SECONDS.time(stage='inference'):
+            if degraded:
+                results = (degraded_model or model)(image_cv, imgsz=DEGRADED_IMGSZ, verbose=False, **options)
+            elif tiling:
+                results = sliced_predict(model, image_cv, tiling['tile_size'], tiling['overlap'], **options)
+            elif cascade is not None:
+                results, escalation = cascade(image_cv, imgsz=MODEL_INFO['imgsz'], **options)
+                CASCADE_TOTAL.inc(outcome='escalated' if escalation else 'accepted', reason=escalation or 'none')
+            else:
+                results = model(image_cv, imgsz=MODEL_INFO['imgsz'], verbose=False, **options)
         
         # Process results
         detections = []
-        ingredients_list = []
         
-        for r in results:
-            for box in r.boxes:
-                class_id = int(box.cls[0])
-                confidence = float(box.conf[0])
-                class_name = model.names[class_id]
-                
-                # Get bounding box coordinates
-                x1, y1, x2, y2 = box.xyxy[0].tolist()
-                
-                detections.append({
-                    'class': class_name,
-                    'confidence': round(confidence, 2),
-                    'bbox': [int(x1), int(y1), int(x2), int(y2)]
-                })
-                
-                # Get ingredients for this food
-                ingredients = ingredients_manager.get_ingredients(class_name)
+        with STAGE_SECONDS.time(stage='postprocess'):
+            for r in results:
+                boxes = r.boxes
+                if len(boxes) == 0:
+                    continue
+                # One device->host transfer per result instead of per box
+                class_ids = boxes.cls.int().tolist()
+                confidences = boxes.conf.tolist()
+                coords = boxes.xyxy.cpu().numpy() * scale
+                class_names = [r.names[class_id] for class_id in class_ids]
+                portions = estimate_portions(coords, class_names, original_size)
+                for class_name, confidence, (x1, y1, x2, y2), portion in zip(
+                        class_names, confidences, coords.tolist(), portions.tolist()):
+                    detections.append({
+                        'class': class_name,
+                        'confidence': round(confidence, 2),
+                        'bbox': [int(x1), int(y1), int(x2), int(y2)],
+                        'portion': portion,
+                        'calories': nutrition_for(class_name, portion)['calories']
+                    })
+                    DETECTIONS_TOTAL.inc(**{'class': class_name})
+        
+        # Get ingredients for each detected food
+        ingredients_list = []
+        with STAGE_SECONDS.time(stage='ingredients'):
+            session_id = _session_id()
+            for index, detection in enumerate(detections):
+                ingredients = ingredients_manager.get_ingredients(detection['class'], session_id)
                 if ingredients:
                     ingredients_list.append({
-                        'food': class_name,
-                        'ingredients': ingredients
+                        'food': detection['class'],
+                        'detection': index,
+                        'portion': detection['portion'],
+                        'ingredients': scale_ingredients(ingredients, detection['portion'])
                     })
         
-        # Create annotated image
-        annotated_image = results[0].plot()
-        annotated_image_rgb = cv2.cvtColor(annotated_image, cv2.COLOR_BGR2RGB)
+        # Create annotated image (skipped under load; the client shows its own upload)
+        image_bytes = None
+        if not degraded:
+            with STAGE_SECONDS.time(stage='plot'):
+                annotated_image = results[0].plot()
+                annotated_image_rgb = cv2.cvtColor(annotated_image, cv2.COLOR_BGR2RGB)
+            
+            # JPEG-encode; base64 is only added for JSON clients
+            with STAGE_SECONDS.time(stage='encode'):
+                pil_image = Image.fromarray(annotated_image_rgb)
+                buffer = BytesIO()
+                pil_image.save(buffer, format='JPEG')
+                image_bytes = buffer.getvalue()
         
-        # Convert to base64 for web display
-        pil_image = Image.fromarray(annotated_image_rgb)
-        buffer = BytesIO()
-        pil_image.save(buffer, format='JPEG')
-        img_str = base64.b64encode(buffer.getvalue()).decode()
+        logger.debug("Detected %d items", len(detections))
         
-        return jsonify({
+        nutrition = meal_totals(detections)
+        # X-Request-Id may come from the client (retries, collisions); stored meals get their own id
+        meal_id = None
+        if history is not None:
+            with STAGE_SECONDS.time(stage='history'):
+                try:
+                    meal_id = uuid.uuid4().hex[:16]
+                    history.record(meal_id, _user_id(create=True), detections, nutrition, MODEL_INFO,
+                                   image_hash, original_size, request_id=g.request_id)
+                except Exception:
+                    # A failed history write must not fail the detection
+                    logger.exception("Could not store detection history")
+                    meal_id = None
+        
+        payload = {
+            'request_id': g.request_id,
+            'meal_id': meal_id,
             'detections': detections,
-            'annotated_image': img_str,
+            'nutrition': nutrition,
             'count': len(detections),
-            'ingredients': ingredients_list
-        })
+            'image_size': list(original_size),
+            'ingredients': ingredients_list,
+            'tiled': bool(tiling) and not degraded,
+            'degraded': degraded,
+            'cascade': None if cascade is None or degraded or tiling else (escalation or 'accepted'),
+            'inference': {**options, 'classes': [model.names[c] for c in options['classes'] or []] or None}
+        }
+        
+        # JSON (default) or MessagePack with packed detections and raw image bytes
+        mimetype = negotiate(request.accept_mimetypes)
+        with STAGE_SECONDS.time(stage='serialize'):
+            body = detection_body(payload, image_bytes, mimetype)
+            response = jsonify(body) if isinstance(body, dict) else Response(body, mimetype=mimetype)
+        response.vary.add('Accept')
+        return response
         
     except Exception as e:
+        logger.exception("Food detection failed")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/metrics')
+def prometheus_metrics():
+    """Expose hot-path metrics in Prometheus text format"""
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
+@app.route('/admin/profile', methods=['GET', 'POST'])
+def admin_profile():
+    """Arm the profiler for the next N requests or a time window, or show its status"""
+    if not _is_admin_request():
+        return jsonify({'error': 'Forbidden'}), 403
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        try:
+            profiling.arm(requests=int(data.get('requests', 0)), seconds=float(data.get('seconds', 0)))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'requests and seconds must be numbers'}), 400
+        logger.info("Profiler armed: %s", profiling.status())
+    return jsonify({**profiling.status(), 'profiles': profiling.list_profiles()})
+
+@app.route('/admin/profile/<profile_id>')
+def admin_profile_download(profile_id):
+    """Download collapsed stacks for one profiled request (feed to flamegraph.pl or speedscope)"""
+    if not _is_admin_request():
+        return jsonify({'error': 'Forbidden'}), 403
+    collapsed = profiling.load(profile_id)
+    if collapsed is None:
+        return jsonify({'error': f'Profile {profile_id} not found'}), 404
+    return Response(collapsed, content_type='text/plain; charset=utf-8')
+
+@app.route('/config')
+def client_config():
+    """Upload hints for clients: downscale photos to max_input_dim before sending"""
+    response = jsonify({
+        'max_input_dim': MAX_INPUT_DIM,
+        'jpeg_quality': UPLOAD_JPEG_QUALITY,
+        'tile_size': TILE_SIZE
+    })
+    response.cache_control.max_age = 300
+    return response
+
 @app.route('/health')
 def health():
-    return jsonify({'status': 'healthy', 'model_loaded': True})
+    return jsonify({'status': 'healthy', 'model_loaded': True, 'model': MODEL_INFO})
+
+def _history_user():
+    """(user_id, None) or (None, error response) for the /history endpoints"""
+    if history is None:
+        return None, (jsonify({'error': 'History is disabled'}), 404)
+    user_id = _user_id()
+    if not user_id:
+        return None, (jsonify({'error': 'Send the history cookie or X-Session-Id'}), 400)
+    return user_id, None
+
+@app.route('/history')
+def meal_history():
+    """A user's past meals, newest first (?since=, ?until=, ?limit=)"""
+    user_id, error = _history_user()
+    if error:
+        return error
+    try:
+        since = parse_time(request.args.get('since'))
+        until = parse_time(request.args.get('until'))
+        limit = max(1, min(int(request.args.get('limit', 50)), 500))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'meals': history.list_requests(user_id, since, until, limit)})
+
+@app.route('/history/daily')
+def meal_history_daily():
+    """Calories and servings per UTC day and class (?since=, ?until=, ?class=), default last 7 days"""
+    user_id, error = _history_user()
+    if error:
+        return error
+    try:
+        until = parse_time(request.args.get('until'), time.time())
+        since = parse_time(request.args.get('since'), until - 6 * 86400)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'days': history.daily_totals(user_id, since, until, request.args.get('class'))})
+
+@app.route('/history/<meal_id>')
+def meal_history_entry(meal_id):
+    """One stored /detect result"""
+    user_id, error = _history_user()
+    if error:
+        return error
+    meal = history.get_meal(user_id, meal_id)
+    if meal is None:
+        return jsonify({'error': f'No meal {meal_id} in history'}), 404
+    return jsonify(meal)
 
 @app.route('/ingredients')
 def get_all_ingredients():
     """Get all available foods with ingredients"""
-    return jsonify({
+    etag = ingredients_manager.version
+    return _not_modified(etag) or _catalog_response({
         'foods': ingredients_manager.get_all_foods(),
         'count': len(ingredients_manager.ingredients)
-    })
+    }, etag)
 
 @app.route('/ingredients/<food_name>')
 def get_ingredients(food_name):
     """Get ingredients for specific food"""
-    ingredients = ingredients_manager.get_ingredients(food_name)
+    session_id = _session_id()
+    etag = ingredients_manager.session_version(session_id)
+    ingredients = ingredients_manager.get_ingredients(food_name, session_id)
     if ingredients:
-        return jsonify({'food': food_name, 'ingredients': ingredients})
+        return _not_modified(etag) or _catalog_response({'food': food_name, 'ingredients': ingredients}, etag)
     else:
         return jsonify({'error': f'No ingredients found for {food_name}'}), 404
 
+@app.route('/ingredients/bulk', methods=['GET', 'POST'])
+def get_ingredients_bulk():
+    """Ingredients and recipes for many foods in one call (GET ?foods=a,b or POST {"foods": [...]})"""
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or {}
+        foods = data.get('foods')
+        include = data.get('include', ['ingredients', 'recipes'])
+    else:
+        foods = [food for food in request.args.get('foods', '').split(',') if food.strip()]
+        include = request.args.get('include', 'ingredients,recipes').split(',')
+    
+    if not isinstance(foods, list) or not foods or not all(isinstance(food, str) for food in foods):
+        return jsonify({'error': 'foods must be a non-empty list of food names'}), 400
+    if len(foods) > MAX_BULK_FOODS:
+        return jsonify({'error': f'At most {MAX_BULK_FOODS} foods per request'}), 400
+    
+    session_id = _session_id()
+    etag = f"{ingredients_manager.session_version(session_id)}-{recipe_manager.version}"
+    cached = _not_modified(etag)
+    if cached:
+        return cached
+    
+    results, missing = {}, []
+    for food in foods:
+        entry = {}
+        if 'ingredients' in include:
+            entry['ingredients'] = ingredients_manager.get_ingredients(food, session_id)
+        if 'recipes' in include:
+            entry['recipe'] = recipe_manager.get_recipe(food)
+        if all(value is None for value in entry.values()):
+            missing.append(food)
+        results[food] = entry
+    return _catalog_response({'foods': results, 'missing': missing, 'version': etag}, etag)
+
 @app.route('/ingredients', methods=['POST'])
 def update_ingredients():
-    """Update ingredients for a food"""
+    """Update ingredients for a food in the shared catalog (admin only; saved to INGREDIENTS_FILE)"""
+    if not _is_admin_request():
+        return jsonify({'error': 'Forbidden'}), 403
     try:
         data = request.json
         food_name = data.get('food_name')
@@ -131,6 +622,9 @@ def update_ingredients():
             return jsonify({'error': 'food_name and ingredients are required'}), 400
         
         ingredients_manager.add_ingredients(food_name, ingredients)
+        # Persist to the watched file, or the next catalog reload would discard the change
+        if not ingredients_manager.save_to_json(INGREDIENTS_FILE):
+            return jsonify({'error': f'Ingredients updated but could not be saved to {INGREDIENTS_FILE}'}), 500
         return jsonify({'message': f'Ingredients updated for {food_name}'})
         
     except Exception as e:
@@ -138,7 +632,7 @@ def update_ingredients():
 
 @app.route('/ingredients/quantity', methods=['POST'])
 def update_quantity():
-    """Update quantity for a specific ingredient"""
+    """Update quantity for a specific ingredient, for the caller's session only"""
     try:
         data = request.json
         food_name = data.get('food_name')
@@ -148,7 +642,8 @@ def update_quantity():
         if not all([food_name, ingredient_name, new_quantity]):
             return jsonify({'error': 'food_name, ingredient_name, and quantity are required'}), 400
         
-        success = ingredients_manager.update_quantity(food_name, ingredient_name, new_quantity)
+        success = ingredients_manager.update_quantity(food_name, ingredient_name, new_quantity,
+                                                      session_id=_session_id(create=True))
         if success:
             return jsonify({'message': f'Quantity updated for {ingredient_name}'})
         else:
@@ -157,7 +652,36 @@ def update_quantity():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/ingredients/quantity/bulk', methods=['POST'])
+def update_quantities_bulk():
+    """Apply many quantity updates in one all-or-nothing transaction, for the caller's session"""
+    try:
+        data = request.get_json(silent=True) or {}
+        updates = data.get('updates')
+        if not isinstance(updates, list) or not updates:
+            return jsonify({'error': 'updates must be a non-empty list'}), 400
+        
+        parsed = []
+        for update in updates:
+            if not isinstance(update, dict) or not all(update.get(k) for k in ('food_name', 'ingredient_name', 'quantity')):
+                return jsonify({'error': 'Each update needs food_name, ingredient_name, and quantity'}), 400
+            parsed.append((update['food_name'], update['ingredient_name'], str(update['quantity'])))
+        
+        session_id = _session_id(create=True)
+        missing = ingredients_manager.update_quantities(parsed, session_id=session_id)
+        if missing:
+            return jsonify({
+                'error': 'Some ingredients were not found; no quantities were updated',
+                'missing': [{'food_name': food, 'ingredient_name': name} for food, name in missing]
+            }), 404
+        return jsonify({'message': f'Updated {len(parsed)} quantities',
+                        'version': ingredients_manager.session_version(session_id)})
+        
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 if __name__ == '__main__':
     # Create templates directory if it doesn't exist
     os.makedirs('templates', exist_ok=True)
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    # PORT lets several instances run side by side behind router.py
+    app.run(debug=True, host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Frontend Asset Pipeline for Food Detection App
+Fingerprinted, precompressed CSS/JS and an HTML shell rendered once at startup
+"""
+
+import gzip
+import hashlib
+import os
+import re
+from typing import Dict, Iterable, Optional
+
+from flask import Response
+
+from http_utils import choose_encoding
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ASSET_FILES = ('css/app.css', 'js/app.js')
+# Fingerprinted names change with their content, so browsers may keep them forever
+IMMUTABLE = 'public, max-age=31536000, immutable'
+# The shell is small; revalidating it is one 304 that picks up new fingerprints after a deploy
+REVALIDATE = 'no-cache'
+
+MIMETYPES = {'.css': 'text/css', '.js': 'application/javascript', '.html': 'text/html'}
+# Names _write() produces: app.3f2a9c1b7d4e.css and its .gz/.br copies
+FINGERPRINTED = re.compile(r'^.+\.[0-9a-f]{12}\.[^.]+(\.gz|\.br)?$')
+
+
+class Precompressed:
+    """
+    A response body held in memory as identity, gzip and (if installed) brotli bytes
+
+    Args:
+        data: Uncompressed body
+        mimetype: Content type
+    """
+
+    def __init__(self, data: bytes, mimetype: str):
+        self.mimetype = mimetype
+        self.digest = hashlib.sha1(data).hexdigest()[:12]
+        self.variants = {None: data, 'gzip': gzip.compress(data, compresslevel=9, mtime=0)}
+        if brotli is not None:
+            self.variants['br'] = brotli.compress(data, quality=11)
+
+    def etag(self, encoding: Optional[str]) -> str:
+        # Each encoding is a different representation and needs its own strong ETag
+        return f"{self.digest}-{encoding}" if encoding else self.digest
+
+    def response(self, accept_encoding: str, if_none_match=None, cache_control: str = IMMUTABLE) -> Response:
+        """
+        Response with the best variant the client accepts, or an empty 304 if its copy is current
+        """
+        encoding = choose_encoding(accept_encoding)
+        if encoding not in self.variants:
+            encoding = None
+        etag = self.etag(encoding)
+        not_modified = if_none_match is not None and etag in if_none_match
+        response = Response(b'' if not_modified else self.variants[encoding], status=304 if not_modified else 200,
+                            mimetype=self.mimetype)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = cache_control
+        response.vary.add('Accept-Encoding')
+        if encoding and not not_modified:
+            response.headers['Content-Encoding'] = encoding
+        return response
+
+
+class AssetBundle:
+    """
+    Fingerprint and precompress the frontend assets once
+
+    Each file in source_dir gets a content-hashed name (app.css ->
+    app.3f2a9c1b7d4e.css). The bytes are kept in memory for the app and
+    also written, with .gz/.br siblings, to dist_dir for a front proxy
+    that serves precompressed files.
+
+    Args:
+        source_dir: Directory with the asset sources
+        dist_dir: Output directory for fingerprinted files (None to skip writing)
+        files: Asset paths relative to source_dir
+        url_prefix: URL path the app serves assets under
+    """
+
+    def __init__(self, source_dir: str = 'static', dist_dir: Optional[str] = os.path.join('static', 'dist'),
+                 files: Iterable[str] = ASSET_FILES, url_prefix: str = '/assets'):
+        self.url_prefix = url_prefix
+        self.manifest: Dict[str, str] = {}
+        self.assets: Dict[str, Precompressed] = {}
+        for path in files:
+            with open(os.path.join(source_dir, path), 'rb') as f:
+                data = f.read()
+            root, ext = os.path.splitext(os.path.basename(path))
+            asset = Precompressed(data, MIMETYPES.get(ext, 'application/octet-stream'))
+            name = f"{root}.{asset.digest}{ext}"
+            self.manifest[path] = name
+            self.assets[name] = asset
+        if dist_dir:
+            self._write(dist_dir)
+
+    def _write(self, dist_dir: str):
+        os.makedirs(dist_dir, exist_ok=True)
+        suffixes = {None: '', 'gzip': '.gz', 'br': '.br'}
+        wanted = set()
+        for name, asset in self.assets.items():
+            for encoding, data in asset.variants.items():
+                filename = name + suffixes[encoding]
+                wanted.add(filename)
+                path = os.path.join(dist_dir, filename)
+                if not os.path.exists(path):
+                    # Per-process name: several workers may start at once
+                    tmp_path = f"{path}.{os.getpid()}.tmp"
+                    with open(tmp_path, 'wb') as f:
+                        f.write(data)
+                    os.replace(tmp_path, path)
+        # Drop fingerprints from earlier builds; leave other files (and other workers' temp files) alone
+        for filename in os.listdir(dist_dir):
+            if filename not in wanted and FINGERPRINTED.match(filename):
+                try:
+                    os.remove(os.path.join(dist_dir, filename))
+                except FileNotFoundError:
+                    pass
+
+    def url(self, path: str) -> str:
+        return f"{self.url_prefix}/{self.manifest[path]}"
+
+    def get(self, name: str) -> Optional[Precompressed]:
+        return self.assets.get(name)
+
+    def render_page(self, jinja_env, template: str, **context) -> Precompressed:
+        """
+        Render a template once with asset_url() bound to the fingerprinted names
+        """
+        html = jinja_env.get_template(template).render(asset_url=self.url, **context)
+        return Precompressed(html.encode('utf-8'), MIMETYPES['.html'])
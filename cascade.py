@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Two-Stage Model Cascade for Food Detection
+Run a nano model first and escalate only uncertain images to the full model
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import time
+from typing import List, Optional
+
+import cv2
+from torchvision.ops import box_iou
+
+NANO_MODEL = "best_nano.pt"
+NANO_RUN_NAME = "custom_foods_nano"
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+class CascadeDetector:
+    """
+    Small model first; the large model only sees images the small one is unsure about
+
+    Args:
+        small_model: Nano YOLO model trained on the same classes
+        large_model: Full YOLO model (best.pt)
+        accept_conf: Small-model boxes at or above this confidence are trusted
+        min_conf: Small-model boxes below this are treated as noise; boxes
+            between min_conf and accept_conf escalate the image
+        ambiguous_iou: Overlapping boxes of different classes above this IoU escalate
+        escalate_empty: Also escalate images where the small model finds nothing
+        small_imgsz: Inference size for the small model
+
+    Raises:
+        ValueError: If the two models' class names differ (class filters and
+            accepted labels would mean different foods)
+    """
+
+    def __init__(self, small_model, large_model, accept_conf: float = 0.6, min_conf: float = 0.15,
+                 ambiguous_iou: float = 0.5, escalate_empty: bool = False, small_imgsz: int = 640):
+        if dict(small_model.names) != dict(large_model.names):
+            raise ValueError("Cascade models must have the same class names; "
+                             f"small has {len(small_model.names)}, large has {len(large_model.names)}")
+        self.small_model = small_model
+        self.large_model = large_model
+        self.accept_conf = accept_conf
+        self.min_conf = min_conf
+        self.ambiguous_iou = ambiguous_iou
+        self.escalate_empty = escalate_empty
+        self.small_imgsz = small_imgsz
+
+    def escalation_reason(self, boxes) -> Optional[str]:
+        """
+        Why the small model's boxes are not good enough, or None to accept them
+        """
+        if len(boxes) == 0:
+            return 'empty' if self.escalate_empty else None
+        conf = boxes.conf
+        if bool(((conf >= self.min_conf) & (conf < self.accept_conf)).any()):
+            return 'low_confidence'
+        if len(boxes) > 1:
+            iou = box_iou(boxes.xyxy, boxes.xyxy)
+            different_class = boxes.cls[:, None] != boxes.cls[None, :]
+            if bool(((iou > self.ambiguous_iou) & different_class).any()):
+                return 'ambiguous'
+        return None
+
+    def __call__(self, image, imgsz: int = 640, conf: float = 0.25, **predict_kwargs):
+        """
+        Detect with the cascade
+
+        Returns:
+            (results like model(image), escalation reason or None if the small model's answer was kept)
+        """
+        small = self.small_model(image, imgsz=self.small_imgsz, conf=min(conf, self.min_conf),
+                                 verbose=False, **predict_kwargs)[0]
+        reason = self.escalation_reason(small.boxes)
+        if reason is None:
+            return [small[small.boxes.conf >= conf]], None
+        return self.large_model(image, imgsz=imgsz, conf=conf, verbose=False, **predict_kwargs), reason
+
+
+def _match_rate(reference, candidate, iou: float = 0.5) -> float:
+    """
+    Fraction of reference boxes matched by a same-class candidate box (1.0 if both are empty)
+    """
+    if len(reference) == 0:
+        return 1.0 if len(candidate) == 0 else 0.0
+    if len(candidate) == 0:
+        return 0.0
+    overlaps = box_iou(reference.xyxy, candidate.xyxy)
+    same_class = reference.cls[:, None] == candidate.cls[None, :]
+    return float(((overlaps >= iou) & same_class).any(dim=1).float().mean())
+
+
+def evaluate_cascade(cascade: CascadeDetector, image_dir: str, imgsz: int = 640, conf: float = 0.25,
+                     limit: Optional[int] = None) -> dict:
+    """
+    Compare the cascade against the large model alone on a folder of images
+
+    Returns:
+        Escalation rate, mean latency of both paths, and how well accepted
+        (non-escalated) answers agree with the large model
+    """
+    files = sorted(f for f in os.listdir(image_dir) if f.lower().endswith(IMAGE_EXTENSIONS))[:limit]
+    escalations = {}
+    large_times, cascade_times, agreement = [], [], []
+    for name in files:
+        image = cv2.imread(os.path.join(image_dir, name))
+        if image is None:
+            continue
+        start = time.perf_counter()
+        large = cascade.large_model(image, imgsz=imgsz, conf=conf, verbose=False)[0]
+        large_times.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        results, reason = cascade(image, imgsz=imgsz, conf=conf)
+        cascade_times.append(time.perf_counter() - start)
+        if reason:
+            escalations[reason] = escalations.get(reason, 0) + 1
+        else:
+            small = results[0].boxes
+            agreement.append(min(_match_rate(large.boxes, small), _match_rate(small, large.boxes)))
+
+    images = len(large_times)
+    return {
+        'images': images,
+        'escalation_rate': round(sum(escalations.values()) / images, 3) if images else 0.0,
+        'escalations': escalations,
+        'large_ms': round(1000 * sum(large_times) / images, 1) if images else 0.0,
+        'cascade_ms': round(1000 * sum(cascade_times) / images, 1) if images else 0.0,
+        'accepted_agreement': round(sum(agreement) / len(agreement), 3) if agreement else None,
+    }
+
+
+def train_nano(epochs: int = 100, config_file: Optional[str] = None, overrides: Optional[dict] = None) -> Optional[str]:
+    """
+    Fine-tune a YOLOv8n on the same dataset and copy it to best_nano.pt
+    """
+    from train_custom_model import train_custom_model
+
+    best_model = train_custom_model(config_file, dict(overrides or {}, model='yolov8n.pt', name=NANO_RUN_NAME,
+                                                      epochs=epochs))
+    if best_model:
+        shutil.copy2(best_model, NANO_MODEL)
+        print(f"✅ Nano model ready for the cascade: {NANO_MODEL}")
+    return best_model
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Train and evaluate the nano -> full model cascade")
+    sub = parser.add_subparsers(dest="command", required=True)
+    train = sub.add_parser("train", help="Train the nano model on the food dataset")
+    train.add_argument("--epochs", type=int, default=100)
+    train.add_argument("--preset", choices=('default', 'cpu'))
+    evaluate = sub.add_parser("evaluate", help="Measure escalation rate, speed and agreement")
+    evaluate.add_argument("--small", default=NANO_MODEL)
+    evaluate.add_argument("--large", default="best.pt")
+    evaluate.add_argument("--images", default="dataset/images/valid")
+    evaluate.add_argument("--accept-conf", type=float, default=0.6)
+    evaluate.add_argument("--min-conf", type=float, default=0.15)
+    evaluate.add_argument("--ambiguous-iou", type=float, default=0.5)
+    evaluate.add_argument("--limit", type=int)
+    args = parser.parse_args(argv)
+
+    if args.command == "train":
+        print("🐣 TRAINING NANO MODEL FOR THE CASCADE")
+        print("=" * 50)
+        return 0 if train_nano(args.epochs, overrides={'preset': args.preset}) else 1
+
+    from ultralytics import YOLO
+
+    cascade = CascadeDetector(YOLO(args.small), YOLO(args.large), args.accept_conf, args.min_conf,
+                              args.ambiguous_iou)
+    report = evaluate_cascade(cascade, args.images, limit=args.limit)
+    print(f"🖼️  Images: {report['images']}")
+    print(f"⬆️  Escalated: {report['escalation_rate']:.1%} {report['escalations']}")
+    print(f"⏱️  Full model: {report['large_ms']}ms  Cascade: {report['cascade_ms']}ms per image")
+    print(f"🎯 Agreement with full model on accepted images: {report['accepted_agreement']}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
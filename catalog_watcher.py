@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Catalog Hot Reload for Food Detection App
+Polls ingredient/recipe files and swaps in freshly parsed snapshots from a background thread
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Callable, Dict, List, Optional
+
+logger = logging.getLogger('nutrispike.catalog')
+
+# Files modified more recently than this may still be being written; wait a round
+SETTLE_SECONDS = 0.5
+
+
+def _signature(path: str):
+    """
+    (inode, mtime, size) of a file, or None if it does not exist; atomic renames change the inode
+    """
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return st.st_ino, st.st_mtime_ns, st.st_size
+
+
+class CatalogWatcher:
+    """
+    Reload catalog files when they change
+
+    Parsing happens on the watcher thread, never on a request thread; the
+    apply callback publishes the result (a snapshot swap), so requests keep
+    reading the old snapshot until the new one is complete. A file that fails
+    to parse leaves the live catalog untouched.
+
+    Args:
+        interval: Seconds between polls
+        on_reload: Optional callback(name, diff or None, error or None)
+    """
+
+    def __init__(self, interval: float = 2.0, on_reload: Optional[Callable] = None):
+        self.interval = interval
+        self.on_reload = on_reload
+        self._watches: List[Dict] = []
+        self._stop = threading.Event()
+        self._thread = None
+
+    def watch(self, name: str, path: str, parse: Callable[[str], object], apply: Callable[[object], Dict],
+              load_now: bool = True):
+        """
+        Register a file
+
+        Args:
+            name: Label for logs and metrics
+            path: File to watch (may not exist yet)
+            parse: path -> parsed catalog; raise to reject the file
+            apply: parsed catalog -> diff dict; publishes the snapshot
+            load_now: Load the file immediately if it exists
+        """
+        watch = {'name': name, 'path': path, 'parse': parse, 'apply': apply, 'signature': None}
+        self._watches.append(watch)
+        if load_now:
+            self._check(watch, settle=0)
+        else:
+            watch['signature'] = _signature(path)
+
+    def _check(self, watch: Dict, settle: float = SETTLE_SECONDS) -> Optional[Dict]:
+        signature = _signature(watch['path'])
+        if signature is None or signature == watch['signature']:
+            return None
+        if time.time() - signature[1] / 1e9 < settle:
+            return None
+        watch['signature'] = signature
+        try:
+            diff = watch['apply'](watch['parse'](watch['path']))
+        except Exception as e:
+            logger.warning("Keeping the current %s catalog; %s failed to load: %s", watch['name'], watch['path'], e)
+            if self.on_reload:
+                self.on_reload(watch['name'], None, e)
+            return None
+        if any(diff.values()):
+            logger.info("Reloaded %s from %s: %d added, %d removed, %d changed", watch['name'], watch['path'],
+                        len(diff['added']), len(diff['removed']), len(diff['changed']))
+        if self.on_reload:
+            self.on_reload(watch['name'], diff, None)
+        return diff
+
+    def check(self) -> Dict[str, Dict]:
+        """
+        Poll every file once; returns the diffs of catalogs that were reloaded
+        """
+        diffs = {}
+        for watch in self._watches:
+            diff = self._check(watch)
+            if diff is not None:
+                diffs[watch['name']] = diff
+        return diffs
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def start(self):
+        if self._thread is None and self.interval > 0:
+            self._thread = threading.Thread(target=self._run, name='catalog-watcher', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -6,9 +6,14 @@ Add your own food images and labels to the existing model
 
 import os
 import shutil
+import hashlib
 import yaml
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+# Classes the shipped best.pt was trained on, in class id order
+BASE_CLASSES = ['Apple', 'Chapathi', 'Chicken Gravy', 'Fries', 'Idli', 'Pizza', 'Rice', 'Soda', 'Tomato', 'Vada', 'banana', 'burger']
+
 def setup_custom_dataset():
     """
     Set up the directory structure for your custom dataset
@@ -34,40 +39,153 @@ def setup_custom_dataset():
     
     return custom_dir
 
-def copy_existing_dataset(custom_dir):
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+# Linux FICLONE ioctl (copy-on-write clone on btrfs/XFS)
+_FICLONE = 0x40049409
+
+def file_digest(path):
+    """
+    Content hash of a file, read in 1 MiB chunks
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _same_content(src, dst):
+    """
+    True if dst already holds the same bytes as src
+    """
+    if not os.path.exists(dst):
+        return False
+    if os.path.samefile(src, dst):
+        return True
+    if os.path.getsize(src) != os.path.getsize(dst):
+        return False
+    return file_digest(src) == file_digest(dst)
+
+def _reflink(src, dst):
+    try:
+        import fcntl
+    except ImportError:
+        raise OSError("reflink is not supported on this platform")
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+    shutil.copystat(src, dst)
+
+def link_or_copy(src, dst, link_mode):
+    """
+    Put src at dst by hardlink, reflink or copy, skipping identical files
+
+    Returns:
+        'skipped', 'hardlink', 'reflink' or 'copy'
+    """
+    if _same_content(src, dst):
+        return 'skipped'
+    
+    # Build next to the destination and swap in, so a failed link never leaves half a file
+    tmp = f"{dst}.tmp-{os.getpid()}"
+    attempts = {'auto': ('hardlink', 'reflink', 'copy'), 'hardlink': ('hardlink', 'copy'),
+                'reflink': ('reflink', 'copy'), 'copy': ('copy',)}[link_mode]
+    for method in attempts:
+        try:
+            if method == 'hardlink':
+                os.link(src, tmp)
+            elif method == 'reflink':
+                _reflink(src, tmp)
+            else:
+                shutil.copy2(src, tmp)
+            os.replace(tmp, dst)
+            return method
+        except OSError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            if method == 'copy':
+                raise
+    return 'copy'
+
+def _validate_pairs(image_files, label_files):
+    """
+    Match images and YOLO label files by stem
+    
+    Returns:
+        (images without labels, labels without images)
+    """
+    image_stems = {os.path.splitext(f)[0] for f in image_files}
+    label_stems = {os.path.splitext(f)[0] for f in label_files}
+    return sorted(image_stems - label_stems), sorted(label_stems - image_stems)
+
+def copy_existing_dataset(custom_dir, link_mode='auto', workers=None):
     """
     Copy existing dataset to new structure
+    
+    Images are hardlinked (or reflinked) where the filesystem allows so the
+    merged dataset does not double disk usage; label files are always copied
+    because labeling tools edit them in place. Files whose content already
+    matches are skipped and all transfers run in parallel.
+    
+    Args:
+        custom_dir: Destination dataset directory
+        link_mode: 'auto', 'hardlink', 'reflink' or 'copy'
+        workers: Thread pool size (default: scaled to CPU count)
+    
+    Returns:
+        Dictionary with per-method counts and per-split pairing problems
     """
     print("\n📁 Copying existing dataset...")
     
-    # Copy existing images and labels
-    for split in ['train', 'valid', 'test']:
-        # Copy images
-        src_images = f"dataset/images/{split}"
-        dst_images = f"{custom_dir}/images/{split}"
-        
-        if os.path.exists(src_images):
-            for file in os.listdir(src_images):
-                if file.endswith(('.jpg', '.jpeg', '.png')):
-                    shutil.copy2(f"{src_images}/{file}", f"{dst_images}/{file}")
-            print(f"✅ Copied images from {split}")
-        
-        # Copy labels
-        src_labels = f"dataset/labels/{split}"
-        dst_labels = f"{custom_dir}/labels/{split}"
-        
-        if os.path.exists(src_labels):
-            for file in os.listdir(src_labels):
-                if file.endswith('.txt'):
-                    shutil.copy2(f"{src_labels}/{file}", f"{dst_labels}/{file}")
-            print(f"✅ Copied labels from {split}")
+    if link_mode not in ('auto', 'hardlink', 'reflink', 'copy'):
+        raise ValueError(f"Unknown link_mode: {link_mode}")
+    workers = workers or min(32, (os.cpu_count() or 1) * 4)
+    
+    stats = {'skipped': 0, 'hardlink': 0, 'reflink': 0, 'copy': 0, 'unpaired': {}}
+    
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for split in ['train', 'valid', 'test']:
+            src_images = f"dataset/images/{split}"
+            dst_images = f"{custom_dir}/images/{split}"
+            src_labels = f"dataset/labels/{split}"
+            dst_labels = f"{custom_dir}/labels/{split}"
+            
+            image_files = [f for f in os.listdir(src_images) if f.endswith(IMAGE_EXTENSIONS)] \
+                if os.path.exists(src_images) else []
+            label_files = [f for f in os.listdir(src_labels) if f.endswith('.txt')] \
+                if os.path.exists(src_labels) else []
+            
+            jobs = [pool.submit(link_or_copy, f"{src_images}/{file}", f"{dst_images}/{file}", link_mode)
+                    for file in image_files]
+            label_mode = 'copy' if link_mode in ('auto', 'hardlink') else link_mode
+            jobs += [pool.submit(link_or_copy, f"{src_labels}/{file}", f"{dst_labels}/{file}", label_mode)
+                     for file in label_files]
+            
+            # Validate pairing while the transfers run
+            missing_labels, missing_images = _validate_pairs(image_files, label_files)
+            
+            for job in jobs:
+                stats[job.result()] += 1
+            
+            if image_files:
+                print(f"✅ Copied images from {split}")
+            if label_files:
+                print(f"✅ Copied labels from {split}")
+            if missing_labels or missing_images:
+                stats['unpaired'][split] = {'images_without_labels': missing_labels,
+                                            'labels_without_images': missing_images}
+                print(f"⚠️  {split}: {len(missing_labels)} images without labels, "
+                      f"{len(missing_images)} labels without images")
+    
+    print(f"📊 Linked {stats['hardlink'] + stats['reflink']}, copied {stats['copy']}, "
+          f"skipped {stats['skipped']} unchanged files")
+    return stats
 
 def get_custom_foods():
     """
     Get custom food classes from user
     """
     print("\n🍽️ Current food classes in your model:")
-    current_classes = ['Apple', 'Chapathi', 'Chicken Gravy', 'Fries', 'Idli', 'Pizza', 'Rice', 'Soda', 'Tomato', 'Vada', 'banana', 'burger']
+    current_classes = BASE_CLASSES
     
     for i, food in enumerate(current_classes, 1):
         print(f"{i:2d}. {food}")
@@ -93,8 +211,8 @@ def create_custom_config(custom_foods, dataset_path):
     Create YAML configuration for custom dataset
     """
     # Current 12 classes + new custom classes
-    current_classes = ['Apple', 'Chapathi', 'Chicken Gravy', 'Fries', 'Idli', 'Pizza', 'Rice', 'Soda', 'Tomato', 'Vada', 'banana', 'burger']
-    all_classes = current_classes + custom_foods
+    current_classes = BASE_CLASSES
+    all_classes = list(current_classes) + custom_foods
     total_classes = len(all_classes)
     
     config_content = f"""# Custom Food Detection Dataset Configuration
@@ -152,7 +270,7 @@ def show_data_requirements(custom_foods, dataset_path):
     print("=" * 60)
     
     for i, food in enumerate(custom_foods, 1):
-        class_id = 11 + i  # Starting from ID 12 (after existing 12 classes)
+        class_id = len(BASE_CLASSES) - 1 + i  # Starting from ID 12 (after existing 12 classes)
         print(f"\n{i}. {food} (Class ID: {class_id})")
         print(f"   📸 Images needed: 50-100 photos")
         print(f"   📁 Add to: {dataset_path}/images/train/")
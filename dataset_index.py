@@ -0,0 +1,286 @@
+#!/usr/bin/env python3
+"""
+Dataset Indexer for Food Detection
+Parses YOLO label files in parallel into a compact NumPy table and validates them
+"""
+
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+SPLITS = ('train', 'valid', 'test')
+CACHE_FILE = ".dataset_index.npz"
+
+# One row per box: split index, image index within the split, class, normalized xywh
+LABEL_DTYPE = np.dtype([
+    ('split', np.uint8),
+    ('image', np.int32),
+    ('cls', np.int32),
+    ('x', np.float32),
+    ('y', np.float32),
+    ('w', np.float32),
+    ('h', np.float32),
+])
+
+# Coordinates may drift slightly past the image edge from rounding in export tools
+COORD_TOLERANCE = 1e-3
+
+
+def _parse_label_files(paths: Sequence[str]) -> List[Tuple[np.ndarray, int]]:
+    """
+    Parse a chunk of YOLO label files
+
+    Returns:
+        For each file: (float32 array of shape (n, 5), number of malformed lines)
+    """
+    parsed = []
+    for path in paths:
+        rows = []
+        malformed = 0
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                parts = line.split()
+                if not parts:
+                    continue
+                if len(parts) != 5:
+                    malformed += 1
+                    continue
+                try:
+                    rows.append([float(p) for p in parts])
+                except ValueError:
+                    malformed += 1
+        parsed.append((np.asarray(rows, dtype=np.float32).reshape(-1, 5), malformed))
+    return parsed
+
+
+class DatasetIndex:
+    def __init__(self, dataset_dir: str, splits: Sequence[str] = SPLITS):
+        """
+        Index of all images and YOLO labels of a dataset
+
+        Args:
+            dataset_dir: Directory containing images/<split> and labels/<split>
+            splits: Splits to index
+        """
+        self.dataset_dir = dataset_dir
+        self.splits = tuple(splits)
+        self.images: Dict[str, List[str]] = {}
+        self.orphan_labels: Dict[str, List[str]] = {}
+        self.labels = np.zeros(0, dtype=LABEL_DTYPE)
+        # Per split: image index -> whether a label file exists / malformed line count
+        self.has_label: Dict[str, np.ndarray] = {}
+        self.malformed: Dict[str, np.ndarray] = {}
+        self.from_cache = False
+
+    def _list_files(self) -> Tuple[Dict[str, List[str]], Dict[str, List[str]]]:
+        images, labels = {}, {}
+        for split in self.splits:
+            image_dir = os.path.join(self.dataset_dir, 'images', split)
+            label_dir = os.path.join(self.dataset_dir, 'labels', split)
+            images[split] = sorted(f for f in os.listdir(image_dir) if f.lower().endswith(IMAGE_EXTENSIONS)) \
+                if os.path.isdir(image_dir) else []
+            labels[split] = sorted(f for f in os.listdir(label_dir) if f.endswith('.txt')) \
+                if os.path.isdir(label_dir) else []
+        return images, labels
+
+    def _signature(self, images: Dict[str, List[str]], labels: Dict[str, List[str]]) -> str:
+        """
+        Hash of file names, sizes and mtimes; any change invalidates the cache
+        """
+        digest = hashlib.sha1()
+        for split in self.splits:
+            for kind, names in (('images', images[split]), ('labels', labels[split])):
+                for name in names:
+                    stat = os.stat(os.path.join(self.dataset_dir, kind, split, name))
+                    digest.update(f"{kind}/{split}/{name}:{stat.st_size}:{stat.st_mtime_ns}\n".encode())
+        return digest.hexdigest()
+
+    def build(self, workers: Optional[int] = None, use_cache: bool = True) -> "DatasetIndex":
+        """
+        Parse all label files, reusing the on-disk cache when nothing changed
+
+        Args:
+            workers: Process pool size (default: CPU count)
+            use_cache: Read and write the .dataset_index.npz cache
+        """
+        images, labels = self._list_files()
+        signature = self._signature(images, labels)
+        cache_path = os.path.join(self.dataset_dir, CACHE_FILE)
+
+        if use_cache and os.path.exists(cache_path):
+            try:
+                with np.load(cache_path, allow_pickle=False) as cached:
+                    meta = json.loads(str(cached['meta']))
+                    if meta['signature'] == signature and meta['splits'] == list(self.splits):
+                        self.images = meta['images']
+                        self.orphan_labels = meta['orphan_labels']
+                        self.labels = cached['labels']
+                        self.has_label = {s: cached[f'has_label_{s}'] for s in self.splits}
+                        self.malformed = {s: cached[f'malformed_{s}'] for s in self.splits}
+                        self.from_cache = True
+                        return self
+            except (OSError, KeyError, ValueError):
+                pass
+
+        # Work out which label file belongs to which image
+        jobs = []
+        self.images = images
+        self.orphan_labels = {}
+        for split_id, split in enumerate(self.splits):
+            label_set = set(labels[split])
+            image_stems = set()
+            has_label = np.zeros(len(images[split]), dtype=bool)
+            for image_id, name in enumerate(images[split]):
+                stem = os.path.splitext(name)[0]
+                image_stems.add(stem)
+                if stem + '.txt' in label_set:
+                    has_label[image_id] = True
+                    jobs.append((split_id, image_id, os.path.join(self.dataset_dir, 'labels', split, stem + '.txt')))
+            self.has_label[split] = has_label
+            self.malformed[split] = np.zeros(len(images[split]), dtype=np.int32)
+            self.orphan_labels[split] = [f for f in labels[split] if os.path.splitext(f)[0] not in image_stems]
+
+        # Parse in chunks across processes; tiny datasets are parsed inline
+        paths = [path for _, _, path in jobs]
+        workers = workers or os.cpu_count() or 1
+        if len(paths) < 256 or workers == 1:
+            parsed = _parse_label_files(paths)
+        else:
+            chunk = max(64, len(paths) // (workers * 4))
+            chunks = [paths[i:i + chunk] for i in range(0, len(paths), chunk)]
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                parsed = [item for result in pool.map(_parse_label_files, chunks) for item in result]
+
+        tables = []
+        for (split_id, image_id, _), (rows, malformed) in zip(jobs, parsed):
+            self.malformed[self.splits[split_id]][image_id] = malformed
+            if len(rows):
+                table = np.empty(len(rows), dtype=LABEL_DTYPE)
+                table['split'] = split_id
+                table['image'] = image_id
+                table['cls'] = rows[:, 0].astype(np.int32)
+                for column, name in enumerate(('x', 'y', 'w', 'h'), start=1):
+                    table[name] = rows[:, column]
+                tables.append(table)
+        self.labels = np.concatenate(tables) if tables else np.zeros(0, dtype=LABEL_DTYPE)
+        self.from_cache = False
+
+        if use_cache:
+            meta = {'signature': signature, 'splits': list(self.splits),
+                    'images': self.images, 'orphan_labels': self.orphan_labels}
+            arrays = {f'has_label_{s}': self.has_label[s] for s in self.splits}
+            arrays.update({f'malformed_{s}': self.malformed[s] for s in self.splits})
+            try:
+                with open(cache_path, 'wb') as f:
+                    np.savez(f, meta=np.array(json.dumps(meta)), labels=self.labels, **arrays)
+            except OSError:
+                pass
+        return self
+
+    def report(self, nc: int, names: Optional[Sequence[str]] = None) -> Dict:
+        """
+        Validate the indexed labels in one vectorized pass
+
+        Args:
+            nc: Number of classes in the dataset config
+            names: Optional class names for the class balance table
+
+        Returns:
+            Dictionary with counts, class balance, and lists of problems; 'errors'
+            is True when training would silently learn from bad data
+        """
+        labels = self.labels
+        x, y, w, h = labels['x'], labels['y'], labels['w'], labels['h']
+        lo, hi = -COORD_TOLERANCE, 1 + COORD_TOLERANCE
+        bad_coords = ((x < lo) | (x > hi) | (y < lo) | (y > hi) | (w <= 0) | (h <= 0) |
+                      (x - w / 2 < lo) | (x + w / 2 > hi) | (y - h / 2 < lo) | (y + h / 2 > hi))
+        bad_class = (labels['cls'] < 0) | (labels['cls'] >= nc)
+
+        def files_for(mask):
+            keys = np.unique(labels['split'][mask].astype(np.int64) << 32 | labels['image'][mask])
+            return [f"{self.splits[k >> 32]}/{self.images[self.splits[k >> 32]][k & 0xFFFFFFFF]}"
+                    for k in keys.tolist()]
+
+        valid_cls = labels['cls'][~bad_class]
+        balance = {}
+        for split_id, split in enumerate(self.splits):
+            counts = np.bincount(valid_cls[labels['split'][~bad_class] == split_id], minlength=nc)
+            balance[split] = {(names[c] if names is not None and c < len(names) else str(c)): int(n)
+                              for c, n in enumerate(counts)}
+
+        orphan_images = {split: [self.images[split][i] for i in np.flatnonzero(~self.has_label[split])]
+                         for split in self.splits}
+        malformed = {split: [self.images[split][i] for i in np.flatnonzero(self.malformed[split])]
+                     for split in self.splits}
+
+        return {
+            'images': {split: len(self.images[split]) for split in self.splits},
+            'boxes': int(len(labels)),
+            'class_balance': balance,
+            'orphan_images': orphan_images,
+            'orphan_labels': self.orphan_labels,
+            'malformed_files': malformed,
+            'out_of_range_files': files_for(bad_coords),
+            'bad_class_files': files_for(bad_class),
+            'bad_class_ids': sorted(set(labels['cls'][bad_class].tolist())),
+            'errors': bool(bad_coords.any() or bad_class.any()
+                           or any(self.orphan_labels.values()) or any(malformed.values())),
+        }
+
+
+def print_report(report: Dict, limit: int = 5):
+    """
+    Print a validation report produced by DatasetIndex.report
+    """
+    print(f"📊 Images: {report['images']}  Boxes: {report['boxes']}")
+    for split, balance in report['class_balance'].items():
+        if report['images'].get(split):
+            counts = ", ".join(f"{name}: {count}" for name, count in balance.items())
+            print(f"   {split}: {counts}")
+
+    def show(title, items):
+        if items:
+            print(f"⚠️  {title}: {len(items)}")
+            for item in items[:limit]:
+                print(f"     - {item}")
+            if len(items) > limit:
+                print(f"     ... and {len(items) - limit} more")
+
+    for split in report['images']:
+        show(f"{split} images without labels (treated as background)", report['orphan_images'][split])
+        show(f"{split} labels without images", report['orphan_labels'][split])
+        show(f"{split} files with malformed lines", report['malformed_files'][split])
+    show("Files with out-of-range boxes", report['out_of_range_files'])
+    if report['bad_class_ids']:
+        print(f"❌ Class ids beyond nc: {report['bad_class_ids']}")
+    show("Files with invalid class ids", report['bad_class_files'])
+    print("❌ Dataset has errors" if report['errors'] else "✅ Labels look valid")
+
+
+def validate_dataset(dataset_dir: str, nc: int, names: Optional[Sequence[str]] = None,
+                     workers: Optional[int] = None) -> Tuple[DatasetIndex, Dict]:
+    """
+    Index a dataset and return it together with its validation report
+    """
+    index = DatasetIndex(dataset_dir).build(workers=workers)
+    return index, index.report(nc, names)
+
+
+if __name__ == "__main__":
+    import argparse
+    import yaml
+
+    parser = argparse.ArgumentParser(description="Validate YOLO labels and show dataset statistics")
+    parser.add_argument("config", nargs="?", default="custom_food_config.yaml", help="Dataset YAML config")
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    with open(args.config, 'r') as f:
+        config = yaml.safe_load(f)
+    _, result = validate_dataset(config['path'], config['nc'], config.get('names'), args.workers)
+    print_report(result)
@@ -0,0 +1,477 @@
+#!/usr/bin/env python3
+"""
+Cached-Prediction Evaluator for Food Detection
+Run the model once per model version, then compute mAP, PR curves, confusion
+matrices and threshold sweeps from the cached predictions with NumPy
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import yaml
+
+from custom_dataset_setup import file_digest
+from dataset_index import DatasetIndex
+
+EVAL_CACHE_DIR = ".eval_cache"
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+
+# Cached predictions are nearly raw: tiny conf floor and NMS that only drops
+# near-duplicates, so any stricter conf/iou can be re-applied later
+CACHE_CONF = 0.001
+CACHE_IOU = 0.95
+CACHE_MAX_DET = 1000
+
+# np.trapz was renamed in NumPy 2.0
+_trapezoid = getattr(np, 'trapezoid', None) or np.trapz
+
+
+def box_iou(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Pairwise IoU of (n, 4) and (m, 4) xyxy boxes -> (n, m)
+    """
+    lt = np.maximum(a[:, None, :2], b[None, :, :2])
+    rb = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.prod(np.clip(rb - lt, 0, None), axis=2)
+    area_a = np.prod(a[:, 2:] - a[:, :2], axis=1)
+    area_b = np.prod(b[:, 2:] - b[:, :2], axis=1)
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, classes: np.ndarray, iou: float) -> np.ndarray:
+    """
+    Class-aware greedy NMS without a per-box Python loop
+
+    A box survives if no higher-scoring surviving box of its class overlaps it
+    above iou. Starting from "all kept", re-evaluating that rule on the whole
+    IoU matrix converges to the greedy result after a few iterations.
+
+    Returns:
+        Indices of kept boxes, highest score first
+    """
+    order = np.argsort(-scores, kind='stable')
+    if len(order) <= 1:
+        return order
+    b, c = boxes[order], classes[order]
+    suppresses = np.triu(box_iou(b, b) > iou, k=1) & (c[:, None] == c[None, :])
+    keep = np.ones(len(order), dtype=bool)
+    while True:
+        new_keep = ~(suppresses & keep[:, None]).any(axis=0)
+        if np.array_equal(new_keep, keep):
+            return order[keep]
+        keep = new_keep
+
+
+def match_predictions(pred_boxes: np.ndarray, pred_cls: np.ndarray, gt_boxes: np.ndarray, gt_cls: np.ndarray,
+                      iou_thresholds: np.ndarray = IOU_THRESHOLDS) -> np.ndarray:
+    """
+    True-positive matrix (n_pred, n_thresholds): each ground-truth box matches
+    at most one same-class prediction, highest IoU first (as in Ultralytics val)
+    """
+    correct = np.zeros((len(pred_boxes), len(iou_thresholds)), dtype=bool)
+    if len(pred_boxes) == 0 or len(gt_boxes) == 0:
+        return correct
+    iou = box_iou(gt_boxes, pred_boxes) * (gt_cls[:, None] == pred_cls[None, :])
+    for t, threshold in enumerate(iou_thresholds):
+        gt_idx, pred_idx = np.nonzero(iou >= threshold)
+        if len(gt_idx) == 0:
+            continue
+        order = np.argsort(-iou[gt_idx, pred_idx], kind='stable')
+        gt_idx, pred_idx = gt_idx[order], pred_idx[order]
+        _, first = np.unique(pred_idx, return_index=True)
+        gt_idx, pred_idx = gt_idx[first], pred_idx[first]
+        order = np.argsort(-iou[gt_idx, pred_idx], kind='stable')
+        gt_idx, pred_idx = gt_idx[order], pred_idx[order]
+        _, first = np.unique(gt_idx, return_index=True)
+        correct[pred_idx[first], t] = True
+    return correct
+
+
+def compute_ap(recall: np.ndarray, precision: np.ndarray):
+    """
+    COCO 101-point interpolated AP
+
+    Returns:
+        (ap, recall envelope, precision envelope)
+    """
+    mrec = np.concatenate(([0.0], recall, [1.0]))
+    mpre = np.concatenate(([1.0], precision, [0.0]))
+    mpre = np.flip(np.maximum.accumulate(np.flip(mpre)))
+    x = np.linspace(0, 1, 101)
+    return float(_trapezoid(np.interp(x, mrec, mpre), x)), mrec, mpre
+
+
+def ap_per_class(tp: np.ndarray, conf: np.ndarray, pred_cls: np.ndarray, gt_cls: np.ndarray, nc: int) -> Dict:
+    """
+    Per-class AP at every IoU threshold plus PR and F1-confidence curves
+
+    Args:
+        tp: (n_pred, n_thresholds) true-positive matrix
+        conf: (n_pred,) confidences
+        pred_cls: (n_pred,) predicted classes
+        gt_cls: (n_gt,) ground-truth classes
+        nc: Number of classes
+
+    Returns:
+        Dictionary with ap (nc, T), curve grid px, precision/recall/f1 vs
+        confidence (nc, 1000), PR curve at IoU 0.5 (nc, 1000) and per-class
+        precision/recall at the confidence maximizing mean F1
+    """
+    order = np.argsort(-conf, kind='stable')
+    tp, conf, pred_cls = tp[order], conf[order], pred_cls[order]
+    gt_counts = np.bincount(gt_cls.astype(np.int64), minlength=nc)[:nc]
+
+    px = np.linspace(0, 1, 1000)
+    ap = np.zeros((nc, tp.shape[1]))
+    p_curve, r_curve, pr_curve = np.zeros((nc, 1000)), np.zeros((nc, 1000)), np.zeros((nc, 1000))
+    for c in range(nc):
+        mask = pred_cls == c
+        n_gt, n_pred = gt_counts[c], int(mask.sum())
+        if n_pred == 0 or n_gt == 0:
+            continue
+        tpc = tp[mask].cumsum(axis=0)
+        fpc = (1 - tp[mask]).cumsum(axis=0)
+        recall = tpc / (n_gt + 1e-16)
+        precision = tpc / (tpc + fpc)
+        # Curves against confidence (x decreasing, hence the negations)
+        r_curve[c] = np.interp(-px, -conf[mask], recall[:, 0], left=0)
+        p_curve[c] = np.interp(-px, -conf[mask], precision[:, 0], left=1)
+        for t in range(tp.shape[1]):
+            ap[c, t], mrec, mpre = compute_ap(recall[:, t], precision[:, t])
+            if t == 0:
+                pr_curve[c] = np.interp(px, mrec, mpre)
+
+    f1_curve = 2 * p_curve * r_curve / (p_curve + r_curve + 1e-16)
+    present = gt_counts > 0
+    best = int(f1_curve[present].mean(axis=0).argmax()) if present.any() else 0
+    return {
+        'ap': ap, 'px': px, 'precision_curve': p_curve, 'recall_curve': r_curve, 'f1_curve': f1_curve,
+        'pr_curve': pr_curve, 'gt_counts': gt_counts, 'best_conf': float(px[best]),
+        'precision': p_curve[:, best], 'recall': r_curve[:, best], 'f1': f1_curve[:, best],
+    }
+
+
+def confusion_matrix(pred_boxes, pred_cls, gt_boxes, gt_cls, nc: int, iou: float = 0.45,
+                     matrix: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Accumulate one image into an (nc + 1, nc + 1) confusion matrix
+
+    Rows are predicted classes, columns true classes; index nc is background
+    (missed ground truth in the last row, false positives in the last column).
+    """
+    if matrix is None:
+        matrix = np.zeros((nc + 1, nc + 1), dtype=np.int64)
+    matched_pred = np.zeros(len(pred_boxes), dtype=bool)
+    matched_gt = np.zeros(len(gt_boxes), dtype=bool)
+    if len(pred_boxes) and len(gt_boxes):
+        overlaps = box_iou(gt_boxes, pred_boxes)
+        gt_idx, pred_idx = np.nonzero(overlaps > iou)
+        order = np.argsort(-overlaps[gt_idx, pred_idx], kind='stable')
+        gt_idx, pred_idx = gt_idx[order], pred_idx[order]
+        _, first = np.unique(pred_idx, return_index=True)
+        gt_idx, pred_idx = gt_idx[first], pred_idx[first]
+        order = np.argsort(-overlaps[gt_idx, pred_idx], kind='stable')
+        gt_idx, pred_idx = gt_idx[order], pred_idx[order]
+        _, first = np.unique(gt_idx, return_index=True)
+        gt_idx, pred_idx = gt_idx[first], pred_idx[first]
+        np.add.at(matrix, (pred_cls[pred_idx], gt_cls[gt_idx]), 1)
+        matched_pred[pred_idx] = True
+        matched_gt[gt_idx] = True
+    np.add.at(matrix, (np.full((~matched_gt).sum(), nc), gt_cls[~matched_gt]), 1)
+    np.add.at(matrix, (pred_cls[~matched_pred], np.full((~matched_pred).sum(), nc)), 1)
+    return matrix
+
+
+class Evaluator:
+    """
+    Evaluate one model on one dataset split from cached predictions
+
+    Predictions are stored in cache_dir keyed by the weights' content hash,
+    the dataset, split and imgsz. Each image's size and mtime are stored with
+    its predictions, so images added or replaced later are predicted again.
+    """
+
+    def __init__(self, model_path: str = "best.pt", data_config: str = "custom_food_config.yaml",
+                 split: str = "valid", imgsz: int = 640, cache_dir: str = EVAL_CACHE_DIR):
+        with open(data_config, 'r') as f:
+            config = yaml.safe_load(f)
+        self.model_path = model_path
+        self.dataset_dir = config['path']
+        self.names = list(config['names'].values()) if isinstance(config['names'], dict) else list(config['names'])
+        self.nc = len(self.names)
+        self.split = split
+        self.imgsz = imgsz
+        dataset = os.path.realpath(data_config) + '\n' + os.path.realpath(self.dataset_dir)
+        dataset_key = hashlib.sha1(dataset.encode('utf-8')).hexdigest()[:10]
+        self.cache_path = os.path.join(cache_dir, f"{file_digest(model_path)[:16]}_{dataset_key}_{split}_{imgsz}.npz")
+        self._load()
+
+    def _predict(self, image_names: List[str], batch: int) -> Dict[str, np.ndarray]:
+        from ultralytics import YOLO
+
+        model = YOLO(self.model_path)
+        image_dir = os.path.join(self.dataset_dir, 'images', self.split)
+        rows = {'image': [], 'boxes': [], 'conf': [], 'cls': []}
+        sizes = np.zeros((len(image_names), 2), dtype=np.int32)
+        for start in range(0, len(image_names), batch):
+            paths = [os.path.join(image_dir, name) for name in image_names[start:start + batch]]
+            results = model(paths, imgsz=self.imgsz, conf=CACHE_CONF, iou=CACHE_IOU, max_det=CACHE_MAX_DET,
+                            verbose=False)
+            for offset, r in enumerate(results):
+                i = start + offset
+                sizes[i] = r.orig_shape[1], r.orig_shape[0]
+                rows['image'].append(np.full(len(r.boxes), i, dtype=np.int32))
+                rows['boxes'].append(r.boxes.xyxy.cpu().numpy().astype(np.float32))
+                rows['conf'].append(r.boxes.conf.cpu().numpy().astype(np.float32))
+                rows['cls'].append(r.boxes.cls.cpu().numpy().astype(np.int16))
+            print(f"🔎 Predicted {min(start + batch, len(image_names))}/{len(image_names)} images")
+        empty = {'image': np.int32, 'boxes': np.float32, 'conf': np.float32, 'cls': np.int16}
+        arrays = {k: np.concatenate(v) if v else np.zeros((0, 4) if k == 'boxes' else 0, dtype=empty[k])
+                  for k, v in rows.items()}
+        arrays['sizes'] = sizes
+        return arrays
+
+    @staticmethod
+    def _image_key(path: str) -> str:
+        stat = os.stat(path)
+        return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+    @staticmethod
+    def _drop_stale(cached: Dict[str, np.ndarray], keys: Dict[str, str]) -> Optional[Dict[str, np.ndarray]]:
+        """
+        Remove cached images whose file changed since they were predicted; None if nothing is left
+        """
+        names, cached_keys = list(cached['names']), list(cached['keys'])
+        fresh = np.array([keys.get(name, key) == key for name, key in zip(names, cached_keys)], dtype=bool)
+        if fresh.all():
+            return cached
+        if not fresh.any():
+            return None
+        new_index = np.cumsum(fresh) - 1
+        rows = fresh[cached['image']]
+        return {
+            'image': new_index[cached['image'][rows]].astype(np.int32),
+            'boxes': cached['boxes'][rows], 'conf': cached['conf'][rows], 'cls': cached['cls'][rows],
+            'sizes': cached['sizes'][fresh], 'names': cached['names'][fresh], 'keys': cached['keys'][fresh],
+        }
+
+    def _load(self, batch: int = 16):
+        index = DatasetIndex(self.dataset_dir, splits=(self.split,)).build()
+        names = list(index.images[self.split])
+
+        image_dir = os.path.join(self.dataset_dir, 'images', self.split)
+        keys = {name: self._image_key(os.path.join(image_dir, name)) for name in names}
+
+        cached = None
+        if os.path.exists(self.cache_path):
+            with np.load(self.cache_path) as data:
+                cached = {k: data[k] for k in data.files}
+            if 'keys' in cached:
+                cached = self._drop_stale(cached, keys)
+            else:
+                cached = None
+        cached_names = list(cached['names']) if cached is not None else []
+        missing = sorted(set(names) - set(cached_names))
+        if missing:
+            print(f"🧠 Running {os.path.basename(self.model_path)} on {len(missing)} uncached images...")
+            fresh = self._predict(missing, batch)
+            fresh_keys = np.asarray([keys[name] for name in missing])
+            if cached is None:
+                cached = dict(fresh, names=np.asarray(missing), keys=fresh_keys)
+            else:
+                fresh['image'] += len(cached_names)
+                old_keys = cached['keys']
+                cached = {k: np.concatenate([cached[k], fresh[k]]) for k in fresh}
+                cached['names'] = np.asarray(cached_names + missing)
+                cached['keys'] = np.concatenate([old_keys, fresh_keys])
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            np.savez_compressed(self.cache_path, **cached)
+        else:
+            print(f"⚡ Using cached predictions: {self.cache_path}")
+
+        # Re-index cached predictions to the current image order
+        position = {name: i for i, name in enumerate(names)}
+        remap = np.array([position.get(name, -1) for name in cached['names']], dtype=np.int64)
+        image = remap[cached['image']]
+        keep = image >= 0
+        order = np.argsort(image[keep], kind='stable')
+        self.pred_image = image[keep][order]
+        self.pred_boxes = cached['boxes'][keep][order]
+        self.pred_conf = cached['conf'][keep][order]
+        self.pred_cls = cached['cls'][keep][order].astype(np.int64)
+        sizes = np.zeros((len(names), 2), dtype=np.float32)
+        sizes[remap[remap >= 0]] = cached['sizes'][remap >= 0]
+
+        labels = index.labels
+        w, h = sizes[labels['image'], 0], sizes[labels['image'], 1]
+        order = np.argsort(labels['image'], kind='stable')
+        labels = labels[order]
+        w, h = w[order], h[order]
+        self.gt_image = labels['image'].astype(np.int64)
+        self.gt_cls = labels['cls'].astype(np.int64)
+        self.gt_boxes = np.stack([(labels['x'] - labels['w'] / 2) * w, (labels['y'] - labels['h'] / 2) * h,
+                                  (labels['x'] + labels['w'] / 2) * w, (labels['y'] + labels['h'] / 2) * h], axis=1)
+        self.image_names = names
+        self._pred_bounds = np.searchsorted(self.pred_image, np.arange(len(names) + 1))
+        self._gt_bounds = np.searchsorted(self.gt_image, np.arange(len(names) + 1))
+
+    def _images(self, conf: float, iou: float, max_det: int = 300):
+        """
+        Yield (pred_boxes, pred_conf, pred_cls, gt_boxes, gt_cls) per image after conf filter and NMS
+        """
+        for i in range(len(self.image_names)):
+            p0, p1 = self._pred_bounds[i], self._pred_bounds[i + 1]
+            g0, g1 = self._gt_bounds[i], self._gt_bounds[i + 1]
+            boxes, scores, classes = self.pred_boxes[p0:p1], self.pred_conf[p0:p1], self.pred_cls[p0:p1]
+            mask = scores >= conf
+            boxes, scores, classes = boxes[mask], scores[mask], classes[mask]
+            keep = nms(boxes, scores, classes, iou)[:max_det]
+            yield boxes[keep], scores[keep], classes[keep], self.gt_boxes[g0:g1], self.gt_cls[g0:g1]
+
+    def evaluate(self, conf: float = 0.001, iou: float = 0.7, max_det: int = 300) -> Dict:
+        """
+        mAP50, mAP50-95 and per-class metrics at one conf/NMS-iou setting
+        """
+        tps, confs, classes = [], [], []
+        for boxes, scores, cls, gt_boxes, gt_cls in self._images(conf, iou, max_det):
+            tps.append(match_predictions(boxes, cls, gt_boxes, gt_cls))
+            confs.append(scores)
+            classes.append(cls)
+        tp = np.concatenate(tps) if tps else np.zeros((0, len(IOU_THRESHOLDS)), dtype=bool)
+        stats = ap_per_class(tp, np.concatenate(confs) if confs else np.zeros(0),
+                             np.concatenate(classes) if classes else np.zeros(0, dtype=np.int64),
+                             self.gt_cls, self.nc)
+        present = stats['gt_counts'] > 0
+        ap = stats['ap']
+        stats.update({
+            'conf': conf, 'iou': iou,
+            'map50': float(ap[present, 0].mean()) if present.any() else 0.0,
+            'map50_95': float(ap[present].mean()) if present.any() else 0.0,
+            'tp50': int(tp[:, 0].sum()), 'predictions': len(tp), 'ground_truth': int(len(self.gt_cls)),
+        })
+        return stats
+
+    def confusion_matrix(self, conf: float = 0.25, iou: float = 0.7, match_iou: float = 0.45) -> np.ndarray:
+        matrix = np.zeros((self.nc + 1, self.nc + 1), dtype=np.int64)
+        for boxes, _, cls, gt_boxes, gt_cls in self._images(conf, iou):
+            confusion_matrix(boxes, cls, gt_boxes, gt_cls, self.nc, match_iou, matrix)
+        return matrix
+
+    def sweep(self, confs: Sequence[float], ious: Sequence[float]) -> List[Dict]:
+        """
+        Precision, recall, F1 (at IoU 0.5) and mAP for every conf x NMS-iou pair
+        """
+        rows = []
+        for iou in ious:
+            for conf in confs:
+                stats = self.evaluate(conf, iou)
+                precision = stats['tp50'] / max(stats['predictions'], 1)
+                recall = stats['tp50'] / max(stats['ground_truth'], 1)
+                rows.append({'conf': conf, 'iou': iou, 'precision': round(precision, 4), 'recall': round(recall, 4),
+                             'f1': round(2 * precision * recall / (precision + recall + 1e-16), 4),
+                             'map50': round(stats['map50'], 4), 'map50_95': round(stats['map50_95'], 4)})
+        return rows
+
+
+def plot_curves(stats: Dict, names: Sequence[str], out_dir: str):
+    """
+    Save PR_curve.png and F1_curve.png like the ones in Results/
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    os.makedirs(out_dir, exist_ok=True)
+    px, present = stats['px'], stats['gt_counts'] > 0
+    for filename, curve, xlabel, ylabel, summary in (
+            ('PR_curve.png', stats['pr_curve'], 'Recall', 'Precision', f"all classes {stats['map50']:.3f} mAP@0.5"),
+            ('F1_curve.png', stats['f1_curve'], 'Confidence', 'F1', f"all classes best at {stats['best_conf']:.3f}")):
+        fig, ax = plt.subplots(figsize=(9, 6), tight_layout=True)
+        for c in np.nonzero(present)[0]:
+            label = f"{names[c]} {stats['ap'][c, 0]:.3f}" if filename == 'PR_curve.png' else names[c]
+            ax.plot(px, curve[c], linewidth=1, label=label)
+        ax.plot(px, curve[present].mean(axis=0), linewidth=3, color='blue', label=summary)
+        ax.set(xlabel=xlabel, ylabel=ylabel, xlim=(0, 1), ylim=(0, 1))
+        ax.legend(bbox_to_anchor=(1.04, 1), loc='upper left')
+        fig.savefig(os.path.join(out_dir, filename), dpi=150)
+        plt.close(fig)
+
+
+def plot_confusion_matrix(matrix: np.ndarray, names: Sequence[str], out_dir: str):
+    """
+    Save confusion_matrix.png and confusion_matrix_normalized.png
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    os.makedirs(out_dir, exist_ok=True)
+    labels = list(names) + ['background']
+    for filename, data in (('confusion_matrix.png', matrix),
+                           ('confusion_matrix_normalized.png', matrix / (matrix.sum(axis=0, keepdims=True) + 1e-9))):
+        fig, ax = plt.subplots(figsize=(12, 9), tight_layout=True)
+        image = ax.imshow(data, cmap='Blues')
+        ax.set(xticks=range(len(labels)), yticks=range(len(labels)), xlabel='True', ylabel='Predicted')
+        ax.set_xticklabels(labels, rotation=90)
+        ax.set_yticklabels(labels)
+        fig.colorbar(image)
+        fig.savefig(os.path.join(out_dir, filename), dpi=150)
+        plt.close(fig)
+
+
+def _floats(text: str) -> List[float]:
+    return [float(v) for v in text.split(',') if v.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Evaluate a model from cached predictions and sweep thresholds")
+    parser.add_argument("--model", default="best.pt")
+    parser.add_argument("--data", default="custom_food_config.yaml")
+    parser.add_argument("--split", default="valid", choices=('train', 'valid', 'test'))
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--sweep-conf", type=_floats, default=[0.1, 0.25, 0.4, 0.5, 0.6],
+                        help="Comma-separated confidence thresholds")
+    parser.add_argument("--sweep-iou", type=_floats, default=[0.5, 0.6, 0.7], help="Comma-separated NMS IoUs")
+    parser.add_argument("--plots", help="Directory for PR/F1 curves and confusion matrices")
+    parser.add_argument("--json", help="Write the metrics and sweep table to this file")
+    args = parser.parse_args(argv)
+
+    print("📏 CACHED-PREDICTION EVALUATION")
+    print("=" * 50)
+    evaluator = Evaluator(args.model, args.data, args.split, args.imgsz)
+    stats = evaluator.evaluate()
+    print(f"\n🎯 mAP50: {stats['map50']:.3f}  mAP50-95: {stats['map50_95']:.3f}  "
+          f"(best F1 at conf {stats['best_conf']:.3f})")
+    for c, name in enumerate(evaluator.names):
+        if stats['gt_counts'][c]:
+            print(f"  {name:15s} AP50 {stats['ap'][c, 0]:.3f}  AP50-95 {stats['ap'][c].mean():.3f}  "
+                  f"P {stats['precision'][c]:.3f}  R {stats['recall'][c]:.3f}")
+
+    table = evaluator.sweep(args.sweep_conf, args.sweep_iou)
+    print(f"\n📊 {'conf':>6s} {'iou':>5s} {'P':>6s} {'R':>6s} {'F1':>6s} {'mAP50':>6s}")
+    for row in table:
+        print(f"   {row['conf']:6.2f} {row['iou']:5.2f} {row['precision']:6.3f} {row['recall']:6.3f} "
+              f"{row['f1']:6.3f} {row['map50']:6.3f}")
+    best = max(table, key=lambda row: row['f1'])
+    print(f"\n🏆 Best F1 {best['f1']:.3f} at conf={best['conf']} iou={best['iou']}")
+
+    if args.plots:
+        plot_curves(stats, evaluator.names, args.plots)
+        plot_confusion_matrix(evaluator.confusion_matrix(conf=best['conf'], iou=best['iou']), evaluator.names,
+                              args.plots)
+        print(f"🖼️  Plots saved in: {args.plots}/")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'map50': stats['map50'], 'map50_95': stats['map50_95'], 'best_conf': stats['best_conf'],
+                       'per_class_ap50': dict(zip(evaluator.names, stats['ap'][:, 0].round(4).tolist())),
+                       'sweep': table}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Meal History Store for Food Detection App
+Append-only SQLite log of /detect results with indexed per-user queries
+"""
+
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS requests (
+    id INTEGER PRIMARY KEY,
+    meal_id TEXT NOT NULL UNIQUE,
+    request_id TEXT,
+    user_id TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    model_path TEXT,
+    model_version TEXT,
+    image_hash TEXT,
+    image_width INTEGER,
+    image_height INTEGER,
+    count INTEGER NOT NULL,
+    calories REAL NOT NULL,
+    carbs REAL NOT NULL,
+    protein REAL NOT NULL,
+    fat REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS detections (
+    request INTEGER NOT NULL REFERENCES requests(id),
+    user_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    class_name TEXT NOT NULL,
+    confidence REAL NOT NULL,
+    portion REAL NOT NULL,
+    x1 INTEGER, y1 INTEGER, x2 INTEGER, y2 INTEGER,
+    calories REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS requests_user_time ON requests (user_id, created_at);
+CREATE INDEX IF NOT EXISTS detections_request ON detections (request);
+-- Covers the daily per-class aggregation without touching the table
+CREATE INDEX IF NOT EXISTS detections_user_day_class ON detections (user_id, day, class_name, calories, portion);
+CREATE INDEX IF NOT EXISTS detections_class_day ON detections (class_name, day);
+"""
+
+
+def utc_day(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime('%Y-%m-%d')
+
+
+def parse_time(value: Optional[str], default: Optional[float] = None) -> Optional[float]:
+    """
+    Parse an ISO date/datetime (UTC unless it has an offset) or epoch seconds
+
+    Raises:
+        ValueError: If the value is neither
+    """
+    if not value:
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        parsed = datetime.fromisoformat(value)
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+
+
+class HistoryStore:
+    """
+    Append-only meal history
+
+    One connection per thread; WAL mode lets readers run while a request is
+    being written. Rows are only ever inserted.
+    """
+
+    def __init__(self, db_path: str = "history.sqlite3"):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._connect().executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def record(self, meal_id: str, user_id: str, detections: List[Dict], totals: Dict[str, float],
+               model_info: Dict, image_hash: Optional[str] = None, image_size=None,
+               created_at: Optional[float] = None, request_id: Optional[str] = None) -> int:
+        """
+        Append one /detect result
+
+        Args:
+            meal_id: Server-generated unique id of the stored meal
+            detections: Detections with class, confidence, bbox, portion and calories
+            totals: Meal nutrition totals (calories, carbs, protein, fat)
+            model_info: Serving model description (path, version)
+            image_size: (width, height) of the uploaded image
+            request_id: Tracing id of the request (may come from the client, so not unique)
+
+        Returns:
+            Row id of the stored request
+        """
+        created_at = time.time() if created_at is None else created_at
+        day = utc_day(created_at)
+        width, height = image_size or (None, None)
+        conn = self._connect()
+        with conn:
+            cursor = conn.execute(
+                "INSERT INTO requests (meal_id, request_id, user_id, created_at, model_path, model_version, "
+                "image_hash, image_width, image_height, count, calories, carbs, protein, fat) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (meal_id, request_id, user_id, created_at, model_info.get('path'), model_info.get('version'), image_hash,
+                 width, height, len(detections), totals['calories'], totals['carbs'], totals['protein'],
+                 totals['fat']))
+            row_id = cursor.lastrowid
+            conn.executemany(
+                "INSERT INTO detections (request, user_id, day, class_name, confidence, portion, x1, y1, x2, y2, "
+                "calories) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(row_id, user_id, day, d['class'], d['confidence'], d.get('portion', 1.0), *d['bbox'],
+                  d.get('calories', 0.0)) for d in detections])
+        return row_id
+
+    def _detections_for(self, row_ids: List[int]) -> Dict[int, List[Dict]]:
+        grouped = {row_id: [] for row_id in row_ids}
+        if not row_ids:
+            return grouped
+        placeholders = ','.join('?' * len(row_ids))
+        for row in self._connect().execute(
+                f"SELECT request, class_name, confidence, portion, x1, y1, x2, y2, calories FROM detections "
+                f"WHERE request IN ({placeholders})", row_ids):
+            grouped[row['request']].append({
+                'class': row['class_name'], 'confidence': row['confidence'], 'portion': row['portion'],
+                'bbox': [row['x1'], row['y1'], row['x2'], row['y2']], 'calories': row['calories']})
+        return grouped
+
+    @staticmethod
+    def _request_dict(row: sqlite3.Row, detections: List[Dict]) -> Dict:
+        return {
+            'meal_id': row['meal_id'],
+            'request_id': row['request_id'],
+            'created_at': datetime.fromtimestamp(row['created_at'], timezone.utc).isoformat(),
+            'model': {'path': row['model_path'], 'version': row['model_version']},
+            'image_hash': row['image_hash'],
+            'count': row['count'],
+            'nutrition': {k: row[k] for k in ('calories', 'carbs', 'protein', 'fat')},
+            'detections': detections,
+        }
+
+    def list_requests(self, user_id: str, since: Optional[float] = None, until: Optional[float] = None,
+                      limit: int = 50) -> List[Dict]:
+        """
+        A user's meals, newest first
+        """
+        rows = self._connect().execute(
+            "SELECT * FROM requests WHERE user_id = ? AND created_at >= ? AND created_at < ? "
+            "ORDER BY created_at DESC LIMIT ?",
+            (user_id, since or 0.0, until or float('inf'), limit)).fetchall()
+        detections = self._detections_for([row['id'] for row in rows])
+        return [self._request_dict(row, detections[row['id']]) for row in rows]
+
+    def get_meal(self, user_id: str, meal_id: str) -> Optional[Dict]:
+        row = self._connect().execute(
+            "SELECT * FROM requests WHERE meal_id = ? AND user_id = ?", (meal_id, user_id)).fetchone()
+        if row is None:
+            return None
+        return self._request_dict(row, self._detections_for([row['id']])[row['id']])
+
+    def daily_totals(self, user_id: str, since: float, until: float, class_name: Optional[str] = None) -> List[Dict]:
+        """
+        Calories, servings and item count per UTC day and class, from the covering index
+
+        Returns:
+            Rows of day, class, calories, servings, items ordered by day
+        """
+        query = ("SELECT day, class_name, SUM(calories) AS calories, SUM(portion) AS servings, COUNT(*) AS items "
+                 "FROM detections WHERE user_id = ? AND day >= ? AND day <= ?")
+        params = [user_id, utc_day(since), utc_day(until)]
+        if class_name:
+            query += " AND class_name = ?"
+            params.append(class_name)
+        query += " GROUP BY day, class_name ORDER BY day, class_name"
+        return [{'day': row['day'], 'class': row['class_name'], 'calories': round(row['calories'], 1),
+                 'servings': round(row['servings'], 2), 'items': row['items']}
+                for row in self._connect().execute(query, params)]
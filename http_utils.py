@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+HTTP helpers for the Food Detection App
+Versioned ETags and gzip/brotli response compression
+"""
+
+import gzip
+import hashlib
+import json
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE_TYPES = ('application/json', 'text/', 'application/javascript', 'image/svg+xml')
+MIN_COMPRESS_SIZE = 1024
+
+
+def content_version(data) -> str:
+    """
+    Short stable hash of JSON-serializable data, identical across processes
+    """
+    payload = json.dumps(data, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()[:16]
+
+
+def choose_encoding(accept_encoding: str):
+    """
+    Best supported encoding the client accepts: 'br' (if brotli is installed), 'gzip' or None
+    """
+    accepted = {}
+    for part in (accept_encoding or '').split(','):
+        name, _, params = part.strip().partition(';')
+        quality = 1.0
+        if params.strip().startswith('q='):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.lower()] = quality
+    for encoding in (('br', 'gzip') if brotli is not None else ('gzip',)):
+        if accepted.get(encoding, accepted.get('*', 0)) > 0:
+            return encoding
+    return None
+
+
+def compress_response(response, accept_encoding: str, min_size: int = MIN_COMPRESS_SIZE):
+    """
+    Compress a Flask response body in place when the client and content type allow it
+    """
+    response.vary.add('Accept-Encoding')
+    if (response.direct_passthrough or response.status_code < 200 or response.status_code in (204, 304)
+            or 'Content-Encoding' in response.headers
+            or not (response.mimetype or '').startswith(COMPRESSIBLE_TYPES)):
+        return response
+    encoding = choose_encoding(accept_encoding)
+    if encoding is None:
+        return response
+    body = response.get_data()
+    if len(body) < min_size:
+        return response
+
+    if encoding == 'br':
+        response.set_data(brotli.compress(body, quality=5))
+    else:
+        response.set_data(gzip.compress(body, compresslevel=5))
+    response.headers['Content-Encoding'] = encoding
+    return response
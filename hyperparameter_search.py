@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Hyperparameter Search for Custom Food Training
+Short trials in parallel processes with ASHA early stopping on validation mAP,
+then one full training run with the winning settings
+"""
+
+import argparse
+import csv
+import json
+import math
+import os
+import random
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from multiprocessing import get_context
+from typing import Dict, List, Optional, Tuple
+
+SEARCH_DIR = os.path.join("custom_food_detection", "hpo")
+STATE_FILE = "trials.json"
+
+# name -> (kind, low, high) for numbers or (kind, choices)
+SEARCH_SPACE = {
+    'optimizer': ('choice', ['AdamW', 'SGD']),
+    'lr0': ('log', 1e-4, 3e-2),
+    'weight_decay': ('log', 1e-5, 1e-3),
+    'warmup_epochs': ('uniform', 0.0, 3.0),
+    'box': ('uniform', 5.0, 10.0),
+    'cls': ('uniform', 0.3, 1.5),
+    'dfl': ('uniform', 1.0, 2.0),
+    'label_smoothing': ('uniform', 0.0, 0.1),
+}
+
+MAP_COLUMN = 'metrics/mAP50-95(B)'
+
+
+def sample_params(rng: random.Random, space: Dict = SEARCH_SPACE) -> Dict:
+    params = {}
+    for name, spec in space.items():
+        kind = spec[0]
+        if kind == 'choice':
+            params[name] = rng.choice(spec[1])
+        elif kind == 'log':
+            params[name] = round(math.exp(rng.uniform(math.log(spec[1]), math.log(spec[2]))), 6)
+        else:
+            params[name] = round(rng.uniform(spec[1], spec[2]), 4)
+    return params
+
+
+def rung_epochs(min_epochs: int, max_epochs: int, eta: int) -> List[int]:
+    """
+    Cumulative epoch budget of each rung, e.g. 2, 6, 18 for min 2, max 18, eta 3
+    """
+    epochs = [min_epochs]
+    while epochs[-1] * eta <= max_epochs:
+        epochs.append(epochs[-1] * eta)
+    return epochs
+
+
+def best_map(run_dir: str) -> float:
+    """
+    Best validation mAP50-95 recorded in a run's results.csv (0.0 if missing)
+    """
+    path = os.path.join(run_dir, "results.csv")
+    if not os.path.exists(path):
+        return 0.0
+    with open(path, newline='') as f:
+        rows = [{k.strip(): v for k, v in row.items()} for row in csv.DictReader(f)]
+    values = [float(row[MAP_COLUMN]) for row in rows if row.get(MAP_COLUMN)]
+    return max(values) if values else 0.0
+
+
+def _init_worker(threads: int):
+    # Keep concurrent trials from oversubscribing the CPU
+    os.environ['OMP_NUM_THREADS'] = str(threads)
+    import torch
+    torch.set_num_threads(threads)
+
+
+def _run_trial(job: Dict) -> Dict:
+    """
+    Train one trial up to its rung's epoch budget (in a worker process)
+
+    Promoted trials continue from the weights of their previous rung with a
+    fresh warm-up-free schedule for the extra epochs.
+    """
+    from train_custom_model import PROJECT, resolve_settings, run_training_phase
+
+    name = f"hpo_{job['trial']:03d}_r{job['rung']}"
+    start = time.time()
+    try:
+        train_args, pipeline = resolve_settings(job['config_file'], dict(job['overrides'], **job['params'],
+                                                                         epochs=job['epochs']))
+        if job['rung'] > 0:
+            train_args['warmup_epochs'] = 0
+        # Rungs are short; early stopping inside a trial would only blur the comparison
+        train_args['patience'] = job['epochs'] + 1
+        if job.get('device') is not None:
+            train_args['device'] = job['device']
+        # run() built the image cache; concurrent trials only map it read-only
+        run_training_phase(job['start_weights'], pipeline['data'], train_args, name, pipeline['image_cache'], True,
+                           build_cache=False)
+        run_dir = os.path.join(PROJECT, name)
+        return dict(job, map=best_map(run_dir), weights=os.path.join(run_dir, "weights", "last.pt"),
+                    seconds=round(time.time() - start, 1), error=None)
+    except Exception as e:
+        return dict(job, map=0.0, weights=None, seconds=round(time.time() - start, 1), error=str(e))
+
+
+class ASHASearch:
+    """
+    Asynchronous successive halving
+
+    Whenever a worker is free, the highest rung with an unpromoted trial in
+    its top 1/eta is promoted to the next rung; otherwise a new trial starts
+    at rung 0. State is written to trials.json after every finished job, so
+    an interrupted search picks up where it stopped.
+    """
+
+    def __init__(self, n_trials: int = 27, min_epochs: int = 2, max_epochs: int = 18, eta: int = 3,
+                 parallel: Optional[int] = None, config_file: Optional[str] = None,
+                 overrides: Optional[Dict] = None, seed: int = 0, search_dir: str = SEARCH_DIR):
+        self.n_trials = n_trials
+        self.eta = eta
+        self.rungs = rung_epochs(min_epochs, max_epochs, eta)
+        self.parallel = parallel or self.default_parallel()
+        self.config_file = config_file
+        self.overrides = dict(overrides or {})
+        self.seed = seed
+        self.search_dir = search_dir
+        self.state_path = os.path.join(search_dir, STATE_FILE)
+        self.trials: Dict[str, Dict] = {}
+        self._load()
+
+    @staticmethod
+    def default_parallel() -> int:
+        """
+        One trial per GPU, else one per four CPU cores
+        """
+        try:
+            import torch
+            if torch.cuda.is_available():
+                return torch.cuda.device_count()
+        except ImportError:
+            pass
+        return max(1, (os.cpu_count() or 1) // 4)
+
+    def _load(self):
+        if os.path.exists(self.state_path):
+            with open(self.state_path, 'r') as f:
+                state = json.load(f)
+            self.trials = state.get('trials', {})
+            print(f"♻️  Resuming search with {len(self.trials)} recorded trials")
+
+    def _save(self):
+        os.makedirs(self.search_dir, exist_ok=True)
+        tmp = self.state_path + ".tmp"
+        with open(tmp, 'w') as f:
+            json.dump({'rungs': self.rungs, 'eta': self.eta, 'n_trials': self.n_trials, 'trials': self.trials},
+                      f, indent=2)
+        os.replace(tmp, self.state_path)
+
+    def _rung_results(self, rung: int) -> List[Tuple[float, str]]:
+        return sorted(((t['rungs'][str(rung)]['map'], trial_id) for trial_id, t in self.trials.items()
+                       if str(rung) in t['rungs']), reverse=True)
+
+    def _next_job(self, running: set) -> Optional[Dict]:
+        for rung in reversed(range(len(self.rungs) - 1)):
+            results = self._rung_results(rung)
+            for _, trial_id in results[:len(results) // self.eta]:
+                trial = self.trials[trial_id]
+                if str(rung + 1) not in trial['rungs'] and (trial_id, rung + 1) not in running \
+                        and not trial['rungs'][str(rung)].get('error'):
+                    return self._job(trial_id, rung + 1, trial['rungs'][str(rung)]['weights'])
+        pending = [trial_id for trial_id in self.trials
+                   if '0' not in self.trials[trial_id]['rungs'] and (trial_id, 0) not in running]
+        if pending:
+            return self._job(pending[0], 0, None)
+        if len(self.trials) < self.n_trials:
+            trial_id = str(len(self.trials))
+            self.trials[trial_id] = {'params': sample_params(random.Random(self.seed + len(self.trials))),
+                                     'rungs': {}}
+            return self._job(trial_id, 0, None)
+        return None
+
+    def _job(self, trial_id: str, rung: int, start_weights: Optional[str]) -> Dict:
+        from train_custom_model import resolve_settings
+
+        previous = self.rungs[rung - 1] if rung else 0
+        # Same starting weights as the final run: overrides, then --config, then the default
+        base_model = resolve_settings(self.config_file, self.overrides)[1]['model']
+        job = {'trial': int(trial_id), 'rung': rung, 'epochs': self.rungs[rung] - previous,
+               'params': self.trials[trial_id]['params'], 'start_weights': start_weights or base_model,
+               'config_file': self.config_file, 'overrides': self.overrides}
+        if self.overrides.get('device') is None and self.parallel > 1:
+            try:
+                import torch
+                if torch.cuda.is_available():
+                    job['device'] = int(trial_id) % torch.cuda.device_count()
+            except ImportError:
+                pass
+        return job
+
+    def run(self) -> Optional[Dict]:
+        """
+        Run the search; returns the best trial (params, rung, map) or None
+        """
+        from image_cache import build_image_cache
+        from train_custom_model import resolve_settings
+
+        train_args, pipeline = resolve_settings(self.config_file, self.overrides)
+        if pipeline['image_cache']:
+            # Build once here; trials only read it
+            build_image_cache(pipeline['data'], imgsz=train_args['imgsz'])
+
+        threads = max(1, (os.cpu_count() or 1) // self.parallel)
+        # Each trial's dataloader gets its share of the cores
+        self.overrides.setdefault('workers', max(1, threads - 1))
+        print(f"🔬 ASHA search: {self.n_trials} trials, rungs at {self.rungs} epochs, eta={self.eta}, "
+              f"{self.parallel} in parallel")
+
+        running = {}
+        with ProcessPoolExecutor(self.parallel, mp_context=get_context('spawn'), initializer=_init_worker,
+                                 initargs=(threads,)) as pool:
+            while True:
+                while len(running) < self.parallel:
+                    job = self._next_job(set(running.values()))
+                    if job is None:
+                        break
+                    self._save()
+                    running[pool.submit(_run_trial, job)] = (str(job['trial']), job['rung'])
+                    print(f"▶️  Trial {job['trial']} rung {job['rung']} ({job['epochs']} epochs): {job['params']}")
+                if not running:
+                    break
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    trial_id, rung = running.pop(future)
+                    result = future.result()
+                    self.trials[trial_id]['rungs'][str(rung)] = {
+                        'map': result['map'], 'weights': result['weights'], 'seconds': result['seconds'],
+                        'error': result['error']}
+                    self._save()
+                    flag = "❌" if result['error'] else "✅"
+                    print(f"{flag} Trial {trial_id} rung {rung}: mAP50-95 {result['map']:.4f} "
+                          f"({result['seconds']:.0f}s){' ' + result['error'] if result['error'] else ''}")
+        return self.best()
+
+    def best(self) -> Optional[Dict]:
+        """
+        Best trial at the highest rung any trial reached
+        """
+        for rung in reversed(range(len(self.rungs))):
+            results = self._rung_results(rung)
+            if results:
+                score, trial_id = results[0]
+                return {'trial': int(trial_id), 'rung': rung, 'map': score,
+                        'params': self.trials[trial_id]['params']}
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Search training hyperparameters with ASHA, then train the winner")
+    parser.add_argument("--config", help="YAML with fixed YOLO.train args and pipeline options")
+    parser.add_argument("--trials", type=int, default=27)
+    parser.add_argument("--min-epochs", type=int, default=2, help="Epochs of the first rung")
+    parser.add_argument("--max-epochs", type=int, default=18, help="Epoch budget of the last rung")
+    parser.add_argument("--eta", type=int, default=3, help="Keep the top 1/eta of each rung")
+    parser.add_argument("--parallel", type=int, help="Concurrent trials (default: GPUs, or cores / 4)")
+    parser.add_argument("--preset", choices=('default', 'cpu'))
+    parser.add_argument("--imgsz", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--final-epochs", type=int, help="Epochs of the final run (default: DEFAULT_TRAIN_ARGS)")
+    parser.add_argument("--no-final", action="store_true", help="Only search, don't launch the final training")
+    args = parser.parse_args(argv)
+
+    print("🔬 HYPERPARAMETER SEARCH")
+    print("=" * 50)
+    overrides = {k: v for k, v in {'preset': args.preset, 'imgsz': args.imgsz}.items() if v is not None}
+    search = ASHASearch(args.trials, args.min_epochs, args.max_epochs, args.eta, args.parallel, args.config,
+                        overrides, args.seed)
+    best = search.run()
+    if best is None:
+        print("❌ No trial finished")
+        return 1
+    print(f"\n🏆 Best trial {best['trial']} (rung {best['rung']}, mAP50-95 {best['map']:.4f}):")
+    for key, value in best['params'].items():
+        print(f"   {key}: {value}")
+    with open(os.path.join(SEARCH_DIR, "best_params.json"), 'w') as f:
+        json.dump(best, f, indent=2)
+
+    if args.no_final:
+        return 0
+    from train_custom_model import train_custom_model
+
+    final = dict(overrides, **best['params'], name="custom_foods_tuned")
+    if args.final_epochs:
+        final['epochs'] = args.final_epochs
+    return 0 if train_custom_model(args.config, final) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
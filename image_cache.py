@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Pre-decoded Training Image Cache
+Decode and resize the dataset once into memory-mapped arrays so epochs are not bound by JPEG decode
+"""
+
+import hashlib
+import json
+import math
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+import yaml
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+DEFAULT_CACHE_DIR = ".image_cache"
+
+
+def _resize_long_side(im: np.ndarray, imgsz: int) -> np.ndarray:
+    """
+    Resize so the long side equals imgsz, matching Ultralytics' rect-mode load_image
+    """
+    h0, w0 = im.shape[:2]
+    r = imgsz / max(h0, w0)
+    if r != 1:
+        w, h = (min(math.ceil(w0 * r), imgsz), min(math.ceil(h0 * r), imgsz))
+        im = cv2.resize(im, (w, h), interpolation=cv2.INTER_LINEAR)
+    return im
+
+
+def _file_key(path: str) -> str:
+    stat = os.stat(path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def store_name(split: str, image_dir: str) -> str:
+    """
+    Store name for a split's image directory, so different datasets never share a cache file
+    """
+    source = hashlib.sha1(os.path.realpath(image_dir).encode('utf-8')).hexdigest()[:10]
+    return f"{split}_{source}"
+
+
+def split_image_dirs(config_file: str, splits=('train', 'val')) -> Dict[str, str]:
+    """
+    Resolve image directories for dataset splits from a YOLO data YAML
+    """
+    with open(config_file, 'r') as f:
+        config = yaml.safe_load(f)
+    root = config.get('path') or os.path.dirname(os.path.abspath(config_file))
+    dirs = {}
+    for split in splits:
+        entry = config.get(split)
+        if entry:
+            dirs[split] = entry if os.path.isabs(entry) else os.path.join(root, entry)
+    return dirs
+
+
+class ImageStore:
+    def __init__(self, cache_dir: str, name: str, imgsz: int):
+        """
+        One memory-mapped split: a (N, imgsz, imgsz, 3) uint8 array plus a JSON index
+
+        Each image is resized (long side = imgsz) and stored top-left in a
+        square, zero-padded slot; the index keeps the original and resized
+        shapes so the final letterbox/augmentation still sees the real image.
+
+        Args:
+            cache_dir: Directory holding the store files
+            name: Store name from store_name()
+            imgsz: Training image size
+        """
+        self.imgsz = imgsz
+        self.data_path = os.path.join(cache_dir, f"{name}_{imgsz}.u8")
+        self.index_path = os.path.join(cache_dir, f"{name}_{imgsz}.json")
+        self.files: List[str] = []
+        self.keys: List[str] = []
+        self.hw0: List[Tuple[int, int]] = []
+        self.hw: List[Tuple[int, int]] = []
+        self._slots: Dict[str, int] = {}
+        self._array = None
+
+    def _load_index(self) -> bool:
+        if not (os.path.exists(self.index_path) and os.path.exists(self.data_path)):
+            return False
+        try:
+            with open(self.index_path, 'r') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if index.get('imgsz') != self.imgsz:
+            return False
+        self.files, self.keys = index['files'], index['keys']
+        self.hw0 = [tuple(hw) for hw in index['hw0']]
+        self.hw = [tuple(hw) for hw in index['hw']]
+        return True
+
+    def _save_index(self):
+        # Per-process name, so concurrent builders never write the same temp file
+        tmp = f"{self.index_path}.{os.getpid()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump({'imgsz': self.imgsz, 'files': self.files, 'keys': self.keys,
+                       'hw0': self.hw0, 'hw': self.hw}, f)
+        os.replace(tmp, self.index_path)
+
+    def build(self, image_dir: str, workers: Optional[int] = None) -> Dict[str, int]:
+        """
+        Create or refresh the store for all images in image_dir
+
+        Only images that are new or whose size/mtime changed are decoded again;
+        if the set of files changed, the array is rebuilt. Unreadable images
+        are left out and retried on the next build.
+
+        Returns:
+            Dictionary with 'decoded' and 'reused' counts
+        """
+        files = sorted(os.path.abspath(os.path.join(image_dir, f)) for f in os.listdir(image_dir)
+                       if f.lower().endswith(IMAGE_EXTENSIONS))
+        keys = [_file_key(f) for f in files]
+
+        if self._load_index() and self.files == files:
+            stale = [i for i, (old, new) in enumerate(zip(self.keys, keys)) if old != new]
+            array = np.memmap(self.data_path, dtype=np.uint8, mode='r+')
+        else:
+            stale = list(range(len(files)))
+            self.files, self.keys = files, [''] * len(files)
+            self.hw0, self.hw = [(0, 0)] * len(files), [(0, 0)] * len(files)
+            array = np.memmap(self.data_path, dtype=np.uint8, mode='w+',
+                              shape=(max(1, len(files)) * self.imgsz * self.imgsz * 3,))
+        array = array.reshape(-1, self.imgsz, self.imgsz, 3)
+
+        def decode(i):
+            im = cv2.imread(files[i], cv2.IMREAD_COLOR)
+            if im is None:
+                # Leave the slot empty; the dataset's own loader then handles (or skips) the file
+                print(f"⚠️  Could not decode {files[i]}, not caching it")
+                self.hw0[i], self.hw[i], self.keys[i] = (0, 0), (0, 0), ''
+                return
+            h0, w0 = im.shape[:2]
+            im = _resize_long_side(im, self.imgsz)
+            h, w = im.shape[:2]
+            slot = array[i]
+            slot[:h, :w] = im
+            slot[h:, :] = 0
+            slot[:h, w:] = 0
+            self.hw0[i], self.hw[i], self.keys[i] = (h0, w0), (h, w), keys[i]
+
+        # cv2 releases the GIL while decoding, so threads scale across cores
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 1) as pool:
+            list(pool.map(decode, stale))
+        array.flush()
+        del array
+        if stale:
+            self._save_index()
+        self._array = None
+        return {'decoded': len(stale), 'reused': len(files) - len(stale)}
+
+    def open(self) -> bool:
+        """
+        Map the store read-only; returns False if it does not exist
+        """
+        if not self._load_index():
+            return False
+        self._array = np.memmap(self.data_path, dtype=np.uint8, mode='r').reshape(-1, self.imgsz, self.imgsz, 3)
+        self._slots = {f: i for i, f in enumerate(self.files)}
+        return True
+
+    def get(self, path: str) -> Optional[Tuple[np.ndarray, Tuple[int, int], Tuple[int, int]]]:
+        """
+        Return (image, original hw, resized hw) for path, or None if not cached
+        """
+        if self._array is None:
+            return None
+        i = self._slots.get(os.path.abspath(path))
+        if i is None or not self.keys[i]:
+            return None
+        h, w = self.hw[i]
+        # Copy out of the read-only map: augmentations such as RandomHSV work in place
+        return np.array(self._array[i, :h, :w]), self.hw0[i], self.hw[i]
+
+
+def build_image_cache(config_file: str = "custom_food_config.yaml", imgsz: int = 640,
+                      cache_dir: str = DEFAULT_CACHE_DIR, workers: Optional[int] = None) -> Dict[str, ImageStore]:
+    """
+    Build (or refresh) the memory-mapped store for the train and val splits of a data YAML
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    stores = {}
+    for split, image_dir in split_image_dirs(config_file).items():
+        if not os.path.isdir(image_dir):
+            continue
+        store = ImageStore(cache_dir, store_name(split, image_dir), imgsz)
+        stats = store.build(image_dir, workers)
+        print(f"🗄️  {split}: decoded {stats['decoded']}, reused {stats['reused']} cached images")
+        stores[split] = store
+    return stores
+
+
+def _load_from_store(dataset, store: ImageStore, original_load_image, i, rect_mode=True, **kwargs):
+    """
+    Drop-in replacement for BaseDataset.load_image that reads from the store
+    """
+    if dataset.ims[i] is not None or not rect_mode or kwargs.get('resize_short') \
+            or getattr(dataset, 'channels', 3) != 3:
+        return original_load_image(i, rect_mode, **kwargs)
+    cached = store.get(dataset.im_files[i])
+    if cached is None:
+        return original_load_image(i, rect_mode, **kwargs)
+    im, hw0, hw = cached
+
+    # Same mosaic buffer bookkeeping as BaseDataset.load_image
+    if dataset.augment and dataset.cache != "ram":
+        dataset.ims[i], dataset.im_hw0[i], dataset.im_hw[i] = im, hw0, hw
+        dataset.buffer.append(i)
+        if 1 < len(dataset.buffer) >= dataset.max_buffer_length:
+            j = dataset.buffer.pop(0)
+            dataset.ims[j], dataset.im_hw0[j], dataset.im_hw[j] = None, None, None
+    return im, hw0, hw
+
+
+def make_cached_trainer(cache_dir: str = DEFAULT_CACHE_DIR):
+    """
+    Return a DetectionTrainer subclass whose datasets read images from the store
+
+    Use as model.train(..., trainer=make_cached_trainer()). Images missing from
+    the store (or a different imgsz) fall back to normal decoding.
+    """
+    from functools import partial
+    from ultralytics.models.yolo.detect import DetectionTrainer
+
+    class CachedDetectionTrainer(DetectionTrainer):
+        def build_dataset(self, img_path, mode="train", batch=None):
+            dataset = super().build_dataset(img_path, mode, batch)
+            split = 'train' if mode == 'train' else 'val'
+            if not isinstance(img_path, str):
+                return dataset
+            store = ImageStore(cache_dir, store_name(split, img_path), dataset.imgsz)
+            if store.open():
+                dataset.load_image = partial(_load_from_store, dataset, store, dataset.load_image)
+            return dataset
+
+    return CachedDetectionTrainer
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Pre-decode training images into a memory-mapped cache")
+    parser.add_argument("config", nargs="?", default="custom_food_config.yaml", help="Dataset YAML config")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    build_image_cache(args.config, args.imgsz, args.cache_dir, args.workers)
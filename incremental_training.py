@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Incremental Class Addition
+Onboard new foods by fine-tuning only the detection head (and optionally the neck)
+on the new data plus a replayed sample of the original classes
+"""
+
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+
+import yaml
+from ultralytics import YOLO
+
+from custom_dataset_setup import BASE_CLASSES, link_or_copy
+from dataset_index import DatasetIndex
+from train_custom_model import PROJECT, resolve_settings, run_training_phase, update_web_app
+
+INCREMENTAL_DIR = "incremental_dataset"
+RUN_NAME = "incremental"
+
+# YOLOv8 layout: layers 0-9 backbone, 10-21 neck (FPN/PAN), last layer Detect head
+BACKBONE_LAYERS = 10
+
+
+def _link_images(index, split, image_ids, source_dir, out_dir, out_split):
+    """
+    Hardlink images (and copy labels) of one split into the incremental dataset
+    """
+    for kind in ('images', 'labels'):
+        os.makedirs(os.path.join(out_dir, kind, out_split), exist_ok=True)
+    for image_id in image_ids:
+        name = index.images[split][image_id]
+        stem = os.path.splitext(name)[0]
+        link_or_copy(os.path.join(source_dir, 'images', split, name),
+                     os.path.join(out_dir, 'images', out_split, name), 'auto')
+        label = os.path.join(source_dir, 'labels', split, stem + '.txt')
+        if os.path.exists(label):
+            link_or_copy(label, os.path.join(out_dir, 'labels', out_split, stem + '.txt'), 'copy')
+
+
+def build_replay_dataset(config_file="custom_food_config.yaml", out_dir=INCREMENTAL_DIR,
+                         replay_fraction=0.25, seed=0):
+    """
+    Assemble the incremental training set
+
+    Train: every image containing a new class plus a random replay sample of
+    images that only contain original classes (so the head does not forget them).
+    Valid: the full validation split, plus valid_base with only original-class
+    images for measuring regressions.
+
+    Returns:
+        (path of the incremental data YAML, path of the base-classes data YAML)
+    """
+    with open(config_file, 'r') as f:
+        config = yaml.safe_load(f)
+    source_dir = config['path']
+    # Links are cheap to recreate; start clean so a different replay sample leaves no leftovers
+    if os.path.isdir(out_dir):
+        shutil.rmtree(out_dir)
+    index = DatasetIndex(source_dir, splits=('train', 'valid')).build()
+    labels = index.labels
+    new_class = labels['cls'] >= len(BASE_CLASSES)
+    rng = random.Random(seed)
+
+    for split, out_split in (('train', 'train'), ('valid', 'valid')):
+        split_id = index.splits.index(split)
+        in_split = labels['split'] == split_id
+        all_ids = set(range(len(index.images[split])))
+        new_ids = set(labels['image'][in_split & new_class].tolist())
+        old_ids = sorted(all_ids - new_ids)
+        if split == 'train':
+            replay = rng.sample(old_ids, int(round(len(old_ids) * replay_fraction)))
+            chosen = sorted(new_ids) + sorted(replay)
+            print(f"📦 Train: {len(new_ids)} new-class images + {len(replay)} replayed original images")
+        else:
+            chosen = sorted(all_ids)
+            _link_images(index, split, old_ids, source_dir, out_dir, 'valid_base')
+        _link_images(index, split, chosen, source_dir, out_dir, out_split)
+
+    incremental_config = os.path.join(out_dir, "incremental_config.yaml")
+    base_config = os.path.join(out_dir, "base_val_config.yaml")
+    common = {'path': os.path.abspath(out_dir), 'train': 'images/train'}
+    with open(incremental_config, 'w') as f:
+        yaml.safe_dump({**common, 'val': 'images/valid', 'nc': config['nc'], 'names': config['names']}, f)
+    with open(base_config, 'w') as f:
+        yaml.safe_dump({**common, 'val': 'images/valid_base', 'nc': len(BASE_CLASSES),
+                        'names': list(BASE_CLASSES)}, f)
+    return incremental_config, base_config
+
+
+def per_class_map(model_path, data_config):
+    """
+    mAP50-95 per class name on the validation split of data_config
+    """
+    model = YOLO(model_path)
+    metrics = model.val(data=data_config, plots=False, verbose=False)
+    maps = metrics.box.maps
+    return {model.names[i]: float(maps[i]) for i in range(min(len(maps), len(model.names)))}
+
+
+def regression_report(baseline_model, new_model, base_config, tolerance=0.02):
+    """
+    Compare per-class mAP of the original classes before and after incremental training
+
+    Returns:
+        Dictionary with per-class before/after/delta and the list of regressed classes
+    """
+    before = per_class_map(baseline_model, base_config)
+    after = per_class_map(new_model, base_config)
+    classes = {}
+    for name in BASE_CLASSES:
+        b, a = before.get(name, 0.0), after.get(name, 0.0)
+        classes[name] = {'before': round(b, 4), 'after': round(a, 4), 'delta': round(a - b, 4)}
+    regressed = [name for name, row in classes.items() if row['delta'] < -tolerance]
+    return {'classes': classes, 'regressed': regressed, 'tolerance': tolerance}
+
+
+def print_regression_report(report):
+    print(f"\n📉 Original-class mAP50-95 (tolerance {report['tolerance']}):")
+    for name, row in report['classes'].items():
+        flag = "❌" if name in report['regressed'] else "✅"
+        print(f"  {flag} {name:15s} {row['before']:.3f} -> {row['after']:.3f} ({row['delta']:+.3f})")
+    if report['regressed']:
+        print(f"⚠️  Regressed classes: {', '.join(report['regressed'])}")
+
+
+def train_incremental(epochs=20, replay_fraction=0.25, train_neck=False, baseline_model="best.pt",
+                      config_file="custom_food_config.yaml", overrides=None, tolerance=0.02):
+    """
+    Fine-tune the head (and optionally the neck) for new classes
+
+    Returns:
+        (path to best weights, regression report) or (None, None) on failure
+    """
+    incremental_config, base_config = build_replay_dataset(config_file, replay_fraction=replay_fraction)
+
+    # Freeze everything before the neck (head-and-neck) or before the Detect layer (head only)
+    depth = len(YOLO(baseline_model).model.model)
+    freeze = BACKBONE_LAYERS if train_neck else depth - 1
+    print(f"🧊 Freezing first {freeze} of {depth} layers ({'neck + head' if train_neck else 'head only'} trainable)")
+
+    train_args, pipeline = resolve_settings(None, dict(overrides or {}, epochs=epochs))
+    train_args.update(freeze=freeze, warmup_epochs=0)
+    best_model = run_training_phase(baseline_model, incremental_config, train_args, RUN_NAME,
+                                    pipeline['image_cache'], pipeline['resume'])
+    if not os.path.exists(best_model):
+        return None, None
+
+    report = regression_report(baseline_model, best_model, base_config, tolerance)
+    print_regression_report(report)
+    with open(os.path.join(PROJECT, RUN_NAME, "regression_report.json"), 'w') as f:
+        json.dump(report, f, indent=2)
+    return best_model, report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Add new food classes by fine-tuning only the detection head")
+    parser.add_argument("--epochs", type=int, default=20)
+    parser.add_argument("--replay", type=float, default=0.25, help="Fraction of original-class images to replay")
+    parser.add_argument("--train-neck", action="store_true", help="Also train the neck, not just the head")
+    parser.add_argument("--baseline", default="best.pt", help="Model trained on the original classes")
+    parser.add_argument("--data", default="custom_food_config.yaml")
+    parser.add_argument("--preset", choices=('default', 'cpu'))
+    parser.add_argument("--tolerance", type=float, default=0.02, help="Allowed mAP50-95 drop per original class")
+    parser.add_argument("--update-app", action="store_true", help="Promote the model if no class regressed")
+    args = parser.parse_args(argv)
+
+    print("🍽️ INCREMENTAL FOOD CLASS TRAINING")
+    print("=" * 50)
+    best_model, report = train_incremental(args.epochs, args.replay, args.train_neck, args.baseline,
+                                           args.data, {'preset': args.preset}, args.tolerance)
+    if not best_model:
+        print("❌ Incremental training failed")
+        return 1
+    if args.update_app:
+        if report['regressed']:
+            print("⚠️  Not updating the web app: original classes regressed beyond tolerance")
+            return 1
+        update_web_app(best_model)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
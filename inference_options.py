@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Inference Options for Food Detection App
+Per-request conf/iou/classes/max_det with server-wide defaults from the environment
+"""
+
+import os
+from typing import Dict, List, Mapping, Optional, Tuple
+
+
+def _parse_classes(value, names: Mapping[int, str]) -> Optional[List[int]]:
+    """
+    Class filter from names or ids, as a list or a comma-separated string
+    """
+    if value is None or value == '' or value == []:
+        return None
+    items = value if isinstance(value, (list, tuple)) else str(value).split(',')
+    by_name = {name.lower(): class_id for class_id, name in names.items()}
+    class_ids = []
+    for item in items:
+        item = str(item).strip()
+        if not item:
+            continue
+        if item.isdigit() and int(item) in names:
+            class_ids.append(int(item))
+        elif item.lower() in by_name:
+            class_ids.append(by_name[item.lower()])
+        else:
+            raise ValueError(f"Unknown class '{item}'")
+    return sorted(set(class_ids)) or None
+
+
+def default_options(names: Mapping[int, str], environ: Mapping[str, str] = os.environ) -> Dict:
+    """
+    Server-wide defaults: DETECT_CONF, DETECT_IOU, DETECT_MAX_DET, DETECT_CLASSES
+    """
+    return {
+        'conf': float(environ.get('DETECT_CONF', 0.25)),
+        'iou': float(environ.get('DETECT_IOU', 0.7)),
+        'max_det': int(environ.get('DETECT_MAX_DET', 300)),
+        'classes': _parse_classes(environ.get('DETECT_CLASSES'), names),
+    }
+
+
+def parse_inference_options(values, names: Mapping[int, str], defaults: Dict) -> Dict:
+    """
+    Read conf, iou, classes and max_det from request form/query values
+
+    Args:
+        values: Request values (form fields or query string)
+        names: Model class names by id
+        defaults: Server defaults from default_options()
+
+    Returns:
+        Keyword arguments for the YOLO call
+
+    Raises:
+        ValueError: If a value is malformed or out of range
+    """
+    options = dict(defaults)
+    if values.get('conf') not in (None, ''):
+        options['conf'] = float(values['conf'])
+    if values.get('iou') not in (None, ''):
+        options['iou'] = float(values['iou'])
+    if values.get('max_det') not in (None, ''):
+        options['max_det'] = int(values['max_det'])
+    if values.get('classes') not in (None, ''):
+        options['classes'] = _parse_classes(values['classes'], names)
+
+    if not 0 < options['conf'] < 1:
+        raise ValueError("conf must be between 0 and 1")
+    if not 0 < options['iou'] <= 1:
+        raise ValueError("iou must be between 0 and 1")
+    if not 1 <= options['max_det'] <= 1000:
+        raise ValueError("max_det must be between 1 and 1000")
+    return options
+
+
+def parse_original_size(values, received_size: Tuple[int, int]) -> Tuple[int, int]:
+    """
+    Size of the photo before the client downscaled it, from orig_width / orig_height
+
+    Args:
+        values: Request values (form fields or query string)
+        received_size: (width, height) of the uploaded image
+
+    Returns:
+        (width, height) that boxes should be reported in; received_size if the fields are absent
+
+    Raises:
+        ValueError: If only one field is given, or the sizes are not a downscale of the same photo
+    """
+    width, height = values.get('orig_width'), values.get('orig_height')
+    if width in (None, '') and height in (None, ''):
+        return tuple(received_size)
+    if width in (None, '') or height in (None, ''):
+        raise ValueError("orig_width and orig_height must be given together")
+    width, height = int(width), int(height)
+    received_width, received_height = received_size
+    if width < received_width or height < received_height:
+        raise ValueError("orig_width/orig_height are smaller than the uploaded image")
+    # Each side of the resized image may be off by half a pixel from rounding
+    if abs(width * received_height - height * received_width) > width + height:
+        raise ValueError("orig_width/orig_height do not match the uploaded image's aspect ratio")
+    return width, height
@@ -5,22 +5,219 @@ Handles ingredients lists with editable quantities
 """
 
 import json
+import logging
 import os
-from typing import Dict, List, Optional
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from http_utils import content_version
+
+logger = logging.getLogger('nutrispike.ingredients')
+
+class IngredientOverlays:
+    """
+    Per-session quantity edits layered over the shared catalog
+    
+    Only changed quantities are kept, as {(food, ingredient): quantity} per
+    session. Sessions idle for longer than ttl seconds (or beyond
+    max_sessions, least recently used first) are evicted. Edit dicts are
+    replaced, never mutated, so readers can use them without the lock.
+    """
+    def __init__(self, ttl: float = 3600, max_sessions: int = 10000):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        # session_id -> (last_seen, edits), least recently used first
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def __len__(self):
+        return len(self._sessions)
+    
+    def _evict(self, now: float):
+        while self._sessions:
+            session_id, (last_seen, _) = next(iter(self._sessions.items()))
+            if now - last_seen <= self.ttl and len(self._sessions) <= self.max_sessions:
+                break
+            del self._sessions[session_id]
+    
+    def edits(self, session_id: str) -> Dict:
+        """
+        Edits of a live session (refreshes its idle timer)
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+            if entry is None or now - entry[0] > self.ttl:
+                return {}
+            self._sessions[session_id] = (now, entry[1])
+            return entry[1]
+    
+    def set_quantity(self, session_id: str, food_key: str, ingredient_name: str, quantity: str):
+        """
+        Record one quantity edit for a session
+        """
+        self.set_quantities(session_id, {(food_key, ingredient_name.lower()): quantity})
+    
+    def set_quantities(self, session_id: str, changes: Dict[Tuple[str, str], str]):
+        """
+        Record several {(food_key, ingredient_name_lower): quantity} edits at once
+        """
+        now = time.monotonic()
+        with self._lock:
+            entry = self._sessions.pop(session_id, None)
+            edits = dict(entry[1]) if entry and now - entry[0] <= self.ttl else {}
+            edits.update(changes)
+            self._sessions[session_id] = (now, edits)
+            self._evict(now)
+    
+    def clear(self, session_id: str):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+class SharedOverlays:
+    """
+    IngredientOverlays kept in a SQLite file that several app.py nodes share
+    
+    Behind router.py an upload can land on any node, so a session's edits
+    must be readable everywhere. Same interface and eviction rules as
+    IngredientOverlays; last_seen is wall-clock time and is only rewritten
+    once it is a few seconds old, so reads during /detect rarely write.
+    """
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS sessions (session_id TEXT PRIMARY KEY, last_seen REAL NOT NULL);
+    CREATE INDEX IF NOT EXISTS sessions_last_seen ON sessions (last_seen);
+    CREATE TABLE IF NOT EXISTS edits (
+        session_id TEXT NOT NULL,
+        food TEXT NOT NULL,
+        ingredient TEXT NOT NULL,
+        quantity TEXT NOT NULL,
+        PRIMARY KEY (session_id, food, ingredient)
+    );
+    """
+    
+    def __init__(self, db_path: str, ttl: float = 3600, max_sessions: int = 10000):
+        self.db_path = db_path
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self._touch_after = min(60.0, ttl / 10)
+        self._local = threading.local()
+        self._connect().executescript(self.SCHEMA)
+    
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+    
+    def __len__(self):
+        return self._connect().execute("SELECT COUNT(*) FROM sessions WHERE last_seen >= ?",
+                                       (time.time() - self.ttl,)).fetchone()[0]
+    
+    def edits(self, session_id: str) -> Dict:
+        """
+        Edits of a live session (refreshes its idle timer)
+        """
+        now = time.time()
+        conn = self._connect()
+        row = conn.execute("SELECT last_seen FROM sessions WHERE session_id = ?", (session_id,)).fetchone()
+        if row is None or now - row[0] > self.ttl:
+            return {}
+        if now - row[0] > self._touch_after:
+            with conn:
+                conn.execute("UPDATE sessions SET last_seen = ? WHERE session_id = ?", (now, session_id))
+        return {(food, ingredient): quantity for food, ingredient, quantity in conn.execute(
+            "SELECT food, ingredient, quantity FROM edits WHERE session_id = ?", (session_id,))}
+    
+    def set_quantity(self, session_id: str, food_key: str, ingredient_name: str, quantity: str):
+        """
+        Record one quantity edit for a session
+        """
+        self.set_quantities(session_id, {(food_key, ingredient_name.lower()): quantity})
+    
+    def set_quantities(self, session_id: str, changes: Dict[Tuple[str, str], str]):
+        """
+        Record several {(food_key, ingredient_name_lower): quantity} edits at once
+        """
+        now = time.time()
+        conn = self._connect()
+        with conn:
+            # An expired session starts over, as in IngredientOverlays
+            conn.execute("DELETE FROM sessions WHERE last_seen < ?", (now - self.ttl,))
+            conn.execute("DELETE FROM sessions WHERE session_id IN (SELECT session_id FROM sessions "
+                         "WHERE session_id != ? ORDER BY last_seen DESC LIMIT -1 OFFSET ?)",
+                         (session_id, self.max_sessions - 1))
+            conn.execute("DELETE FROM edits WHERE session_id NOT IN (SELECT session_id FROM sessions)")
+            conn.execute("INSERT OR REPLACE INTO sessions (session_id, last_seen) VALUES (?, ?)", (session_id, now))
+            conn.executemany("INSERT OR REPLACE INTO edits (session_id, food, ingredient, quantity) "
+                             "VALUES (?, ?, ?, ?)",
+                             [(session_id, food, name, quantity) for (food, name), quantity in changes.items()])
+    
+    def clear(self, session_id: str):
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM sessions WHERE session_id = ?", (session_id,))
+            conn.execute("DELETE FROM edits WHERE session_id = ?", (session_id,))
 
 class IngredientsManager:
-    def __init__(self):
+    def __init__(self, session_ttl: float = 3600, edits_db: Optional[str] = None):
         """
         Initialize Ingredients Manager
+        
+        The catalog is an immutable snapshot: writers build a new dict and
+        swap it in, so readers never lock. Per-user edits go to overlays.
+        
+        Args:
+            session_ttl: Seconds of inactivity before a session's edits are dropped
+            edits_db: SQLite file for session edits shared between nodes (None keeps them in memory)
         """
-        self.ingredients = {}
+        # (catalog, memoized food name -> catalog key resolution, content version), swapped together
+        self._catalog = ({}, {}, '')
+        self._write_lock = threading.Lock()
+        self.overlays = SharedOverlays(edits_db, ttl=session_ttl) if edits_db else IngredientOverlays(ttl=session_ttl)
+        self.cache_hits = 0
+        self.cache_misses = 0
         self.load_default_ingredients()
     
+    @property
+    def ingredients(self) -> Dict[str, List[Dict]]:
+        """
+        Current catalog snapshot; treat as read-only
+        """
+        return self._catalog[0]
+    
+    @property
+    def version(self) -> str:
+        """
+        Content hash of the current catalog (same in every worker), used for ETags
+        """
+        return self._catalog[2]
+    
+    def session_version(self, session_id: Optional[str]) -> str:
+        """
+        Version of the catalog as seen by a session (catalog plus its edits)
+        """
+        edits = self.overlays.edits(session_id) if session_id else None
+        if not edits:
+            return self.version
+        return f"{self.version}.{content_version(sorted(edits.items()))[:8]}"
+    
+    def _swap(self, ingredients: Dict[str, List[Dict]], lookup_cache: Optional[Dict] = None):
+        """
+        Publish a new catalog snapshot (a fresh lookup cache unless the keys are unchanged)
+        """
+        self._catalog = (ingredients, {} if lookup_cache is None else lookup_cache, content_version(ingredients))
+    
     def load_default_ingredients(self):
         """
         Load default ingredients for common foods
         """
-        self.ingredients = {
+        self._swap({
             'apple': [
                 {'name': 'Apples', 'quantity': '2', 'unit': 'pieces'},
                 {'name': 'Sugar', 'quantity': '1', 'unit': 'tbsp'},
@@ -106,29 +303,58 @@ class IngredientsManager:
                 {'name': 'Salt', 'quantity': '1', 'unit': 'tsp'},
                 {'name': 'Oil', 'quantity': '1', 'unit': 'cup'}
             ]
-        }
+        })
         print("📝 Loaded default ingredients")
     
-    def get_ingredients(self, food_name: str) -> Optional[List[Dict]]:
+    def get_ingredients(self, food_name: str, session_id: Optional[str] = None) -> Optional[List[Dict]]:
         """
         Get ingredients list for a specific food
         
         Args:
             food_name: Name of the food item
+            session_id: Apply this session's quantity edits on top of the catalog
             
         Returns:
             List of ingredients with quantities or None if not found
+            (shared with the catalog unless edited; do not mutate)
         """
         food_key = food_name.lower().strip()
+        catalog, lookup_cache, _ = self._catalog
+        
+        if food_key in lookup_cache:
+            self.cache_hits += 1
+            resolved = lookup_cache[food_key]
+        else:
+            self.cache_misses += 1
+            resolved = self._resolve_food_key(food_key, catalog)
+            # Only hits are memoized; caching misses would let arbitrary request names grow it without bound
+            if resolved is not None:
+                lookup_cache[food_key] = resolved
+        
+        if resolved is None:
+            return None
+        ingredients = catalog.get(resolved)
+        edits = self.overlays.edits(session_id) if session_id else None
+        if not edits:
+            return ingredients
         
+        # Copy only the edited entries
+        return [dict(ingredient, quantity=edits[(resolved, ingredient['name'].lower())])
+                if (resolved, ingredient['name'].lower()) in edits else ingredient
+                for ingredient in ingredients]
+    
+    def _resolve_food_key(self, food_key: str, catalog: Dict) -> Optional[str]:
+        """
+        Resolve a normalized food name to a catalog key
+        """
         # Try exact match first
-        if food_key in self.ingredients:
-            return self.ingredients[food_key]
+        if food_key in catalog:
+            return food_key
         
         # Try partial matches
-        for key, ingredients in self.ingredients.items():
+        for key in catalog:
             if food_key in key or key in food_key:
-                return ingredients
+                return key
         
         return None
     
@@ -140,10 +366,12 @@ class IngredientsManager:
             food_name: Name of the food
             ingredients: List of ingredient dictionaries
         """
-        self.ingredients[food_name.lower().strip()] = ingredients
-        print(f"✅ Added ingredients for: {food_name}")
+        with self._write_lock:
+            self._swap({**self.ingredients, food_name.lower().strip(): [dict(i) for i in ingredients]})
+        logger.info("Added ingredients for: %s", food_name)
     
-    def update_quantity(self, food_name: str, ingredient_name: str, new_quantity: str):
+    def update_quantity(self, food_name: str, ingredient_name: str, new_quantity: str,
+                        session_id: Optional[str] = None):
         """
         Update quantity for a specific ingredient
         
@@ -151,26 +379,117 @@ class IngredientsManager:
             food_name: Name of the food
             ingredient_name: Name of the ingredient
             new_quantity: New quantity value
+            session_id: Only change it for this session; None changes the shared catalog
         """
-        food_key = food_name.lower().strip()
-        if food_key in self.ingredients:
-            for ingredient in self.ingredients[food_key]:
-                if ingredient['name'].lower() == ingredient_name.lower():
-                    ingredient['quantity'] = new_quantity
-                    print(f"✅ Updated {ingredient_name} quantity to {new_quantity}")
-                    return True
-        return False
+        if self.update_quantities([(food_name, ingredient_name, new_quantity)], session_id):
+            return False
+        logger.debug("Updated %s quantity to %s", ingredient_name, new_quantity)
+        return True
     
-    def save_to_json(self, filename: str = "ingredients.json"):
+    def update_quantities(self, updates: List[Tuple[str, str, str]],
+                          session_id: Optional[str] = None) -> List[Tuple[str, str]]:
+        """
+        Apply many quantity updates atomically: all of them or none
+        
+        Args:
+            updates: (food_name, ingredient_name, new_quantity) tuples
+            session_id: Only change them for this session; None changes the shared catalog
+            
+        Returns:
+            (food_name, ingredient_name) pairs that were not found; nothing is applied unless empty
+        """
+        catalog = self.ingredients
+        changes, missing = {}, []
+        for food_name, ingredient_name, new_quantity in updates:
+            food_key, name = food_name.lower().strip(), ingredient_name.lower()
+            if any(i['name'].lower() == name for i in catalog.get(food_key, [])):
+                changes[(food_key, name)] = new_quantity
+            else:
+                missing.append((food_name, ingredient_name))
+        if missing or not changes:
+            return missing
+        
+        if session_id:
+            self.overlays.set_quantities(session_id, changes)
+            return []
+        
+        # Copy-on-write; readers keep the old snapshot until the swap
+        with self._write_lock:
+            catalog = dict(self.ingredients)
+            for food_key in {food_key for food_key, _ in changes}:
+                catalog[food_key] = [dict(i, quantity=changes[(food_key, i['name'].lower())])
+                                     if (food_key, i['name'].lower()) in changes else i
+                                     for i in catalog[food_key]]
+            self._swap(catalog, self._catalog[1])
+        return []
+    
+    def save_to_json(self, filename: str = "ingredients.json") -> bool:
         """
         Save ingredients to JSON file
+        
+        Written to a temporary file and renamed, so a watcher never reads half a file.
+        
+        Returns:
+            True if the file was written
         """
+        tmp = f"{filename}.{os.getpid()}.tmp"
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
+            with open(tmp, 'w', encoding='utf-8') as f:
                 json.dump(self.ingredients, f, indent=2, ensure_ascii=False)
+            os.replace(tmp, filename)
             print(f"💾 Saved ingredients to: {filename}")
+            return True
         except Exception as e:
             print(f"❌ Error saving ingredients: {e}")
+            return False
+    
+    @staticmethod
+    def parse_json(filename: str) -> Dict[str, List[Dict]]:
+        """
+        Read and validate an ingredients JSON file without touching the live catalog
+        
+        Raises:
+            ValueError: If the file is not a {food: [ingredient, ...]} mapping
+        """
+        with open(filename, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if not isinstance(data, dict) or not all(
+                isinstance(items, list) and all(isinstance(i, dict) and 'name' in i and 'quantity' in i for i in items)
+                for items in data.values()):
+            raise ValueError(f"{filename} is not a {{food: [ingredients]}} mapping")
+        return {food.lower().strip(): items for food, items in data.items()}
+    
+    def reload(self, ingredients: Dict[str, List[Dict]]) -> Dict[str, List[str]]:
+        """
+        Publish a freshly parsed catalog as one snapshot swap
+        
+        Lookup cache entries the change cannot affect are carried over; names
+        that resolved to removed foods, to nothing, or that an added food
+        could now match are resolved again on next use.
+        
+        Returns:
+            Diff with added, removed and changed food names
+        """
+        with self._write_lock:
+            old, old_cache, _ = self._catalog
+            diff = {
+                'added': [food for food in ingredients if food not in old],
+                'removed': [food for food in old if food not in ingredients],
+                'changed': [food for food in ingredients if food in old and ingredients[food] != old[food]],
+            }
+            if not any(diff.values()):
+                return diff
+            
+            # Partial matches follow key order, so a reordered catalog invalidates every resolution
+            if [food for food in old if food in ingredients] != [food for food in ingredients if food in old]:
+                lookup_cache = {}
+            else:
+                removed = set(diff['removed'])
+                lookup_cache = {name: key for name, key in list(old_cache.items())
+                                if key is not None and key not in removed
+                                and not any(name in food or food in name for food in diff['added'])}
+            self._swap(ingredients, lookup_cache)
+        return diff
     
     def load_from_json(self, filename: str = "ingredients.json"):
         """
@@ -178,8 +497,7 @@ class IngredientsManager:
         """
         try:
             if os.path.exists(filename):
-                with open(filename, 'r', encoding='utf-8') as f:
-                    self.ingredients = json.load(f)
+                self.reload(self.parse_json(filename))
                 print(f"📖 Loaded ingredients from: {filename}")
         except Exception as e:
             print(f"❌ Error loading ingredients: {e}")
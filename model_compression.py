@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Model Compression for Food Detection
+Produce INT8-quantized and pruned variants of best.pt, benchmark them on CPU
+and promote the fastest one that stays within an accuracy budget
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import time
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+from ultralytics import YOLO
+
+OUTPUT_DIR = "compressed_models"
+SERVING_DIR = "serving"
+MANIFEST_FILE = "serving_model.json"
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+def _letterbox(image: np.ndarray, imgsz: int) -> np.ndarray:
+    """
+    Resize and pad a BGR image to imgsz x imgsz the way Ultralytics does, returning NCHW float32 RGB
+    """
+    h, w = image.shape[:2]
+    r = min(imgsz / h, imgsz / w)
+    nh, nw = int(round(h * r)), int(round(w * r))
+    resized = cv2.resize(image, (nw, nh), interpolation=cv2.INTER_LINEAR)
+    canvas = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+    top, left = (imgsz - nh) // 2, (imgsz - nw) // 2
+    canvas[top:top + nh, left:left + nw] = resized
+    return np.ascontiguousarray(canvas[:, :, ::-1].transpose(2, 0, 1)[None], dtype=np.float32) / 255.0
+
+
+def _list_images(image_dir: str, limit: Optional[int] = None) -> List[str]:
+    files = sorted(os.path.join(image_dir, f) for f in os.listdir(image_dir)
+                   if f.lower().endswith(IMAGE_EXTENSIONS))
+    return files[:limit] if limit else files
+
+
+def export_onnx(model_path: str, imgsz: int, out_path: str) -> str:
+    """
+    Export a YOLO .pt model to ONNX with dynamic batch and image size
+
+    app.py calls the served model with other sizes (degraded imgsz) and with
+    batches of tiles, which a fixed-shape graph (batch 1 at imgsz) would reject.
+    """
+    exported = YOLO(model_path).export(format='onnx', imgsz=imgsz, dynamic=True, simplify=True)
+    shutil.move(str(exported), out_path)
+    return out_path
+
+
+def quantize_int8(onnx_path: str, calibration_dir: str, imgsz: int, out_path: str,
+                  calibration_images: int = 200) -> str:
+    """
+    Static INT8 quantization with ONNX Runtime, calibrated on real validation images
+
+    Requires the optional onnx and onnxruntime packages.
+    """
+    import onnxruntime
+    from onnxruntime.quantization import (CalibrationDataReader, QuantFormat, QuantType,
+                                          quantize_static)
+
+    input_name = onnxruntime.InferenceSession(onnx_path, providers=['CPUExecutionProvider']).get_inputs()[0].name
+    images = _list_images(calibration_dir, calibration_images)
+    if not images:
+        raise FileNotFoundError(f"No calibration images in {calibration_dir}")
+
+    class ValidImages(CalibrationDataReader):
+        def __init__(self):
+            self._files = iter(images)
+
+        def get_next(self):
+            for path in self._files:
+                image = cv2.imread(path)
+                if image is not None:
+                    return {input_name: _letterbox(image, imgsz)}
+            return None
+
+    quantize_static(onnx_path, out_path, ValidImages(), quant_format=QuantFormat.QDQ,
+                    activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8, per_channel=True)
+    return out_path
+
+
+def prune_model(model_path: str, amount: float, out_path: str) -> str:
+    """
+    L1 magnitude pruning of every Conv2d weight, made permanent and saved as .pt
+    """
+    import torch.nn as nn
+    from torch.nn.utils import prune
+
+    model = YOLO(model_path)
+    for module in model.model.modules():
+        if isinstance(module, nn.Conv2d):
+            prune.l1_unstructured(module, name='weight', amount=amount)
+            prune.remove(module, 'weight')
+    model.save(out_path)
+    return out_path
+
+
+def load_variant(path: str) -> YOLO:
+    return YOLO(path, task='detect')
+
+
+def benchmark_latency(path: str, image_dir: str, imgsz: int, runs: int = 50, warmup: int = 5) -> float:
+    """
+    Median single-image CPU latency in milliseconds (preprocess + inference + NMS)
+    """
+    model = load_variant(path)
+    images = [cv2.imread(p) for p in _list_images(image_dir, max(runs, warmup))]
+    images = [im for im in images if im is not None]
+    if not images:
+        raise FileNotFoundError(f"No benchmark images in {image_dir}")
+    for i in range(warmup):
+        model(images[i % len(images)], imgsz=imgsz, device='cpu', verbose=False)
+    timings = []
+    for i in range(runs):
+        start = time.perf_counter()
+        model(images[i % len(images)], imgsz=imgsz, device='cpu', verbose=False)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def evaluate_map(path: str, data_config: str, imgsz: int) -> Dict[str, float]:
+    metrics = load_variant(path).val(data=data_config, imgsz=imgsz, device='cpu', batch=1,
+                                     plots=False, verbose=False)
+    return {'map50_95': float(metrics.box.map), 'map50': float(metrics.box.map50)}
+
+
+def build_variants(model_path: str, calibration_dir: str, imgsz: int, prune_amount: float = 0.0,
+                   output_dir: str = OUTPUT_DIR) -> Dict[str, str]:
+    """
+    Create all compressed variants that the installed packages allow
+
+    Returns:
+        Mapping of variant name to model path ('fp32' is the original)
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    variants = {'fp32': model_path}
+    sources = {'': model_path}
+    if prune_amount > 0:
+        pruned = prune_model(model_path, prune_amount, os.path.join(output_dir, f"pruned{int(prune_amount * 100)}.pt"))
+        variants[f'pruned{int(prune_amount * 100)}'] = pruned
+        sources[f'pruned{int(prune_amount * 100)}_'] = pruned
+
+    for prefix, source in sources.items():
+        try:
+            onnx_path = export_onnx(source, imgsz, os.path.join(output_dir, f"{prefix}fp32.onnx"))
+            variants[f'{prefix}onnx_fp32'] = onnx_path
+            variants[f'{prefix}int8'] = quantize_int8(onnx_path, calibration_dir, imgsz,
+                                                      os.path.join(output_dir, f"{prefix}int8.onnx"))
+        except ImportError as e:
+            print(f"⚠️  Skipping ONNX/INT8 variants ({e}); pip install onnx onnxruntime")
+            break
+    return variants
+
+
+def compress_and_promote(model_path: str = "best.pt", data_config: str = "custom_food_config.yaml",
+                         calibration_dir: str = "dataset/images/valid", imgsz: int = 640,
+                         max_map_drop: float = 0.01, prune_amount: float = 0.0,
+                         runs: int = 50, promote: bool = True) -> Dict:
+    """
+    Build variants, benchmark them and promote the fastest one within the accuracy budget
+
+    Args:
+        max_map_drop: Largest allowed absolute mAP50-95 drop versus the FP32 model
+
+    Returns:
+        Report with every variant's latency, mAP and whether it passed the gate
+    """
+    variants = build_variants(model_path, calibration_dir, imgsz, prune_amount)
+
+    results = {}
+    for name, path in variants.items():
+        print(f"⏱️ Benchmarking {name}...")
+        results[name] = {'path': path, 'latency_ms': round(benchmark_latency(path, calibration_dir, imgsz, runs), 2),
+                         **evaluate_map(path, data_config, imgsz)}
+
+    baseline = results['fp32']
+    for row in results.values():
+        row['map_drop'] = round(baseline['map50_95'] - row['map50_95'], 4)
+        row['speedup'] = round(baseline['latency_ms'] / row['latency_ms'], 2)
+        row['passed'] = row['map_drop'] <= max_map_drop
+
+    print(f"\n📊 {'variant':18s} {'latency':>10s} {'speedup':>8s} {'mAP50-95':>9s} {'drop':>7s}")
+    for name, row in results.items():
+        flag = "✅" if row['passed'] else "❌"
+        print(f"{flag} {name:18s} {row['latency_ms']:8.1f}ms {row['speedup']:7.2f}x "
+              f"{row['map50_95']:9.3f} {row['map_drop']:+7.3f}")
+
+    winner = min((name for name, row in results.items() if row['passed']), key=lambda n: results[n]['latency_ms'])
+    report = {'baseline': model_path, 'imgsz': imgsz, 'max_map_drop': max_map_drop,
+              'variants': results, 'promoted': None}
+
+    if promote and winner != 'fp32':
+        os.makedirs(SERVING_DIR, exist_ok=True)
+        source = results[winner]['path']
+        target = os.path.join(SERVING_DIR, f"{winner}{os.path.splitext(source)[1]}")
+        shutil.copy2(source, target)
+        manifest = {'path': target, 'variant': winner, 'imgsz': imgsz, 'source': model_path,
+                    **{k: results[winner][k] for k in ('latency_ms', 'speedup', 'map50_95', 'map_drop')}}
+        with open(MANIFEST_FILE, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        report['promoted'] = manifest
+        print(f"\n🏆 Promoted {winner} for serving ({results[winner]['speedup']}x faster): {target}")
+    else:
+        if promote and os.path.exists(MANIFEST_FILE):
+            os.remove(MANIFEST_FILE)
+        print("\n📝 FP32 model stays in service (no variant was faster within the accuracy budget)")
+
+    with open(os.path.join(OUTPUT_DIR, "compression_report.json"), 'w') as f:
+        json.dump(report, f, indent=2)
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Quantize/prune the model and promote it if accuracy holds")
+    parser.add_argument("--model", default="best.pt")
+    parser.add_argument("--data", default="custom_food_config.yaml", help="Dataset YAML used for mAP")
+    parser.add_argument("--calibration-dir", default="dataset/images/valid")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--max-map-drop", type=float, default=0.01, help="Accuracy budget (absolute mAP50-95)")
+    parser.add_argument("--prune", type=float, default=0.0, help="Fraction of conv weights to prune, e.g. 0.3")
+    parser.add_argument("--runs", type=int, default=50, help="Timed inferences per variant")
+    parser.add_argument("--no-promote", action="store_true")
+    args = parser.parse_args(argv)
+
+    print("🗜️ MODEL COMPRESSION")
+    print("=" * 50)
+    compress_and_promote(args.model, args.data, args.calibration_dir, args.imgsz, args.max_map_drop,
+                         args.prune, args.runs, not args.no_promote)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Nutrition Table for Food Detection App
+Per-serving nutrition values (same table as the web page) and meal totals
+"""
+
+from typing import Dict, Iterable
+
+# Per standard serving
+NUTRITION = {
+    'apple': {'calories': 52, 'carbs': 14, 'protein': 0.3, 'fat': 0.2},
+    'banana': {'calories': 89, 'carbs': 23, 'protein': 1.1, 'fat': 0.3},
+    'rice': {'calories': 130, 'carbs': 28, 'protein': 2.7, 'fat': 0.3},
+    'pizza': {'calories': 266, 'carbs': 33, 'protein': 11, 'fat': 10},
+    'burger': {'calories': 354, 'carbs': 33, 'protein': 17, 'fat': 17},
+    'fries': {'calories': 365, 'carbs': 63, 'protein': 4, 'fat': 11},
+    'chapathi': {'calories': 71, 'carbs': 15, 'protein': 2, 'fat': 0.4},
+    'idli': {'calories': 39, 'carbs': 8, 'protein': 1.5, 'fat': 0.1},
+    'chicken gravy': {'calories': 165, 'carbs': 8, 'protein': 25, 'fat': 4},
+    'soda': {'calories': 150, 'carbs': 39, 'protein': 0, 'fat': 0},
+    'tomato': {'calories': 18, 'carbs': 4, 'protein': 0.9, 'fat': 0.2},
+    'vada': {'calories': 140, 'carbs': 20, 'protein': 4, 'fat': 5},
+}
+NUTRIENTS = ('calories', 'carbs', 'protein', 'fat')
+
+
+def nutrition_for(food_name: str, portion: float = 1.0) -> Dict[str, float]:
+    """
+    Nutrition of one detected item (zeros for unknown foods)
+    """
+    values = NUTRITION.get(food_name.lower().strip())
+    if values is None:
+        return {nutrient: 0.0 for nutrient in NUTRIENTS}
+    return {nutrient: round(values[nutrient] * portion, 1) for nutrient in NUTRIENTS}
+
+
+def meal_totals(detections: Iterable[Dict]) -> Dict[str, float]:
+    """
+    Summed nutrition of detections carrying 'class' and (optionally) 'portion'
+    """
+    totals = dict.fromkeys(NUTRIENTS, 0.0)
+    for detection in detections:
+        values = nutrition_for(detection['class'], detection.get('portion', 1.0))
+        for nutrient in NUTRIENTS:
+            totals[nutrient] += values[nutrient]
+    return {nutrient: round(value, 1) for nutrient, value in totals.items()}
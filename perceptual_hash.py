@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+"""
+Perceptual Hashing for Food Detection
+dHash/pHash fingerprints and a Hamming-distance index to find near-duplicate photos
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageOps
+
+HASH_SIZE = 8
+# Max differing bits (of 64) for two photos to count as the same meal
+PHASH_THRESHOLD = 6
+DHASH_THRESHOLD = 10
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.tiff')
+# Every hash starts from this one grayscale decode, so a file always gets the same hashes
+DECODE_SIZE = 128
+
+
+def _decode(image) -> Image.Image:
+    """
+    Image (PIL image or path) as a DECODE_SIZE x DECODE_SIZE grayscale image
+    """
+    if not isinstance(image, Image.Image):
+        image = Image.open(image)
+    # JPEGs decode straight at 1/2 to 1/8 scale; the hashes only need a few dozen pixels
+    image.draft('L', (DECODE_SIZE, DECODE_SIZE))
+    image = ImageOps.exif_transpose(image).convert('L')
+    return image.resize((DECODE_SIZE, DECODE_SIZE), Image.LANCZOS)
+
+
+def _grayscale(decoded: Image.Image, size: Tuple[int, int]) -> np.ndarray:
+    """
+    Decoded image reduced to a float array of the given (width, height)
+    """
+    return np.asarray(decoded.resize(size, Image.LANCZOS), dtype=np.float64)
+
+
+def _bits_to_int(bits: np.ndarray) -> int:
+    return int(''.join('1' if bit else '0' for bit in bits.ravel()), 2)
+
+
+def dhash(image, hash_size: int = HASH_SIZE) -> int:
+    """
+    Difference hash: whether each pixel is brighter than its right neighbour
+    """
+    return _dhash(_decode(image), hash_size)
+
+
+def _dhash(decoded: Image.Image, hash_size: int = HASH_SIZE) -> int:
+    pixels = _grayscale(decoded, (hash_size + 1, hash_size))
+    return _bits_to_int(pixels[:, 1:] > pixels[:, :-1])
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)
+    matrix = np.cos(np.pi * (2 * k[None, :] + 1) * k[:, None] / (2 * n)) * np.sqrt(2.0 / n)
+    matrix[0] /= np.sqrt(2.0)
+    return matrix
+
+
+def phash(image, hash_size: int = HASH_SIZE, highfreq_factor: int = 4) -> int:
+    """
+    DCT hash: which low-frequency coefficients of a 32x32 thumbnail are above their median
+    """
+    return _phash(_decode(image), hash_size, highfreq_factor)
+
+
+def _phash(decoded: Image.Image, hash_size: int = HASH_SIZE, highfreq_factor: int = 4) -> int:
+    size = hash_size * highfreq_factor
+    pixels = _grayscale(decoded, (size, size))
+    dct = _dct_matrix(size)
+    low = (dct @ pixels @ dct.T)[:hash_size, :hash_size]
+    # The DC term only encodes overall brightness
+    return _bits_to_int(low > np.median(low.ravel()[1:]))
+
+
+def image_hashes(image) -> Tuple[int, int]:
+    """
+    (phash, dhash) of an image; opens and decodes the file once
+
+    Same values as phash(image) and dhash(image), which start from the same decode.
+    """
+    decoded = _decode(image)
+    return _phash(decoded), _dhash(decoded)
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count('1')
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over Hamming distance
+
+    A radius query only descends into children whose edge distance is within
+    the radius of the query's distance to the node (triangle inequality), so
+    small-radius lookups touch a small part of the tree.
+    """
+
+    def __init__(self):
+        self._root = None
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def add(self, key: int, item):
+        self._size += 1
+        if self._root is None:
+            self._root = (key, [item], {})
+            return
+        node = self._root
+        while True:
+            distance = hamming(key, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = (key, [item], {})
+                return
+            node = child
+
+    def search(self, key: int, radius: int) -> List[Tuple[int, object]]:
+        """
+        Items within radius bits of key as (distance, item), nearest first
+        """
+        found = []
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node_key, items, children = stack.pop()
+            distance = hamming(key, node_key)
+            if distance <= radius:
+                found.extend((distance, item) for item in items)
+            for edge in range(max(1, distance - radius), distance + radius + 1):
+                child = children.get(edge)
+                if child is not None:
+                    stack.append(child)
+        found.sort(key=lambda pair: pair[0])
+        return found
+
+
+class NearDuplicateIndex:
+    """
+    Results keyed by perceptual hash, so near-identical photos can reuse them
+
+    Candidates come from a BK-tree lookup on the pHash; a candidate only
+    counts as a duplicate if its dHash also agrees, which keeps different
+    dishes on the same plate from matching. Every reuse is appended to the
+    audit trail (and to audit_file as JSON lines if given).
+
+    Args:
+        phash_threshold: Max pHash Hamming distance (0-64)
+        dhash_threshold: Max dHash Hamming distance (0-64)
+        audit_file: Optional JSONL file that reuse records are appended to
+    """
+
+    def __init__(self, phash_threshold: int = PHASH_THRESHOLD, dhash_threshold: int = DHASH_THRESHOLD,
+                 audit_file: Optional[str] = None):
+        self.phash_threshold = phash_threshold
+        self.dhash_threshold = dhash_threshold
+        self.audit_file = audit_file
+        self.audit: List[Dict] = []
+        self._tree = BKTree()
+
+    def __len__(self):
+        return len(self._tree)
+
+    def add(self, key: str, hashes: Tuple[int, int], result):
+        """
+        Index the result computed for image `key`
+        """
+        self._tree.add(hashes[0], {'key': key, 'dhash': hashes[1], 'result': result})
+
+    def find(self, hashes: Tuple[int, int]) -> Optional[Tuple[Dict, int, int]]:
+        """
+        Closest indexed entry within both thresholds as (entry, phash distance, dhash distance), or None
+        """
+        for distance, entry in self._tree.search(hashes[0], self.phash_threshold):
+            dhash_distance = hamming(hashes[1], entry['dhash'])
+            if dhash_distance <= self.dhash_threshold:
+                return entry, distance, dhash_distance
+        return None
+
+    def lookup(self, key: str, hashes: Tuple[int, int]):
+        """
+        Result of a near-duplicate of image `key`, or None; reuses are recorded in the audit trail
+        """
+        match = self.find(hashes)
+        if match is None:
+            return None
+        entry, phash_distance, dhash_distance = match
+        record = {'image': key, 'reused_from': entry['key'], 'phash_distance': phash_distance,
+                  'dhash_distance': dhash_distance, 'phash_threshold': self.phash_threshold,
+                  'dhash_threshold': self.dhash_threshold, 'time': time.time()}
+        self.audit.append(record)
+        if self.audit_file:
+            with open(self.audit_file, 'a') as f:
+                f.write(json.dumps(record) + '\n')
+        return entry['result']
+
+
+def find_duplicate_groups(folder: str, phash_threshold: int = PHASH_THRESHOLD,
+                          dhash_threshold: int = DHASH_THRESHOLD) -> List[List[str]]:
+    """
+    Group the images in a folder with the first earlier photo they duplicate
+    """
+    index = NearDuplicateIndex(phash_threshold, dhash_threshold)
+    groups: Dict[str, List[str]] = {}
+    for name in sorted(f for f in os.listdir(folder) if f.lower().endswith(IMAGE_EXTENSIONS)):
+        hashes = image_hashes(os.path.join(folder, name))
+        original = index.lookup(name, hashes)
+        if original is None:
+            index.add(name, hashes, name)
+            groups[name] = [name]
+        else:
+            groups[original].append(name)
+    return [group for group in groups.values() if len(group) > 1]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="List near-duplicate photos in a folder")
+    parser.add_argument("folder")
+    parser.add_argument("--phash-threshold", type=int, default=PHASH_THRESHOLD)
+    parser.add_argument("--dhash-threshold", type=int, default=DHASH_THRESHOLD)
+    args = parser.parse_args(argv)
+
+    groups = find_duplicate_groups(args.folder, args.phash_threshold, args.dhash_threshold)
+    for group in groups:
+        print(f"🔁 {group[0]}: {', '.join(group[1:])}")
+    print(f"Found {sum(len(group) - 1 for group in groups)} near-duplicates in {len(groups)} groups")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Portion Size Estimator for Food Detection App
+Turns detection box geometry into per-food quantity multipliers
+"""
+
+from fractions import Fraction
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Share of a dinner plate's area that one standard serving of each food covers
+REFERENCE_PLATE_SHARE = {
+    'apple': 0.06,
+    'banana': 0.08,
+    'rice': 0.25,
+    'pizza': 0.35,
+    'burger': 0.15,
+    'fries': 0.15,
+    'chapathi': 0.20,
+    'idli': 0.05,
+    'chicken gravy': 0.20,
+    'soda': 0.06,
+    'tomato': 0.04,
+    'vada': 0.05,
+}
+DEFAULT_PLATE_SHARE = 0.15
+
+# A plate typically fills about half of a close-up meal photo
+PLATE_IMAGE_SHARE = 0.5
+
+MIN_PORTION, MAX_PORTION = 0.25, 4.0
+PORTION_STEP = 0.25
+
+
+def estimate_portions(boxes: np.ndarray, class_names: Sequence[str], image_size: Tuple[int, int],
+                      plate_box: Optional[Sequence[float]] = None) -> np.ndarray:
+    """
+    Serving multiplier for every detection in one vectorized pass
+
+    The plate area is taken from plate_box when given, otherwise it is the
+    larger of PLATE_IMAGE_SHARE of the image and the union of all boxes (a
+    tray or buffet photo spreads over more than one plate).
+
+    Args:
+        boxes: (n, 4) array of x1, y1, x2, y2 in pixels
+        class_names: Class name of each box
+        image_size: (width, height) of the image
+        plate_box: Optional x1, y1, x2, y2 of the plate
+
+    Returns:
+        (n,) float array of multipliers, rounded to PORTION_STEP
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    if len(boxes) == 0:
+        return np.zeros(0)
+    widths = np.clip(boxes[:, 2] - boxes[:, 0], 0, None)
+    heights = np.clip(boxes[:, 3] - boxes[:, 1], 0, None)
+    areas = widths * heights
+
+    if plate_box is not None:
+        plate_area = max(1.0, (plate_box[2] - plate_box[0]) * (plate_box[3] - plate_box[1]))
+    else:
+        union = (boxes[:, 2].max() - boxes[:, 0].min()) * (boxes[:, 3].max() - boxes[:, 1].min())
+        plate_area = max(image_size[0] * image_size[1] * PLATE_IMAGE_SHARE, union, 1.0)
+
+    reference = np.array([REFERENCE_PLATE_SHARE.get(name.lower().strip(), DEFAULT_PLATE_SHARE)
+                          for name in class_names])
+    portions = areas / plate_area / reference
+    portions = np.clip(np.round(portions / PORTION_STEP) * PORTION_STEP, MIN_PORTION, MAX_PORTION)
+    return portions
+
+
+def parse_quantity(quantity) -> Optional[float]:
+    """
+    Parse quantities like '2', '1/2', '1 1/2' or '0.75'; None if not numeric
+    """
+    try:
+        return float(sum(Fraction(part) for part in str(quantity).split()))
+    except (ValueError, ZeroDivisionError):
+        return None
+
+
+def format_quantity(value: float) -> str:
+    """
+    Format a quantity with kitchen fractions (quarters/thirds), e.g. 1.5 -> '1 1/2'
+    """
+    fraction = Fraction(value).limit_denominator(4)
+    if fraction == 0 and value > 0:
+        fraction = Fraction(1, 4)
+    whole, rest = divmod(fraction.numerator, fraction.denominator)
+    if rest == 0:
+        return str(whole)
+    part = f"{rest}/{fraction.denominator}"
+    return f"{whole} {part}" if whole else part
+
+
+def scale_ingredients(ingredients: List[Dict], portion: float) -> List[Dict]:
+    """
+    Copy of an ingredients list with quantities scaled by portion
+
+    Missing and non-numeric quantities ('to taste') are left unchanged. The
+    original quantity is kept as base_quantity so edits can be related back to it.
+    """
+    scaled = []
+    for ingredient in ingredients:
+        if ingredient.get('quantity') is None:
+            scaled.append(dict(ingredient))
+            continue
+        item = dict(ingredient, base_quantity=ingredient['quantity'])
+        value = parse_quantity(ingredient['quantity'])
+        if value is not None and portion != 1:
+            item['quantity'] = format_quantity(value * portion)
+        scaled.append(item)
+    return scaled
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Sampling Profiler for Food Detection App
+Opt-in live request profiling with flamegraph-ready (collapsed stack) output
+"""
+
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+
+class SamplingProfiler:
+    def __init__(self, thread_id: int, interval: float = 0.005):
+        """
+        Sample the stack of one thread from a background thread
+
+        Args:
+            thread_id: Ident of the thread to sample (threading.get_ident())
+            interval: Seconds between samples
+        """
+        self.thread_id = thread_id
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+        self.started_at = None
+        self.duration = 0.0
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> Counter:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.perf_counter() - self.started_at
+        return self.samples
+
+    def _run(self):
+        while not self._stop.is_set():
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            # Root first, as expected by flamegraph.pl / speedscope
+            self.samples[";".join(reversed(stack))] += 1
+            self._stop.wait(self.interval)
+
+    def collapsed(self) -> str:
+        """
+        Return samples in Brendan Gregg's collapsed stack format
+        """
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+class ProfilingControl:
+    def __init__(self, output_dir: str = "profiles", allow_request_flag: bool = False,
+                 interval: float = 0.005):
+        """
+        Decide which requests get profiled and store their output
+
+        Args:
+            output_dir: Directory for collapsed stack files
+            allow_request_flag: Honour the per-request X-Profile header / ?profile=1 flag
+            interval: Sampling interval in seconds
+        """
+        self.output_dir = output_dir
+        self.allow_request_flag = allow_request_flag
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._remaining_requests = 0
+        self._window_end = 0.0
+
+    @property
+    def armed(self) -> bool:
+        return self._remaining_requests > 0 or time.monotonic() < self._window_end
+
+    def arm(self, requests: int = 0, seconds: float = 0.0):
+        """
+        Profile the next N requests and/or every request in the next T seconds
+        """
+        with self._lock:
+            self._remaining_requests = max(0, int(requests))
+            self._window_end = time.monotonic() + seconds if seconds > 0 else 0.0
+
+    def disarm(self):
+        self.arm(0, 0.0)
+
+    def status(self) -> Dict:
+        return {
+            'armed': self.armed,
+            'remaining_requests': self._remaining_requests,
+            'window_seconds_left': max(0.0, round(self._window_end - time.monotonic(), 1)),
+            'request_flag_allowed': self.allow_request_flag
+        }
+
+    def should_profile(self, flagged: bool) -> bool:
+        """
+        Claim a profiling slot for the current request
+
+        Args:
+            flagged: Whether the request asked to be profiled
+        """
+        if flagged and self.allow_request_flag:
+            return True
+        # Fast path when nothing is armed
+        if not self._remaining_requests and not self._window_end:
+            return False
+        with self._lock:
+            if self._remaining_requests > 0:
+                self._remaining_requests -= 1
+                return True
+            if time.monotonic() < self._window_end:
+                return True
+            self._window_end = 0.0
+            return False
+
+    def start(self) -> SamplingProfiler:
+        profiler = SamplingProfiler(threading.get_ident(), self.interval)
+        profiler.start()
+        return profiler
+
+    def save(self, profiler: SamplingProfiler, route: str, request_id: str) -> str:
+        """
+        Stop the profiler and store its collapsed stacks
+
+        Returns:
+            Profile id (file name without extension)
+        """
+        profiler.stop()
+        os.makedirs(self.output_dir, exist_ok=True)
+        route_tag = re.sub(r'[^A-Za-z0-9]+', '_', route).strip('_') or 'root'
+        profile_id = f"{route_tag}-{request_id}"
+        with open(self._path(profile_id), 'w', encoding='utf-8') as f:
+            f.write(profiler.collapsed())
+        return profile_id
+
+    def list_profiles(self) -> List[Dict]:
+        if not os.path.isdir(self.output_dir):
+            return []
+        profiles = []
+        for name in sorted(os.listdir(self.output_dir)):
+            if name.endswith('.folded'):
+                path = os.path.join(self.output_dir, name)
+                profiles.append({'id': name[:-len('.folded')], 'bytes': os.path.getsize(path),
+                                 'created': os.path.getmtime(path)})
+        return profiles
+
+    def load(self, profile_id: str) -> Optional[str]:
+        if not re.fullmatch(r'[A-Za-z0-9_-]+', profile_id):
+            return None
+        path = self._path(profile_id)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return f.read()
+
+    def _path(self, profile_id: str) -> str:
+        return os.path.join(self.output_dir, f"{profile_id}.folded")
@@ -4,11 +4,12 @@ Recipe Manager for Food Detection App
 Handles recipe database and provides recipes for detected foods
 """
 
-import pandas as pd
 import json
 import os
 from typing import Dict, List, Optional
 
+from http_utils import content_version
+
 class RecipeManager:
     def __init__(self, excel_file: str = None):
         """
@@ -19,6 +20,7 @@ class RecipeManager:
         """
         self.recipes = {}
         self.excel_file = excel_file
+        self._version = (None, '')
         
         if excel_file and os.path.exists(excel_file):
             self.load_from_excel(excel_file)
@@ -40,30 +42,7 @@ class RecipeManager:
         """
         try:
             print(f"📖 Loading recipes from: {excel_file}")
-            
-            # Read Excel file
-            df = pd.read_excel(excel_file)
-            
-            # Process each row
-            for index, row in df.iterrows():
-                food_name = str(row.iloc[0]).strip().lower()  # Food name
-                recipe_title = str(row.iloc[1]).strip() if pd.notna(row.iloc[1]) else f"{food_name.title()} Recipe"
-                ingredients = str(row.iloc[2]).strip() if pd.notna(row.iloc[2]) else "Ingredients not specified"
-                instructions = str(row.iloc[3]).strip() if pd.notna(row.iloc[3]) else "Instructions not provided"
-                cooking_time = str(row.iloc[4]).strip() if pd.notna(row.iloc[4]) else "Not specified"
-                difficulty = str(row.iloc[5]).strip() if pd.notna(row.iloc[5]) else "Medium"
-                servings = str(row.iloc[6]).strip() if pd.notna(row.iloc[6]) else "4"
-                
-                # Store recipe
-                self.recipes[food_name] = {
-                    'title': recipe_title,
-                    'ingredients': ingredients,
-                    'instructions': instructions,
-                    'cooking_time': cooking_time,
-                    'difficulty': difficulty,
-                    'servings': servings
-                }
-            
+            self.recipes = self.parse_excel(excel_file)
             print(f"✅ Loaded {len(self.recipes)} recipes from Excel")
             
         except Exception as e:
@@ -71,6 +50,40 @@ class RecipeManager:
             print("📝 Using default recipes instead")
             self.load_default_recipes()
     
+    @staticmethod
+    def parse_excel(excel_file: str) -> Dict[str, Dict]:
+        """
+        Read recipes from an Excel file without touching the live recipes
+        """
+        # pandas is only needed for Excel import; keep it off the serving import path
+        import pandas as pd
+        
+        # Read Excel file
+        df = pd.read_excel(excel_file)
+        recipes = {}
+        
+        # Process each row
+        for index, row in df.iterrows():
+            food_name = str(row.iloc[0]).strip().lower()  # Food name
+            recipe_title = str(row.iloc[1]).strip() if pd.notna(row.iloc[1]) else f"{food_name.title()} Recipe"
+            ingredients = str(row.iloc[2]).strip() if pd.notna(row.iloc[2]) else "Ingredients not specified"
+            instructions = str(row.iloc[3]).strip() if pd.notna(row.iloc[3]) else "Instructions not provided"
+            cooking_time = str(row.iloc[4]).strip() if pd.notna(row.iloc[4]) else "Not specified"
+            difficulty = str(row.iloc[5]).strip() if pd.notna(row.iloc[5]) else "Medium"
+            servings = str(row.iloc[6]).strip() if pd.notna(row.iloc[6]) else "4"
+            
+            # Store recipe
+            recipes[food_name] = {
+                'title': recipe_title,
+                'ingredients': ingredients,
+                'instructions': instructions,
+                'cooking_time': cooking_time,
+                'difficulty': difficulty,
+                'servings': servings
+            }
+        
+        return recipes
+    
     def load_default_recipes(self):
         """
         Load default recipes for common foods
@@ -119,6 +132,48 @@ class RecipeManager:
         }
         print("📝 Loaded default recipes")
     
+    @property
+    def version(self) -> str:
+        """
+        Content hash of the recipes, used for ETags (recomputed only when the recipes are replaced)
+        """
+        recipes, version = self._version
+        if recipes is not self.recipes:
+            recipes = self.recipes
+            version = content_version(recipes)
+            self._version = (recipes, version)
+        return version
+    
+    @staticmethod
+    def parse_json(filename: str) -> Dict[str, Dict]:
+        """
+        Read and validate a recipes JSON file without touching the live recipes
+        
+        Raises:
+            ValueError: If the file is not a {food: recipe} mapping
+        """
+        with open(filename, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if not isinstance(data, dict) or not all(isinstance(recipe, dict) and 'title' in recipe
+                                                 for recipe in data.values()):
+            raise ValueError(f"{filename} is not a {{food: recipe}} mapping")
+        return {food.lower().strip(): recipe for food, recipe in data.items()}
+    
+    def reload(self, recipes: Dict[str, Dict]) -> Dict[str, List[str]]:
+        """
+        Publish freshly parsed recipes with a single reference swap
+        
+        Returns:
+            Diff with added, removed and changed food names
+        """
+        old = self.recipes
+        self.recipes = recipes
+        return {
+            'added': [food for food in recipes if food not in old],
+            'removed': [food for food in old if food not in recipes],
+            'changed': [food for food in recipes if food in old and recipes[food] != old[food]],
+        }
+    
     def get_recipe(self, food_name: str) -> Optional[Dict]:
         """
         Get recipe for a specific food
@@ -130,13 +185,15 @@ class RecipeManager:
             Recipe dictionary or None if not found
         """
         food_key = food_name.lower().strip()
+        # One snapshot for the whole lookup; reloads swap self.recipes wholesale
+        recipes = self.recipes
         
         # Try exact match first
-        if food_key in self.recipes:
-            return self.recipes[food_key]
+        if food_key in recipes:
+            return recipes[food_key]
         
         # Try partial matches
-        for key, recipe in self.recipes.items():
+        for key, recipe in recipes.items():
             if food_key in key or key in food_key:
                 return recipe
         
@@ -153,8 +210,8 @@ class RecipeManager:
         
         for food, variation in variations.items():
             if food_key == food or food_key == variation:
-                if variation in self.recipes:
-                    return self.recipes[variation]
+                if variation in recipes:
+                    return recipes[variation]
         
         return None
     
@@ -166,7 +223,7 @@ class RecipeManager:
             food_name: Name of the food
             recipe: Recipe dictionary
         """
-        self.recipes[food_name.lower().strip()] = recipe
+        self.recipes = {**self.recipes, food_name.lower().strip(): recipe}
         print(f"✅ Added recipe for: {food_name}")
     
     def save_to_json(self, filename: str = "recipes.json"):
@@ -186,8 +243,7 @@ class RecipeManager:
         """
         try:
             if os.path.exists(filename):
-                with open(filename, 'r', encoding='utf-8') as f:
-                    self.recipes = json.load(f)
+                self.recipes = self.parse_json(filename)
                 print(f"📖 Loaded recipes from: {filename}")
         except Exception as e:
             print(f"❌ Error loading recipes: {e}")
@@ -0,0 +1,330 @@
+#!/usr/bin/env python3
+"""
+Cache-Affinity Router for Food Detection Nodes
+Consistent-hashes uploads by content to app.py instances, health-checks them and rebalances on membership changes
+"""
+
+import argparse
+import bisect
+import hashlib
+import logging
+import os
+import sys
+import threading
+import urllib.error
+import urllib.request
+from typing import Dict, Iterator, List, Optional
+
+from flask import Flask, Response, jsonify, request
+
+from metrics import MetricsRegistry, CONTENT_TYPE as METRICS_CONTENT_TYPE
+
+logger = logging.getLogger('nutrispike.router')
+
+SESSION_COOKIE = 'nutrispike_session'
+# Hop-by-hop headers (RFC 7230) and ones urllib/Flask recompute
+SKIP_HEADERS = {'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization', 'te', 'trailer',
+                'transfer-encoding', 'upgrade', 'host', 'content-length'}
+
+
+def _hash(value: str) -> int:
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+class HashRing:
+    """
+    Consistent hash ring with virtual nodes
+
+    Adding or removing a node only moves the keys in that node's arcs, about
+    1/N of them, so the other nodes keep their caches warm.
+
+    Args:
+        nodes: Initial node URLs
+        replicas: Virtual nodes per node; more gives a more even split
+    """
+
+    def __init__(self, nodes=(), replicas: int = 128):
+        self.replicas = replicas
+        self._keys: List[int] = []
+        self._owners: List[str] = []
+        self._nodes = set()
+        for node in nodes:
+            self.add(node)
+
+    @property
+    def nodes(self) -> List[str]:
+        return sorted(self._nodes)
+
+    def add(self, node: str):
+        if node in self._nodes:
+            return
+        self._nodes.add(node)
+        for i in range(self.replicas):
+            point = _hash(f"{node}#{i}")
+            index = bisect.bisect(self._keys, point)
+            self._keys.insert(index, point)
+            self._owners.insert(index, node)
+
+    def remove(self, node: str):
+        if node not in self._nodes:
+            return
+        self._nodes.discard(node)
+        kept = [(key, owner) for key, owner in zip(self._keys, self._owners) if owner != node]
+        self._keys = [key for key, _ in kept]
+        self._owners = [owner for _, owner in kept]
+
+    def preference(self, key: str) -> Iterator[str]:
+        """
+        Distinct nodes clockwise from the key's position: the owner first, then fallbacks
+        """
+        if not self._keys:
+            return
+        start = bisect.bisect(self._keys, _hash(key))
+        seen = set()
+        for i in range(len(self._keys)):
+            owner = self._owners[(start + i) % len(self._keys)]
+            if owner not in seen:
+                seen.add(owner)
+                yield owner
+                if len(seen) == len(self._nodes):
+                    return
+
+    def shares(self) -> Dict[str, float]:
+        """
+        Fraction of the hash space each node owns
+        """
+        shares = {node: 0.0 for node in self._nodes}
+        for i, owner in enumerate(self._owners):
+            previous = self._keys[i - 1] if i else self._keys[-1] - 2 ** 64
+            shares[owner] += (self._keys[i] - previous) / 2 ** 64
+        return {node: round(share, 4) for node, share in shares.items()}
+
+
+class NodePool:
+    """
+    Cluster membership plus health; only healthy members are on the ring
+
+    A node leaves the ring after `fail_threshold` failed /health checks (or
+    at once when a proxied request cannot connect) and rejoins after one
+    successful check.
+
+    Args:
+        nodes: Base URLs of app.py instances, e.g. http://127.0.0.1:5001
+        interval: Seconds between health checks
+        timeout: Health check timeout in seconds
+        fail_threshold: Consecutive failures before a node is taken off the ring
+        replicas: Virtual nodes per node
+    """
+
+    def __init__(self, nodes=(), interval: float = 2.0, timeout: float = 1.0, fail_threshold: int = 2,
+                 replicas: int = 128):
+        self.interval = interval
+        self.timeout = timeout
+        self.fail_threshold = fail_threshold
+        self.ring = HashRing(replicas=replicas)
+        self._members: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        for node in nodes:
+            self.add_node(node)
+
+    def add_node(self, node: str):
+        node = node.rstrip('/')
+        with self._lock:
+            self._members.setdefault(node, {'healthy': False, 'failures': 0, 'error': None})
+        self.check_node(node)
+
+    def remove_node(self, node: str) -> bool:
+        node = node.rstrip('/')
+        with self._lock:
+            if self._members.pop(node, None) is None:
+                return False
+            self.ring.remove(node)
+        logger.info("Removed %s; ring is now %s", node, self.ring.nodes)
+        return True
+
+    def _set_health(self, node: str, healthy: bool, error: Optional[str] = None):
+        with self._lock:
+            member = self._members.get(node)
+            if member is None:
+                return
+            member['error'] = error
+            if healthy:
+                member['failures'] = 0
+                if not member['healthy']:
+                    member['healthy'] = True
+                    self.ring.add(node)
+                    logger.info("%s is healthy; ring is now %s", node, self.ring.nodes)
+                return
+            member['failures'] += 1
+            if member['healthy'] and member['failures'] >= self.fail_threshold:
+                member['healthy'] = False
+                self.ring.remove(node)
+                logger.warning("%s is unhealthy (%s); ring is now %s", node, error, self.ring.nodes)
+
+    def check_node(self, node: str) -> bool:
+        try:
+            with urllib.request.urlopen(f"{node}/health", timeout=self.timeout) as response:
+                healthy = response.status == 200
+            self._set_health(node, healthy, None if healthy else f"HTTP {response.status}")
+        except Exception as e:
+            healthy = False
+            self._set_health(node, False, str(e))
+        return healthy
+
+    def mark_failed(self, node: str, error: str):
+        """
+        Take a node off the ring right away (a proxied request could not reach it)
+        """
+        with self._lock:
+            if node in self._members:
+                self._members[node]['failures'] = self.fail_threshold - 1
+        self._set_health(node, False, error)
+
+    def check(self):
+        for node in list(self._members):
+            self.check_node(node)
+
+    def candidates(self, key: str) -> List[str]:
+        with self._lock:
+            return list(self.ring.preference(key))
+
+    def status(self) -> Dict:
+        with self._lock:
+            shares = self.ring.shares()
+            return {node: dict(member, share=shares.get(node, 0.0)) for node, member in self._members.items()}
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def start(self):
+        if self._thread is None and self.interval > 0:
+            self._thread = threading.Thread(target=self._run, name='health-checker', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+def routing_key() -> str:
+    """
+    Hash key for the current request
+
+    Uploads to /detect go by image content so repeated images hit the same
+    node's caches, whatever session sent them; everything else goes by
+    session (or client address). /detect applies the session's quantity
+    edits, so the nodes must share them through EDITS_DB.
+    """
+    if request.path == '/detect' and 'image' in request.files:
+        return hashlib.sha1(request.files['image'].read()).hexdigest()
+    session_id = request.headers.get('X-Session-Id') or request.cookies.get(SESSION_COOKIE)
+    return session_id or request.headers.get('X-Forwarded-For', request.remote_addr or '')
+
+
+def create_app(pool: NodePool, timeout: float = 60.0, admin_token: Optional[str] = None) -> Flask:
+    """
+    Flask app that forwards every request to a node picked by routing_key()
+    """
+    app = Flask(__name__)
+    metrics = MetricsRegistry()
+    routed_total = metrics.counter('nutrispike_router_requests_total', 'Requests forwarded, by node and outcome',
+                                   ('node', 'outcome'))
+    healthy_nodes = metrics.gauge('nutrispike_router_healthy_nodes', 'Nodes currently on the hash ring')
+    healthy_nodes.set_function(lambda: len(pool.ring.nodes))
+
+    def is_admin():
+        if admin_token:
+            return request.headers.get('X-Admin-Token') == admin_token
+        return request.remote_addr in ('127.0.0.1', '::1')
+
+    @app.route('/router/status')
+    def router_status():
+        return jsonify({'nodes': pool.status(), 'ring': pool.ring.nodes})
+
+    @app.route('/router/metrics')
+    def router_metrics():
+        return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
+    @app.route('/router/nodes', methods=['POST', 'DELETE'])
+    def router_nodes():
+        if not is_admin():
+            return jsonify({'error': 'Forbidden'}), 403
+        data = request.get_json(silent=True) or {}
+        node = data.get('url') or request.args.get('url')
+        if not node:
+            return jsonify({'error': 'url is required'}), 400
+        if request.method == 'POST':
+            pool.add_node(node)
+            return jsonify({'nodes': pool.status(), 'ring': pool.ring.nodes})
+        if not pool.remove_node(node):
+            return jsonify({'error': f'Unknown node: {node}'}), 404
+        return jsonify({'nodes': pool.status(), 'ring': pool.ring.nodes})
+
+    @app.route('/', defaults={'path': ''}, methods=['GET', 'POST', 'PUT', 'DELETE'])
+    @app.route('/<path:path>', methods=['GET', 'POST', 'PUT', 'DELETE'])
+    def forward(path):
+        # Cache the raw body first so reading the upload for its hash leaves it intact
+        body = request.get_data(cache=True)
+        key = routing_key()
+        headers = {name: value for name, value in request.headers.items() if name.lower() not in SKIP_HEADERS}
+        headers['X-Forwarded-For'] = ', '.join(filter(None, (request.headers.get('X-Forwarded-For'),
+                                                            request.remote_addr)))
+        url_path = request.full_path if request.query_string else request.path
+
+        for node in pool.candidates(key):
+            upstream = urllib.request.Request(node + url_path, data=body if body else None, headers=headers,
+                                              method=request.method)
+            try:
+                response = urllib.request.urlopen(upstream, timeout=timeout)
+            except urllib.error.HTTPError as e:
+                # The node answered; pass its error (429, 404, ...) through unchanged
+                response = e
+            except (urllib.error.URLError, OSError) as e:
+                routed_total.inc(node=node, outcome='unreachable')
+                pool.mark_failed(node, str(e))
+                continue
+            with response:
+                content = response.read()
+                status = response.status if hasattr(response, 'status') else response.code
+                out_headers = [(name, value) for name, value in response.headers.items()
+                               if name.lower() not in SKIP_HEADERS]
+            routed_total.inc(node=node, outcome='forwarded')
+            out_headers.append(('X-Served-By', node))
+            return Response(content, status=status, headers=out_headers)
+
+        return jsonify({'error': 'No healthy inference nodes'}), 503
+
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Route requests to food detection nodes by image content")
+    parser.add_argument("nodes", nargs="*", help="Node base URLs (default: ROUTER_NODES, comma-separated)")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.environ.get('PORT', 8000)))
+    parser.add_argument("--interval", type=float, default=2.0, help="Seconds between health checks")
+    parser.add_argument("--replicas", type=int, default=128, help="Virtual nodes per node")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Upstream request timeout in seconds")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper(),
+                        format='%(asctime)s %(levelname)s %(name)s: %(message)s')
+    nodes = args.nodes or [n for n in os.environ.get('ROUTER_NODES', '').split(',') if n]
+    if not nodes:
+        parser.error("give at least one node URL")
+
+    pool = NodePool(nodes, interval=args.interval, replicas=args.replicas)
+    pool.start()
+    print(f"🔀 Routing to {len(nodes)} nodes ({len(pool.ring.nodes)} healthy) on port {args.port}")
+    app = create_app(pool, timeout=args.timeout, admin_token=os.environ.get('ADMIN_TOKEN'))
+    app.run(host=args.host, port=args.port, threaded=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Response Serializers for Food Detection App
+Fast JSON (orjson when installed) and MessagePack content negotiation
+"""
+
+import base64
+from typing import Dict, List, Optional
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JSON_TYPE = 'application/json'
+MSGPACK_TYPES = ('application/msgpack', 'application/x-msgpack')
+
+# Column order of packed detections in binary responses
+DETECTION_COLUMNS = ('class', 'confidence', 'x1', 'y1', 'x2', 'y2', 'portion', 'calories')
+
+if orjson is not None:
+    ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider that uses orjson when available (falls back to the stdlib encoder)
+    """
+
+    def dumps(self, obj, **kwargs) -> str:
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        try:
+            return orjson.dumps(obj, option=ORJSON_OPTIONS).decode('utf-8')
+        except TypeError:
+            return super().dumps(obj)
+
+    def response(self, *args, **kwargs):
+        if orjson is None:
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        try:
+            body = orjson.dumps(obj, option=ORJSON_OPTIONS)
+        except TypeError:
+            return super().response(*args, **kwargs)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def negotiate(accept_mimetypes) -> str:
+    """
+    Response media type for a request's Accept header: MessagePack if asked for and installed, else JSON
+    """
+    offers = [JSON_TYPE] + (list(MSGPACK_TYPES) if msgpack is not None else [])
+    return accept_mimetypes.best_match(offers, default=JSON_TYPE) or JSON_TYPE
+
+
+def pack_detections(detections: List[Dict]) -> Dict:
+    """
+    Detections as one row per box in DETECTION_COLUMNS order instead of one map per box
+    """
+    return {
+        'columns': list(DETECTION_COLUMNS),
+        'rows': [[d['class'], d['confidence'], *d['bbox'], d.get('portion'), d.get('calories')]
+                 for d in detections],
+    }
+
+
+def detection_body(payload: Dict, image_bytes: Optional[bytes], mimetype: str):
+    """
+    Encode a /detect payload for the negotiated media type
+
+    JSON keeps the historical layout (detection maps, base64 annotated image);
+    MessagePack packs detections into rows and sends the JPEG as raw bytes.
+
+    Returns:
+        bytes for MessagePack, or a dict for jsonify
+    """
+    if mimetype in MSGPACK_TYPES:
+        return msgpack.packb(dict(payload, detections=pack_detections(payload['detections']),
+                                  annotated_image=image_bytes), use_bin_type=True)
+    return dict(payload, annotated_image=base64.b64encode(image_bytes).decode() if image_bytes else None)
@@ -0,0 +1,421 @@
+const uploadArea = document.getElementById('uploadArea');
+const imageInput = document.getElementById('imageInput');
+const loading = document.getElementById('loading');
+const resultsSection = document.getElementById('resultsSection');
+const error = document.getElementById('error');
+
+// Detections of the current image, with server-estimated portions
+let currentDetections = [];
+// Ingredients of the current image, one block per detection (its index) with the portion they were scaled by
+let currentIngredients = [];
+
+// Drag and drop functionality
+uploadArea.addEventListener('dragover', (e) => {
+    e.preventDefault();
+    uploadArea.classList.add('dragover');
+});
+
+uploadArea.addEventListener('dragleave', () => {
+    uploadArea.classList.remove('dragover');
+});
+
+uploadArea.addEventListener('drop', (e) => {
+    e.preventDefault();
+    uploadArea.classList.remove('dragover');
+    const files = e.dataTransfer.files;
+    if (files.length > 0) {
+        handleFile(files[0]);
+    }
+});
+
+function handleFileSelect(event) {
+    const file = event.target.files[0];
+    if (file) {
+        handleFile(file);
+    }
+}
+
+function handleFile(file) {
+    if (!file.type.startsWith('image/')) {
+        showError('Please select a valid image file.');
+        return;
+    }
+
+    // Show preview
+    const reader = new FileReader();
+    reader.onload = (e) => {
+        document.getElementById('originalImage').src = e.target.result;
+    };
+    reader.readAsDataURL(file);
+
+    // Upload and detect
+    uploadAndDetect(file);
+}
+
+// Upload hints from the server; fetched once, uploads go out unresized if this fails
+const uploadConfig = fetch('/config')
+    .then(response => response.ok ? response.json() : {})
+    .catch(() => ({}));
+
+// Downscale to the server's max_input_dim and re-encode as JPEG; resolves null to send the original
+function resizeForUpload(file) {
+    return uploadConfig.then(config => new Promise(resolve => {
+        const maxDim = config.max_input_dim;
+        if (!maxDim) {
+            resolve(null);
+            return;
+        }
+        const url = URL.createObjectURL(file);
+        const img = new Image();
+        img.onload = () => {
+            URL.revokeObjectURL(url);
+            const width = img.naturalWidth;
+            const height = img.naturalHeight;
+            const scale = maxDim / Math.max(width, height);
+            if (scale >= 1) {
+                resolve(null);
+                return;
+            }
+            const canvas = document.createElement('canvas');
+            canvas.width = Math.round(width * scale);
+            canvas.height = Math.round(height * scale);
+            canvas.getContext('2d').drawImage(img, 0, 0, canvas.width, canvas.height);
+            canvas.toBlob(blob => resolve(blob ? { blob, width, height } : null),
+                          'image/jpeg', config.jpeg_quality || 0.9);
+        };
+        img.onerror = () => {
+            URL.revokeObjectURL(url);
+            resolve(null);
+        };
+        img.src = url;
+    }));
+}
+
+function uploadAndDetect(file) {
+    loading.style.display = 'block';
+    resultsSection.style.display = 'none';
+    error.style.display = 'none';
+
+    resizeForUpload(file)
+    .then(resized => {
+        const formData = new FormData();
+        if (resized) {
+            // The server maps boxes back to the original photo's size
+            formData.append('image', resized.blob, file.name);
+            formData.append('orig_width', resized.width);
+            formData.append('orig_height', resized.height);
+        } else {
+            formData.append('image', file);
+        }
+        return fetch('/detect', {
+            method: 'POST',
+            // A person is waiting: served ahead of batch clients
+            headers: {'X-Priority': 'interactive'},
+            body: formData
+        });
+    })
+    .then(response => response.json())
+    .then(data => {
+        loading.style.display = 'none';
+        
+        if (data.error) {
+            showError(data.error);
+            return;
+        }
+
+        displayResults(data, file);
+    })
+    .catch(err => {
+        loading.style.display = 'none';
+        showError('Error processing image: ' + err.message);
+    });
+}
+
+function displayResults(data, file) {
+    resultsSection.style.display = 'block';
+    currentDetections = data.detections;
+    
+    // Show annotated image (the server skips it when busy; fall back to the upload)
+    document.getElementById('annotatedImage').src = data.annotated_image
+        ? 'data:image/jpeg;base64,' + data.annotated_image
+        : URL.createObjectURL(file);
+    
+    // Show detections
+    const detectionsHtml = data.detections.map(detection => `
+        <div class="detection-item">
+            <span class="food-name">${detection.class}</span>
+            <span class="confidence">${Math.round(detection.confidence * 100)}%</span>
+        </div>
+    `).join('');
+    
+    document.getElementById('detections').innerHTML = detectionsHtml || '<p>No food items detected.</p>';
+    
+    // Show nutrition data
+    displayNutritionData(data.detections);
+    
+    // Show ingredients if available
+    if (data.ingredients && data.ingredients.length > 0) {
+        displayIngredients(data.ingredients);
+    } else {
+        document.getElementById('ingredientsSection').style.display = 'none';
+    }
+}
+
+function displayNutritionData(detections) {
+    const nutritionSection = document.getElementById('nutritionSection');
+    const nutritionContainer = document.getElementById('nutritionData');
+    
+    if (!detections || detections.length === 0) {
+        nutritionSection.style.display = 'none';
+        return;
+    }
+    
+    // Glycemic Index data for different foods
+    const giData = {
+        'apple': { gi: 36, category: 'Low GI' },
+        'banana': { gi: 51, category: 'Low GI' },
+        'rice': { gi: 73, category: 'High GI' },
+        'pizza': { gi: 60, category: 'Medium GI' },
+        'burger': { gi: 66, category: 'High GI' },
+        'fries': { gi: 75, category: 'High GI' },
+        'chapathi': { gi: 52, category: 'Low GI' },
+        'idli': { gi: 39, category: 'Low GI' },
+        'chicken gravy': { gi: 45, category: 'Low GI' },
+        'soda': { gi: 63, category: 'High GI' },
+        'tomato': { gi: 15, category: 'Low GI' },
+        'vada': { gi: 85, category: 'High GI' }
+    };
+    
+    // Calculate total nutrition with quantity adjustments
+    let totalCalories = 0;
+    let totalCarbs = 0;
+    let totalProtein = 0;
+    let totalFat = 0;
+    let avgGI = 0;
+    let giCount = 0;
+    
+    detections.forEach(detection => {
+        const food = detection.class.toLowerCase();
+        const nutrition = getNutritionData(food);
+        const gi = giData[food];
+        
+        // Portion estimated by the server from the box size, else from ingredient quantities
+        const quantityMultiplier = detection.portion !== undefined ? detection.portion : getQuantityMultiplier(food);
+        
+        totalCalories += nutrition.calories * quantityMultiplier;
+        totalCarbs += nutrition.carbs * quantityMultiplier;
+        totalProtein += nutrition.protein * quantityMultiplier;
+        totalFat += nutrition.fat * quantityMultiplier;
+        
+        if (gi) {
+            avgGI += gi.gi;
+            giCount++;
+        }
+    });
+    
+    avgGI = giCount > 0 ? Math.round(avgGI / giCount) : 0;
+    
+    const nutritionHtml = `
+        <div class="nutrition-grid">
+            <div class="nutrition-item">
+                <div class="nutrition-value">${totalCalories}</div>
+                <div class="nutrition-label">Calories</div>
+            </div>
+            <div class="nutrition-item">
+                <div class="nutrition-value">${totalCarbs}g</div>
+                <div class="nutrition-label">Carbs</div>
+            </div>
+            <div class="nutrition-item">
+                <div class="nutrition-value">${totalProtein}g</div>
+                <div class="nutrition-label">Protein</div>
+            </div>
+            <div class="nutrition-item">
+                <div class="nutrition-value">${totalFat}g</div>
+                <div class="nutrition-label">Fat</div>
+            </div>
+        </div>
+        ${avgGI > 0 ? `
+        <div class="glycemic-index">
+            <div>
+                <strong>Glycemic Index</strong>
+                <div class="gi-category">${getGICategory(avgGI)}</div>
+            </div>
+            <div class="gi-value">${avgGI}</div>
+        </div>
+        ` : ''}
+    `;
+    
+    nutritionContainer.innerHTML = nutritionHtml;
+    nutritionSection.style.display = 'block';
+}
+
+function getNutritionData(food) {
+    const nutrition = {
+        'apple': { calories: 52, carbs: 14, protein: 0.3, fat: 0.2 },
+        'banana': { calories: 89, carbs: 23, protein: 1.1, fat: 0.3 },
+        'rice': { calories: 130, carbs: 28, protein: 2.7, fat: 0.3 },
+        'pizza': { calories: 266, carbs: 33, protein: 11, fat: 10 },
+        'burger': { calories: 354, carbs: 33, protein: 17, fat: 17 },
+        'fries': { calories: 365, carbs: 63, protein: 4, fat: 11 },
+        'chapathi': { calories: 71, carbs: 15, protein: 2, fat: 0.4 },
+        'idli': { calories: 39, carbs: 8, protein: 1.5, fat: 0.1 },
+        'chicken gravy': { calories: 165, carbs: 8, protein: 25, fat: 4 },
+        'soda': { calories: 150, carbs: 39, protein: 0, fat: 0 },
+        'tomato': { calories: 18, carbs: 4, protein: 0.9, fat: 0.2 },
+        'vada': { calories: 140, carbs: 20, protein: 4, fat: 5 }
+    };
+    return nutrition[food] || { calories: 0, carbs: 0, protein: 0, fat: 0 };
+}
+
+function getGICategory(gi) {
+    if (gi <= 55) return 'Low GI';
+    if (gi <= 69) return 'Medium GI';
+    return 'High GI';
+}
+
+function parseQuantity(quantity) {
+    // Handles '2', '0.5', '1/2' and '1 1/2'
+    let total = 0;
+    for (const part of String(quantity).trim().split(/\s+/)) {
+        const [num, den] = part.split('/');
+        const value = den !== undefined ? parseFloat(num) / parseFloat(den) : parseFloat(num);
+        if (isNaN(value)) return NaN;
+        total += value;
+    }
+    return total;
+}
+
+function getQuantityMultiplier(food) {
+    // Look for ingredient quantities on the page for this food
+    const ingredientItems = document.querySelectorAll('.ingredient-item');
+    let totalMultiplier = 1;
+    
+    ingredientItems.forEach(item => {
+        const ingredientName = item.querySelector('.ingredient-name').textContent;
+        const quantity = item.querySelector('.ingredient-quantity').textContent;
+        
+        // Check if this ingredient belongs to the current food
+        const foodSection = item.closest('[id^="ingredients-"]');
+        if (foodSection) {
+            const foodTitle = foodSection.querySelector('h4').textContent.toLowerCase();
+            if (foodTitle.includes(food.toLowerCase())) {
+                // Parse quantity and apply multiplier
+                const quantityValue = parseFloat(quantity);
+                if (!isNaN(quantityValue)) {
+                    // Apply a proportional multiplier based on quantity
+                    // Assuming base quantity is 1, so multiplier = quantity
+                    totalMultiplier = Math.max(totalMultiplier, quantityValue);
+                }
+            }
+        }
+    });
+    
+    return totalMultiplier;
+}
+
+function displayIngredients(ingredientsList) {
+    const ingredientsSection = document.getElementById('ingredientsSection');
+    const ingredientsContainer = document.getElementById('ingredients');
+    
+    currentIngredients = ingredientsList;
+    const ingredientsHtml = ingredientsList.map((item, foodIndex) => {
+        const ingredients = item.ingredients;
+        return `
+            <div style="margin-bottom: 1.5rem;">
+                <h4 style="color: #2c3e50; margin-bottom: 1rem; font-size: 1.1rem;">${item.food} Ingredients</h4>
+                ${ingredients.map((ingredient, index) => `
+                    <div class="ingredient-item" id="ingredient-${foodIndex}-${index}">
+                        <span class="ingredient-quantity" id="quantity-${foodIndex}-${index}">${ingredient.quantity}</span>
+                        <span class="ingredient-unit">${ingredient.unit}</span>
+                        <span class="ingredient-name">${ingredient.name}</span>
+                        <button class="edit-btn" onclick="editQuantity(${foodIndex}, ${index}, '${item.food}', '${ingredient.name}')">
+                            ✏️ Edit
+                        </button>
+                        <div class="hidden" id="edit-${foodIndex}-${index}" style="display: none;">
+                            <input type="text" class="quantity-input" id="new-quantity-${foodIndex}-${index}" value="${ingredient.quantity}" placeholder="Qty">
+                            <button class="save-btn" onclick="saveQuantity(${foodIndex}, ${index}, '${item.food}', '${ingredient.name}')">Save</button>
+                            <button class="cancel-btn" onclick="cancelEditQuantity(${foodIndex}, ${index})">Cancel</button>
+                        </div>
+                    </div>
+                `).join('')}
+            </div>
+        `;
+    }).join('');
+    
+    ingredientsContainer.innerHTML = ingredientsHtml;
+    ingredientsSection.style.display = 'block';
+}
+
+function editQuantity(foodIndex, ingredientIndex, foodName, ingredientName) {
+    const editDiv = document.getElementById(`edit-${foodIndex}-${ingredientIndex}`);
+    const editBtn = event.target;
+    
+    editDiv.style.display = 'flex';
+    editBtn.style.display = 'none';
+}
+
+function saveQuantity(foodIndex, ingredientIndex, foodName, ingredientName) {
+    const newQuantity = document.getElementById(`new-quantity-${foodIndex}-${ingredientIndex}`).value;
+    const oldQuantity = document.getElementById(`quantity-${foodIndex}-${ingredientIndex}`).textContent;
+    
+    // Displayed quantities are scaled by the portion; the server stores the one-serving quantity
+    const portion = (currentIngredients[foodIndex] || {}).portion;
+    const value = parseQuantity(newQuantity);
+    const baseQuantity = portion > 0 && isFinite(value)
+        ? String(Math.round(value / portion * 1000) / 1000)
+        : newQuantity;
+    
+    fetch('/ingredients/quantity', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify({
+            food_name: foodName,
+            ingredient_name: ingredientName,
+            quantity: baseQuantity
+        })
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.error) {
+            alert('Error updating quantity: ' + data.error);
+        } else {
+            document.getElementById(`quantity-${foodIndex}-${ingredientIndex}`).textContent = newQuantity;
+            cancelEditQuantity(foodIndex, ingredientIndex);
+            
+            // The main (first) ingredient sets the portion size of this block's detection only
+            const ratio = parseQuantity(newQuantity) / parseQuantity(oldQuantity);
+            const detection = currentDetections[(currentIngredients[foodIndex] || {}).detection];
+            if (ingredientIndex === 0 && isFinite(ratio) && ratio > 0 && detection && detection.portion !== undefined) {
+                detection.portion *= ratio;
+            }
+            
+            // Recalculate nutrition data after quantity change
+            recalculateNutrition();
+        }
+    })
+    .catch(error => {
+        alert('Error updating quantity: ' + error.message);
+    });
+}
+
+function recalculateNutrition() {
+    // Recalculate and display nutrition data for the current detections
+    if (currentDetections.length > 0) {
+        displayNutritionData(currentDetections);
+    }
+}
+
+function cancelEditQuantity(foodIndex, ingredientIndex) {
+    const editDiv = document.getElementById(`edit-${foodIndex}-${ingredientIndex}`);
+    const editBtn = document.querySelector(`#ingredient-${foodIndex}-${ingredientIndex} .edit-btn`);
+    
+    editDiv.style.display = 'none';
+    editBtn.style.display = 'block';
+}
+
+function showError(message) {
+    error.textContent = message;
+    error.style.display = 'block';
+}
@@ -38,15 +38,23 @@ def test_food_detection(image_path, model_path="best.pt"):
             class_name = model.names[class_id]
             print(f"  - {class_name}: {confidence:.2f}")
 
-def batch_test_images(folder_path, model_path="best.pt"):
+def batch_test_images(folder_path, model_path="best.pt", dedupe_threshold=None, audit_file="dedupe_audit.jsonl"):
     """
     Test food detection on all images in a folder
     
     Args:
         folder_path (str): Path to folder containing images
         model_path (str): Path to the trained model
+        dedupe_threshold (int): Reuse the result of an earlier near-identical photo
+            (bursts, re-crops, recompressed copies) when their perceptual hashes differ
+            by at most this many bits; None runs the model on every image
+        audit_file (str): JSON lines log of which results were reused
     """
     model = YOLO(model_path)
+    index = None
+    if dedupe_threshold is not None:
+        from perceptual_hash import NearDuplicateIndex, image_hashes
+        index = NearDuplicateIndex(phash_threshold=dedupe_threshold, audit_file=audit_file)
     
     # Get all image files
     image_extensions = ('.jpg', '.jpeg', '.png', '.bmp', '.tiff')
@@ -59,14 +67,29 @@ def batch_test_images(folder_path, model_path="best.pt"):
         image_path = os.path.join(folder_path, image_file)
         print(f"\nProcessing: {image_file}")
         
-        results = model(image_path)
-        for r in results:
-            print(f"Detected {len(r.boxes)} food items in {image_file}")
-            for box in r.boxes:
-                class_id = int(box.cls[0])
-                confidence = float(box.conf[0])
-                class_name = model.names[class_id]
-                print(f"  - {class_name}: {confidence:.2f}")
+        detections = None
+        if index is not None:
+            hashes = image_hashes(image_path)
+            detections = index.lookup(image_file, hashes)
+            if detections is not None:
+                print(f"♻️  Near-duplicate of {index.audit[-1]['reused_from']}; reusing its result")
+        
+        if detections is None:
+            detections = []
+            results = model(image_path)
+            for r in results:
+                for box in r.boxes:
+                    class_id = int(box.cls[0])
+                    detections.append((model.names[class_id], float(box.conf[0])))
+            if index is not None:
+                index.add(image_file, hashes, detections)
+        
+        print(f"Detected {len(detections)} food items in {image_file}")
+        for class_name, confidence in detections:
+            print(f"  - {class_name}: {confidence:.2f}")
+    
+    if index is not None:
+        print(f"\n♻️  Reused {len(index.audit)} of {len(image_files)} results (audit trail: {audit_file})")
 
 if __name__ == "__main__":
     # Example usage:
@@ -77,5 +100,8 @@ if __name__ == "__main__":
     # Test on all images in a folder
     # batch_test_images("path/to/your/images/folder")
     
+    # Skip inference for near-duplicate photos (perceptual hash within 6 bits)
+    # batch_test_images("path/to/meal/log", dedupe_threshold=6)
+    
     # Test on your existing test dataset
     batch_test_images("dataset/images/test")
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Tiled (Sliced) Inference for Food Detection
+Detect small items in large buffet/tray photos by running overlapping tiles as one batch
+"""
+
+from typing import List, Optional, Sequence
+
+import numpy as np
+import torch
+from ultralytics.engine.results import Results
+
+
+def tile_windows(width: int, height: int, tile_size: int = 640, overlap: float = 0.2) -> np.ndarray:
+    """
+    Overlapping tile windows covering the whole image
+
+    The last tile in each row/column is shifted back to end at the image edge,
+    so every tile is full size (unless the image itself is smaller).
+
+    Returns:
+        int array of shape (n, 4) with x1, y1, x2, y2
+    """
+    if not 0 <= overlap < 1:
+        raise ValueError("overlap must be in [0, 1)")
+    stride = max(1, int(tile_size * (1 - overlap)))
+
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        positions = list(range(0, length - tile_size, stride))
+        positions.append(length - tile_size)
+        return positions
+
+    xs, ys = starts(width), starts(height)
+    windows = [(x, y, min(x + tile_size, width), min(y + tile_size, height)) for y in ys for x in xs]
+    return np.asarray(windows, dtype=np.int64)
+
+
+def intersection_over_smaller(a: torch.Tensor, b: torch.Tensor) -> torch.Tensor:
+    """
+    Pairwise intersection area divided by the smaller box's area, shape (len(a), len(b))
+    """
+    lt = torch.maximum(a[:, None, :2], b[None, :, :2])
+    rb = torch.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = (rb - lt).clamp(min=0).prod(2)
+    area_a = (a[:, 2:] - a[:, :2]).prod(1)
+    area_b = (b[:, 2:] - b[:, :2]).prod(1)
+    return inter / torch.minimum(area_a[:, None], area_b[None, :]).clamp(min=1e-9)
+
+
+def merge_detections(tile_results: Sequence[Results], offsets: np.ndarray, match_threshold: float = 0.5,
+                     max_det: int = 300) -> torch.Tensor:
+    """
+    Shift tile detections to full-image coordinates and merge them across tiles
+
+    Uses greedy non-maximum merging on intersection-over-smaller (as SAHI
+    does) rather than IoU NMS: a tile cuts an item at its seam into a partial
+    box that mostly lies inside the full box, so its IoU with the full box is
+    low but its intersection-over-smaller is near 1. Each group of same-class
+    boxes is replaced by their union with the highest confidence.
+
+    Args:
+        tile_results: One Results per tile
+        offsets: (n, 2) x/y offset of each tile
+        match_threshold: Intersection-over-smaller at which same-class boxes are merged
+
+    Returns:
+        Tensor of shape (k, 6): x1, y1, x2, y2, confidence, class
+    """
+    parts = []
+    for result, (dx, dy) in zip(tile_results, offsets):
+        data = result.boxes.data
+        if len(data):
+            data = data.clone()
+            data[:, [0, 2]] += float(dx)
+            data[:, [1, 3]] += float(dy)
+            parts.append(data[:, :6])
+    if not parts:
+        return torch.zeros((0, 6))
+    boxes = torch.cat(parts).float().cpu()
+    boxes = boxes[boxes[:, 4].argsort(descending=True)]
+    matches = (intersection_over_smaller(boxes[:, :4], boxes[:, :4]) >= match_threshold) \
+        & (boxes[:, 5, None] == boxes[None, :, 5])
+    merged = []
+    taken = torch.zeros(len(boxes), dtype=torch.bool)
+    for i in range(len(boxes)):
+        if taken[i]:
+            continue
+        group = matches[i] & ~taken
+        group[i] = True
+        taken |= group
+        members = boxes[group]
+        merged.append(torch.cat([members[:, :2].min(0).values, members[:, 2:4].max(0).values, boxes[i, 4:6]]))
+        if len(merged) == max_det:
+            break
+    return torch.stack(merged)
+
+
+def sliced_predict(model, image: np.ndarray, tile_size: int = 640, overlap: float = 0.2,
+                   include_full_image: bool = True, iou: float = 0.5, match_threshold: float = 0.5,
+                   **predict_kwargs) -> List[Results]:
+    """
+    Run the model on overlapping tiles (plus the downscaled full image) in one batch
+
+    Small images are predicted normally. The full-image pass keeps large items
+    that would be split across tiles.
+
+    Args:
+        model: Ultralytics YOLO model
+        image: BGR image
+        tile_size: Tile edge in pixels (also the inference imgsz)
+        overlap: Fractional overlap between neighbouring tiles
+        include_full_image: Add the whole image to the batch
+        iou: IoU threshold for NMS within each tile
+        match_threshold: Intersection-over-smaller for merging boxes across tiles
+        predict_kwargs: Extra arguments for the model call (conf, classes, ...)
+
+    Returns:
+        List with a single Results for the full image, like model(image)
+    """
+    height, width = image.shape[:2]
+    if width <= tile_size and height <= tile_size:
+        return model(image, iou=iou, verbose=False, **predict_kwargs)
+
+    windows = tile_windows(width, height, tile_size, overlap)
+    crops = [image[y1:y2, x1:x2] for x1, y1, x2, y2 in windows]
+    offsets = windows[:, :2]
+    if include_full_image:
+        crops.append(image)
+        offsets = np.vstack([offsets, [[0, 0]]])
+
+    max_det = predict_kwargs.pop('max_det', 300)
+    tile_results = model(crops, imgsz=tile_size, iou=iou, max_det=max_det, verbose=False, **predict_kwargs)
+    merged = merge_detections(tile_results, offsets, match_threshold, max_det)
+    return [Results(orig_img=image, path=tile_results[0].path, names=model.names, boxes=merged.cpu())]
+
+
+def parse_tiling_options(values, default_tile_size: int = 640, default_overlap: float = 0.2) -> Optional[dict]:
+    """
+    Read tiled-inference options from request form/query values
+
+    Returns:
+        dict(tile_size, overlap) when tiling was requested, else None
+
+    Raises:
+        ValueError: If the values are out of range
+    """
+    if str(values.get('tiled', '')).lower() not in ('1', 'true', 'yes'):
+        return None
+    tile_size = int(values.get('tile_size', default_tile_size))
+    overlap = float(values.get('tile_overlap', default_overlap))
+    if not 160 <= tile_size <= 2048 or tile_size % 32:
+        raise ValueError("tile_size must be a multiple of 32 between 160 and 2048")
+    if not 0 <= overlap <= 0.5:
+        raise ValueError("tile_overlap must be between 0 and 0.5")
+    return {'tile_size': tile_size, 'overlap': overlap}
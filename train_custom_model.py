@@ -2,118 +2,342 @@
 """
 Train Custom Food Detection Model
 Train your model with custom food classes
+
+Runs unattended with --yes; settings come from DEFAULT_TRAIN_ARGS, an
+optional YAML file (--config) and CLI overrides, in that order. An
+interrupted run resumes from its last.pt automatically.
 """
 
 from ultralytics import YOLO
+import argparse
+import csv
 import os
+import sys
 import time
+import yaml
+from custom_dataset_setup import BASE_CLASSES
+from dataset_index import validate_dataset, print_report
+from image_cache import build_image_cache, make_cached_trainer
+
+PROJECT = "custom_food_detection"
+RUN_NAME = "custom_foods"
+
+# Hyperparameters passed to YOLO.train unless overridden
+DEFAULT_TRAIN_ARGS = {
+    'epochs': 100,
+    'imgsz': 640,
+    'batch': 16,
+    'patience': 20,
+    'optimizer': 'AdamW',
+    'lr0': 0.01,
+    'weight_decay': 0.0005,
+    'warmup_epochs': 3,
+    'warmup_momentum': 0.8,
+    'warmup_bias_lr': 0.1,
+    'box': 7.5,
+    'cls': 0.5,
+    'dfl': 1.5,
+    'pose': 12.0,
+    'kobj': 2.0,
+    'label_smoothing': 0.0,
+    'nbs': 64,
+    'overlap_mask': True,
+    'mask_ratio': 4,
+    'drop_path': 0.0,
+}
+
+# Pipeline options handled here rather than by YOLO.train
+DEFAULT_PIPELINE = {
+    'model': 'best.pt',
+    'data': 'custom_food_config.yaml',
+    'name': RUN_NAME,
+    'preset': 'default',
+    'finetune_imgsz': None,   # train at a reduced imgsz, then fine-tune at this size
+    'finetune_epochs': 0,
+    'image_cache': True,
+    'resume': True,
+}
+
+PRESETS = ('default', 'cpu')
+
+# Rough peak training memory per image at imgsz=640 (activations + gradients + dataloader)
+MEMORY_PER_IMAGE_640 = 256 * 1024 ** 2
+
+def available_memory_bytes():
+    """
+    Memory available to new processes, or None if it cannot be determined
+    """
+    try:
+        with open('/proc/meminfo', 'r') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import psutil
+        return psutil.virtual_memory().available
+    except ImportError:
+        return None
+
+def auto_batch_size(imgsz, memory=None, budget=0.5, min_batch=2, max_batch=64):
+    """
+    Largest power-of-two batch that fits in a fraction of available RAM
+    
+    Args:
+        imgsz: Training image size
+        memory: Available bytes (default: detected)
+        budget: Fraction of available memory to use
+    """
+    memory = memory if memory is not None else available_memory_bytes()
+    if memory is None:
+        return DEFAULT_TRAIN_ARGS['batch']
+    per_image = MEMORY_PER_IMAGE_640 * (imgsz / 640) ** 2
+    fits = int(memory * budget / per_image)
+    batch = min_batch
+    while batch * 2 <= min(fits, max_batch):
+        batch *= 2
+    return batch
+
+def cpu_preset(imgsz):
+    """
+    CPU-friendly settings: batch sized to RAM and dataloader workers from cores
+    """
+    cores = os.cpu_count() or 1
+    return {
+        'device': 'cpu',
+        'batch': auto_batch_size(imgsz),
+        # Leave one core for the training loop itself
+        'workers': max(1, min(8, cores - 1)),
+    }
+
+def load_config(path):
+    """
+    Split a YAML config into (YOLO.train args, pipeline options)
+    """
+    with open(path, 'r') as f:
+        config = yaml.safe_load(f) or {}
+    pipeline = {k: config.pop(k) for k in list(config) if k in DEFAULT_PIPELINE}
+    return config, pipeline
+
+def resolve_settings(config_file=None, overrides=None):
+    """
+    Merge defaults, the config file and overrides, then apply the preset
+    
+    Returns:
+        (train_args, pipeline) dictionaries
+    """
+    train_args = dict(DEFAULT_TRAIN_ARGS)
+    pipeline = dict(DEFAULT_PIPELINE)
+    if config_file:
+        file_args, file_pipeline = load_config(config_file)
+        train_args.update(file_args)
+        pipeline.update(file_pipeline)
+    for key, value in (overrides or {}).items():
+        if value is None:
+            continue
+        (pipeline if key in DEFAULT_PIPELINE else train_args)[key] = value
+    
+    if pipeline['preset'] not in PRESETS:
+        raise ValueError(f"Unknown preset: {pipeline['preset']} (choose from {', '.join(PRESETS)})")
+    if pipeline['preset'] == 'cpu':
+        # Settings given explicitly win over the preset's guesses
+        explicit = set(load_config(config_file)[0]) if config_file else set()
+        explicit |= {key for key, value in (overrides or {}).items() if value is not None}
+        for key, value in cpu_preset(train_args['imgsz']).items():
+            if key not in explicit:
+                train_args[key] = value
+    return train_args, pipeline
+
+def _resumable_checkpoint(run_dir):
+    """
+    Path to last.pt if the run in run_dir was interrupted, else None
+    """
+    last = os.path.join(run_dir, "weights", "last.pt")
+    if not os.path.exists(last):
+        return None
+    try:
+        import torch
+        ckpt = torch.load(last, map_location='cpu', weights_only=False)
+    except Exception:
+        return None
+    # Ultralytics sets epoch to -1 once training has finished
+    return last if ckpt.get('epoch', -1) >= 0 else None
+
+def _add_epoch_timer(model, run_dir):
+    """
+    Print and record wall-clock time per epoch (training + validation)
+    """
+    state = {}
+
+    def on_epoch_start(trainer):
+        state['start'] = time.time()
+
+    def on_epoch_end(trainer):
+        elapsed = time.time() - state.get('start', time.time())
+        print(f"⏱️ Epoch {trainer.epoch + 1}/{trainer.epochs}: {elapsed:.1f}s")
+        log_file = os.path.join(run_dir, "epoch_times.csv")
+        new_file = not os.path.exists(log_file)
+        os.makedirs(run_dir, exist_ok=True)
+        with open(log_file, 'a', newline='') as f:
+            writer = csv.writer(f)
+            if new_file:
+                writer.writerow(['epoch', 'seconds', 'imgsz', 'batch'])
+            writer.writerow([trainer.epoch + 1, round(elapsed, 2), trainer.args.imgsz, trainer.args.batch])
+    
+    model.add_callback('on_train_epoch_start', on_epoch_start)
+    model.add_callback('on_fit_epoch_end', on_epoch_end)
+
+def run_training_phase(model_path, data, train_args, name, use_image_cache=True, resume=True, build_cache=True):
+    """
+    Train (or resume) one run and return the path to its best weights
+    
+    With build_cache=False an image cache built beforehand is only read, never refreshed.
+    """
+    run_dir = os.path.join(PROJECT, name)
+    checkpoint = _resumable_checkpoint(run_dir) if resume else None
+    
+    trainer = None
+    if use_image_cache:
+        if build_cache:
+            print("🗄️  Preparing pre-decoded image cache...")
+            build_image_cache(data, imgsz=train_args['imgsz'])
+        trainer = make_cached_trainer()
+    
+    if checkpoint:
+        print(f"♻️  Resuming interrupted run from: {checkpoint}")
+        model = YOLO(checkpoint)
+        _add_epoch_timer(model, run_dir)
+        model.train(resume=True, trainer=trainer)
+    else:
+        print(f"📦 Loading {model_path} as starting point...")
+        model = YOLO(model_path)
+        _add_epoch_timer(model, run_dir)
+        model.train(
+            data=data,
+            save=True,
+            project=PROJECT,
+            name=name,
+            exist_ok=True,
+            pretrained=True,  # Use existing weights as starting point
+            plots=True,
+            val=True,
+            # last.pt is written every epoch; periodic epochN.pt copies only cost disk
+            save_period=-1,
+            trainer=trainer,
+            **train_args
+        )
+    return os.path.join(run_dir, "weights", "best.pt")
 
-def train_custom_model():
+def _smoke_test(best_model):
+    """
+    Run the new model on one sample image
+    """
+    print(f"\n🧪 Testing the new model...")
+    test_model = YOLO(best_model)
+    
+    # Test on a sample image if available
+    test_images = []
+    for split in ['test', 'valid', 'train']:
+        test_dir = f"custom_food_dataset/images/{split}"
+        if os.path.exists(test_dir):
+            images = [f for f in os.listdir(test_dir) if f.endswith(('.jpg', '.jpeg', '.png'))]
+            if images:
+                test_images.append(os.path.join(test_dir, images[0]))
+                break
+    
+    if test_images:
+        print(f"📸 Testing on: {test_images[0]}")
+        results = test_model(test_images[0])
+        
+        print(f"🔍 Detection results:")
+        for r in results:
+            for box in r.boxes:
+                class_id = int(box.cls[0])
+                confidence = float(box.conf[0])
+                class_name = test_model.names[class_id]
+                print(f"  - {class_name}: {confidence:.2f}")
+        
+        # Save test result
+        results[0].save("custom_test_result.jpg")
+        print(f"💾 Test result saved as: custom_test_result.jpg")
+
+def train_custom_model(config_file=None, overrides=None):
     """
     Train the model with custom dataset
+    
+    With finetune_imgsz set, the model first trains at the (smaller) imgsz and
+    then fine-tunes for finetune_epochs at finetune_imgsz with a lower learning
+    rate. Each phase resumes independently if interrupted.
+    
+    Args:
+        config_file: Optional YAML with YOLO.train args and pipeline options
+        overrides: Dictionary of settings that win over the config file
+    
+    Returns:
+        Path to the best weights, or None if training failed
     """
     print("🚀 Starting Custom Food Detection Training")
     print("=" * 50)
     
+    train_args, pipeline = resolve_settings(config_file, overrides)
+    
     # Check if config file exists
-    config_file = "custom_food_config.yaml"
-    if not os.path.exists(config_file):
-        print(f"❌ Configuration file not found: {config_file}")
+    data = pipeline['data']
+    if not os.path.exists(data):
+        print(f"❌ Configuration file not found: {data}")
         print("Please run custom_dataset_setup.py first!")
-        return
-    
-    # Load the existing trained model as starting point
-    print("📦 Loading existing model as starting point...")
-    model = YOLO("best.pt")
+        return None
     
     print("🎯 Starting training with custom foods...")
-    print("⏱️ This may take 1-3 hours depending on your data size...")
+    print(f"⚙️  Preset: {pipeline['preset']}  imgsz: {train_args['imgsz']}  batch: {train_args['batch']}  "
+          f"workers: {train_args.get('workers', 'auto')}  epochs: {train_args['epochs']}")
     
     # Start training
     start_time = time.time()
     
     try:
-        results = model.train(
-            data=config_file,
-            epochs=100,
-            imgsz=640,
-            batch=16,
-            patience=20,
-            save=True,
-            project="custom_food_detection",
-            name="custom_foods",
-            exist_ok=True,
-            pretrained=True,  # Use existing weights as starting point
-            optimizer='AdamW',
-            lr0=0.01,
-            weight_decay=0.0005,
-            warmup_epochs=3,
-            warmup_momentum=0.8,
-            warmup_bias_lr=0.1,
-            box=7.5,
-            cls=0.5,
-            dfl=1.5,
-            pose=12.0,
-            kobj=2.0,
-            label_smoothing=0.0,
-            nbs=64,
-            overlap_mask=True,
-            mask_ratio=4,
-            drop_path=0.0,
-            plots=True,
-            val=True,
-            save_period=10
-        )
+        name = pipeline['name']
+        finetune_imgsz = pipeline['finetune_imgsz']
+        finetune_name = f"{name}_ft"
+        finetuning = bool(finetune_imgsz and pipeline['finetune_epochs'] and finetune_imgsz != train_args['imgsz'])
+        
+        # Skip the first phase if a later phase has already started
+        phase1_done = finetuning and os.path.exists(os.path.join(PROJECT, finetune_name, "weights", "last.pt")) \
+            and _resumable_checkpoint(os.path.join(PROJECT, name)) is None
+        best_model = os.path.join(PROJECT, name, "weights", "best.pt")
+        if not phase1_done:
+            best_model = run_training_phase(pipeline['model'], data, train_args, name,
+                                            pipeline['image_cache'], pipeline['resume'])
+        
+        if finetuning:
+            print(f"\n🔍 Fine-tuning at full resolution ({finetune_imgsz}px)...")
+            ft_args = dict(train_args, imgsz=finetune_imgsz, epochs=pipeline['finetune_epochs'],
+                           lr0=train_args['lr0'] * 0.1, warmup_epochs=0)
+            if pipeline['preset'] == 'cpu' and (overrides or {}).get('batch') is None:
+                ft_args['batch'] = auto_batch_size(finetune_imgsz)
+            best_model = run_training_phase(best_model, data, ft_args, finetune_name,
+                                            pipeline['image_cache'], pipeline['resume'])
         
         end_time = time.time()
         training_time = (end_time - start_time) / 60  # Convert to minutes
         
         print(f"\n✅ Training completed successfully!")
         print(f"⏱️ Training time: {training_time:.1f} minutes")
-        print(f"📁 Results saved in: custom_food_detection/custom_foods/")
+        print(f"📁 Results saved in: {os.path.dirname(os.path.dirname(best_model))}/")
         
         # Show best model path
-        best_model = "custom_food_detection/custom_foods/weights/best.pt"
         if os.path.exists(best_model):
             print(f"🏆 Best model saved as: {best_model}")
-            
-            # Test the new model
-            print(f"\n🧪 Testing the new model...")
-            test_model = YOLO(best_model)
-            
-            # Test on a sample image if available
-            test_images = []
-            for split in ['test', 'valid', 'train']:
-                test_dir = f"custom_food_dataset/images/{split}"
-                if os.path.exists(test_dir):
-                    images = [f for f in os.listdir(test_dir) if f.endswith(('.jpg', '.jpeg', '.png'))]
-                    if images:
-                        test_images.append(os.path.join(test_dir, images[0]))
-                        break
-            
-            if test_images:
-                print(f"📸 Testing on: {test_images[0]}")
-                results = test_model(test_images[0])
-                
-                print(f"🔍 Detection results:")
-                for r in results:
-                    for box in r.boxes:
-                        class_id = int(box.cls[0])
-                        confidence = float(box.conf[0])
-                        class_name = test_model.names[class_id]
-                        print(f"  - {class_name}: {confidence:.2f}")
-                
-                # Save test result
-                results[0].save("custom_test_result.jpg")
-                print(f"💾 Test result saved as: custom_test_result.jpg")
-        
-        return results
-        
+            _smoke_test(best_model)
+            return best_model
+        return None
+    
     except Exception as e:
         print(f"❌ Training failed: {str(e)}")
         return None
 
-def update_web_app():
+def update_web_app(new_model=f"{PROJECT}/{RUN_NAME}/weights/best.pt"):
     """
     Update the web app to use the new model
     """
@@ -125,7 +349,6 @@ def update_web_app():
         print("💾 Backed up original model as: best_backup.pt")
     
     # Copy new model
-    new_model = "custom_food_detection/custom_foods/weights/best.pt"
     if os.path.exists(new_model):
         import shutil
         shutil.copy2(new_model, "best.pt")
@@ -134,7 +357,55 @@ def update_web_app():
     else:
         print("❌ New model not found")
 
-def main():
+def _parse_value(text):
+    """
+    Parse a --set value with YAML rules (numbers, booleans, lists)
+    """
+    return yaml.safe_load(text)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Train the food detection model on the custom dataset")
+    parser.add_argument("--config", help="YAML file with YOLO.train args and pipeline options")
+    parser.add_argument("--model", help="Starting weights (default: best.pt)")
+    parser.add_argument("--data", help="Dataset YAML (default: custom_food_config.yaml)")
+    parser.add_argument("--name", help="Run name under custom_food_detection/")
+    parser.add_argument("--preset", choices=PRESETS, help="'cpu' sizes batch to RAM and workers to cores")
+    parser.add_argument("--epochs", type=int)
+    parser.add_argument("--batch", type=int)
+    parser.add_argument("--imgsz", type=int)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--device")
+    parser.add_argument("--finetune-imgsz", type=int, help="Fine-tune at this size after training at --imgsz")
+    parser.add_argument("--finetune-epochs", type=int)
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE",
+                        help="Any other YOLO.train argument, e.g. --set lr0=0.005")
+    parser.add_argument("--no-resume", action="store_true", help="Start fresh even if a run was interrupted")
+    parser.add_argument("--no-image-cache", action="store_true", help="Decode images every epoch")
+    parser.add_argument("--skip-validation", action="store_true", help="Skip the label check before training")
+    parser.add_argument("-y", "--yes", action="store_true", help="Don't prompt; start training immediately")
+    parser.add_argument("--update-app", action="store_true", help="Copy the new model to best.pt when done")
+    args = parser.parse_args(argv)
+    
+    overrides = {
+        'model': args.model, 'data': args.data, 'name': args.name, 'preset': args.preset,
+        'epochs': args.epochs, 'batch': args.batch, 'imgsz': args.imgsz, 'workers': args.workers,
+        'device': args.device, 'finetune_imgsz': args.finetune_imgsz, 'finetune_epochs': args.finetune_epochs,
+    }
+    if args.no_resume:
+        overrides['resume'] = False
+    if args.no_image_cache:
+        overrides['image_cache'] = False
+    for item in args.set:
+        key, sep, value = item.partition('=')
+        if not sep:
+            parser.error(f"--set expects KEY=VALUE, got: {item}")
+        overrides[key.strip()] = _parse_value(value)
+    return args, {k: v for k, v in overrides.items() if v is not None}
+
+def main(argv=None):
+    args, overrides = parse_args(argv)
+    interactive = not args.yes and sys.stdin.isatty()
+    
     print("🍽️ CUSTOM FOOD DETECTION TRAINING")
     print("=" * 50)
     
@@ -142,42 +413,60 @@ def main():
     if not os.path.exists("custom_food_dataset"):
         print("❌ Custom dataset not found!")
         print("Please run custom_dataset_setup.py first to prepare your data.")
-        return
-    
-    # Check if user has added their custom data
-    custom_images = []
-    for split in ['train', 'valid', 'test']:
-        custom_dir = f"custom_food_dataset/images/{split}"
-        if os.path.exists(custom_dir):
-            images = [f for f in os.listdir(custom_dir) if f.endswith(('.jpg', '.jpeg', '.png'))]
-            custom_images.extend(images)
-    
-    if len(custom_images) <= 704:  # Only existing dataset
-        print("⚠️  No custom food images detected!")
-        print("Please add your custom food images to:")
-        print("  - custom_food_dataset/images/train/")
-        print("  - custom_food_dataset/images/valid/")
-        print("  - custom_food_dataset/labels/train/")
-        print("  - custom_food_dataset/labels/valid/")
-        print("\nThen run this script again.")
-        return
-    
-    print(f"✅ Found {len(custom_images)} images in custom dataset")
+        return 1
+    
+    # Index and validate labels before committing to a multi-hour run
+    # Same precedence as training itself: overrides, then --config, then defaults
+    config_file = resolve_settings(args.config, overrides)[1]['data']
+    if not os.path.exists(config_file):
+        print(f"❌ Configuration file not found: {config_file}")
+        print("Please run custom_dataset_setup.py first!")
+        return 1
+    with open(config_file, 'r') as f:
+        config = yaml.safe_load(f)
+    
+    if not args.skip_validation:
+        print("🔍 Validating dataset labels...")
+        index, report = validate_dataset(config.get('path', "custom_food_dataset"), config['nc'], config.get('names'))
+        print_report(report)
+        if report['errors']:
+            print("\n❌ Fix the label problems above, then run this script again.")
+            return 1
+        
+        # Custom data means boxes for classes beyond the original model's classes
+        custom_boxes = int((index.labels['cls'] >= len(BASE_CLASSES)).sum())
+        if custom_boxes == 0:  # Only existing dataset
+            print("⚠️  No custom food images detected!")
+            print("Please add your custom food images to:")
+            print("  - custom_food_dataset/images/train/")
+            print("  - custom_food_dataset/images/valid/")
+            print("  - custom_food_dataset/labels/train/")
+            print("  - custom_food_dataset/labels/valid/")
+            print("\nThen run this script again.")
+            return 1
+        
+        total_images = sum(report['images'].values())
+        print(f"✅ Found {total_images} images ({custom_boxes} custom food boxes) in custom dataset")
     
     # Ask user if they want to start training
-    start_training = input("\n🚀 Start training now? (y/n): ").lower().strip()
-    if start_training != 'y':
-        print("📝 Ready to train when you are! Run this script again when ready.")
-        return
+    if interactive:
+        start_training = input("\n🚀 Start training now? (y/n): ").lower().strip()
+        if start_training != 'y':
+            print("📝 Ready to train when you are! Run this script again when ready.")
+            return 0
     
     # Start training
-    results = train_custom_model()
+    best_model = train_custom_model(args.config, overrides)
+    if not best_model:
+        return 1
     
-    if results:
-        # Ask if user wants to update web app
-        update_app = input("\n🌐 Update web app with new model? (y/n): ").lower().strip()
-        if update_app == 'y':
-            update_web_app()
+    # Ask if user wants to update web app
+    update_app = args.update_app
+    if not update_app and interactive:
+        update_app = input("\n🌐 Update web app with new model? (y/n): ").lower().strip() == 'y'
+    if update_app:
+        update_web_app(best_model)
+    return 0
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())